@@ -159,7 +159,8 @@ public partial class MainWindow : Window
             DayAttempts = attempts,
             PrimarySlot = GetPrimarySlot(),
             WaitForMidnight = WaitMidnightBox.IsChecked == true,
-            TryOtherSlots = TryOthersBox.IsChecked == true
+            TryOtherSlots = TryOthersBox.IsChecked == true,
+            Profile = LowFootprintBox.IsChecked == true ? BrowserProfile.Minimal : BrowserProfile.Default
         };
         return true;
     }
@@ -243,6 +244,7 @@ public partial class MainWindow : Window
             data.TryGetValue("day_attempts", out var attempts);
             data.TryGetValue("wait_midnight", out var waitMidnight);
             data.TryGetValue("try_other_slots", out var tryOthers);
+            data.TryGetValue("launch_profile", out var launchProfile);
 
             UsernameBox.Text = u ?? string.Empty;
             PasswordBox.Password = p ?? string.Empty;
@@ -251,6 +253,7 @@ public partial class MainWindow : Window
             if (!string.IsNullOrWhiteSpace(attempts)) DayAttemptsBox.Text = attempts;
             if (waitMidnight == "True" || waitMidnight == "true") WaitMidnightBox.IsChecked = true;
             if (tryOthers == "True" || tryOthers == "true") TryOthersBox.IsChecked = true;
+            if (launchProfile == "minimal") LowFootprintBox.IsChecked = true;
 
             Slot0.IsChecked = slotIdx != "1" && slotIdx != "2" && slotIdx != "3";
             Slot1.IsChecked = slotIdx == "1";
@@ -278,7 +281,8 @@ public partial class MainWindow : Window
                 ["slot_idx"] = ((int)request.PrimarySlot).ToString(),
                 ["wait_midnight"] = request.WaitForMidnight.ToString(),
                 ["try_other_slots"] = request.TryOtherSlots.ToString(),
-                ["day_attempts"] = request.DayAttempts.ToString()
+                ["day_attempts"] = request.DayAttempts.ToString(),
+                ["launch_profile"] = request.Profile.ToString().ToLowerInvariant()
             };
             File.WriteAllText(ConfigPath, JsonSerializer.Serialize(payload, new JsonSerializerOptions { WriteIndented = true }));
         }
@@ -10,6 +10,7 @@ public sealed class BookingRequest
     public bool TryOtherSlots { get; init; }
     public int DayAttempts { get; init; } = 5;
     public int StartEarlySeconds { get; init; } = 30;
+    public BrowserProfile Profile { get; init; } = BrowserProfile.Default;
 }
 
 public enum SlotSelection
@@ -19,3 +20,9 @@ public enum SlotSelection
     Slot2,
     Slot3
 }
+
+public enum BrowserProfile
+{
+    Default,
+    Minimal
+}
@@ -1,3 +1,4 @@
+using System.Diagnostics;
 using GymBooking.Wpf.Models;
 using Microsoft.Playwright;
 
@@ -19,6 +20,21 @@ public sealed class BookingService
 
     private const string UrlLogin = "https://servizi.custorino.it/loginareariservata.aspx";
 
+    private static readonly string[] DefaultArgs =
+    [
+        "--disable-extensions", "--disable-default-apps", "--disable-sync",
+        "--disable-background-networking", "--disable-component-update", "--no-first-run"
+    ];
+
+    // Same trimming as the Python "minimal" launch profile (launch_profile.py).
+    private static readonly string[] MinimalArgs =
+    [
+        .. DefaultArgs,
+        "--disable-gpu", "--disable-software-rasterizer", "--disable-site-isolation-trials",
+        "--disable-breakpad", "--disable-notifications", "--mute-audio",
+        "--blink-settings=imagesEnabled=false", "--disk-cache-size=1048576", "--media-cache-size=1048576"
+    ];
+
     private static readonly string[] MonthIt =
     [
         "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno",
@@ -29,11 +45,11 @@ public sealed class BookingService
     {
         token.ThrowIfCancellationRequested();
         using var playwright = await Playwright.CreateAsync();
-        await using var browser = await playwright.Chromium.LaunchAsync(new BrowserTypeLaunchOptions
-        {
-            Headless = false
-        });
-        var page = await browser.NewPageAsync();
+        var launchWatch = Stopwatch.StartNew();
+        await using var browser = await playwright.Chromium.LaunchAsync(LaunchOptionsFor(request.Profile));
+        log($"Browser launched in {launchWatch.ElapsedMilliseconds} ms ({request.Profile} profile).");
+        await using var context = await browser.NewContextAsync(ContextOptionsFor(request.Profile));
+        var page = await context.NewPageAsync();
 
         await page.GotoAsync(UrlLogin, new PageGotoOptions { WaitUntil = WaitUntilState.DOMContentLoaded });
         log("Loaded login page.");
@@ -127,6 +143,27 @@ public sealed class BookingService
         throw new InvalidOperationException(lastError?.Message ?? "All slots disabled or failed.");
     }
 
+    private static BrowserTypeLaunchOptions LaunchOptionsFor(BrowserProfile profile) => profile switch
+    {
+        BrowserProfile.Minimal => new BrowserTypeLaunchOptions { Headless = true, Args = MinimalArgs },
+        _ => new BrowserTypeLaunchOptions { Headless = false, Args = DefaultArgs }
+    };
+
+    private static BrowserNewContextOptions ContextOptionsFor(BrowserProfile profile) => profile switch
+    {
+        BrowserProfile.Minimal => new BrowserNewContextOptions
+        {
+            ViewportSize = new ViewportSize { Width = 800, Height = 600 },
+            DeviceScaleFactor = 1,
+            ServiceWorkers = ServiceWorkerPolicy.Block,
+            ReducedMotion = ReducedMotion.Reduce
+        },
+        _ => new BrowserNewContextOptions
+        {
+            ViewportSize = new ViewportSize { Width = 1280, Height = 900 }
+        }
+    };
+
     private static IReadOnlyList<string> BuildSlots(SlotSelection primary, bool tryOthers)
     {
         var order = new List<string> { SelectorFor(primary) };
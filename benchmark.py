@@ -0,0 +1,188 @@
+"""End-to-end benchmark: drive `run_booking` headless against the mock portal.
+
+Each iteration resets the portal with the target day gray and books it with
+a fresh browser. The day is released `release_in_s` after the calendar is
+ready (the end of the "popup" phase, or "warm_nav" from a cached session), so launch and login never
+overlap the release. Time-to-confirm is measured on the portal's clock, from
+the release instant to the moment the booking was recorded, so the
+post-confirm screenshot does not count.
+"""
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import booking_backend as bb
+import mock_portal
+from phase_trace import PhaseTracer
+from retry_policy import RetryPolicy
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench"
+READY_SPANS = ("popup", "warm_nav")  # the calendar is on screen once one of these ends
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile, `q` in [0, 100]; nan for no values."""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+@dataclass
+class Iteration:
+    ok: bool
+    time_to_confirm_ms: Optional[float] = None
+    elapsed_s: float = 0.0
+    error: Optional[str] = None
+    phases_ms: Dict[str, float] = field(default_factory=dict)  # total span time per phase
+
+
+@dataclass
+class BenchmarkReport:
+    iterations: List[Iteration] = field(default_factory=list)
+    portal_failures: int = 0
+
+    def summary(self) -> str:
+        ok = [it for it in self.iterations if it.ok]
+        confirm = [it.time_to_confirm_ms for it in ok if it.time_to_confirm_ms is not None]
+        lines = [
+            f"{len(ok)}/{len(self.iterations)} booked, {self.portal_failures} injected failures",
+            "time-to-confirm ms: "
+            + "  ".join(f"p{q}={percentile(confirm, q):.0f}" for q in (50, 90, 95, 99))
+            + f"  max={max(confirm, default=math.nan):.0f}",
+            f"{'phase':<14}{'p50 ms':>10}{'p95 ms':>10}",
+        ]
+        phases: Dict[str, List[float]] = {}
+        for it in ok:
+            for name, ms in it.phases_ms.items():
+                phases.setdefault(name, []).append(ms)
+        for name, values in phases.items():
+            lines.append(f"{name:<14}{percentile(values, 50):>10.0f}{percentile(values, 95):>10.0f}")
+        return "\n".join(lines)
+
+
+async def run_benchmark(
+    iterations: int = 20,
+    release_in_s: float = 0.5,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    failure_rate: float = 0.0,
+    heavy_assets_kb: int = 0,
+    seed: Optional[int] = None,
+    headless: bool = True,
+    trace_path: Optional[str] = None,
+    log_cb: Optional[Callable[[str], None]] = None,
+    **options,
+) -> BenchmarkReport:
+    """Book `iterations` times and collect time-to-confirm plus per-phase timings.
+
+    `options` are passed to `run_booking` (postback_fast_path, day_click_mode,
+    network_profile, ...); `heavy_assets_kb` makes the mock page pull heavy
+    assets, some third-party, for comparing network profiles. Unless given, each run gets its own hammer retry
+    policy, no session cache, no selector learning and no midnight wait.
+    """
+    report = BenchmarkReport()
+    with mock_portal.MockPortal(
+        users={BENCH_USER: BENCH_PASSWORD},
+        latency_ms=latency_ms,
+        jitter_ms=jitter_ms,
+        failure_rate=failure_rate,
+        heavy_assets_kb=heavy_assets_kb,
+        seed=seed,
+    ) as portal:
+        portal.target_date = portal.today()
+        for i in range(iterations):
+            portal.reset(release_at=math.inf)
+
+            def arm(record: dict):
+                if record["name"] in READY_SPANS and portal.release_at == math.inf:
+                    portal.release_at = portal.now() + release_in_s
+                if trace_path:
+                    with Path(trace_path).open("a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, default=str) + "\n")
+
+            run_options = {
+                "use_session_cache": False,
+                "learn_selectors": False,  # each iteration must not start from the previous one's profile
+                "retry_policy": RetryPolicy.hammer(window_s=5.0, deadline_s=30.0, min_reload_interval_ms=50),
+                **options,
+            }
+            tracer = PhaseTracer(sink=arm, run_id=f"bench-{i}", iteration=i)
+            started = time.monotonic()
+            try:
+                await bb.run_booking(
+                    BENCH_USER,
+                    BENCH_PASSWORD,
+                    portal.target_date,
+                    bb.SEL_SLOT_0,
+                    wait_for_midnight=False,
+                    headless=headless,
+                    login_url=portal.login_url,
+                    tracer=tracer,
+                    label=f"bench-{i}",
+                    **run_options,
+                )
+                it = Iteration(ok=bool(portal.booked_at))
+                if portal.booked_at:
+                    it.time_to_confirm_ms = (portal.booked_at[0] - portal.release_at) * 1000
+            except Exception as e:
+                it = Iteration(ok=False, error=str(e))
+            it.elapsed_s = time.monotonic() - started
+            for span in tracer.spans:
+                it.phases_ms[span.name] = it.phases_ms.get(span.name, 0.0) + span.duration_ms
+            report.iterations.append(it)
+            report.portal_failures += portal.failures
+            if log_cb:
+                outcome = f"{it.time_to_confirm_ms:.0f} ms" if it.time_to_confirm_ms is not None else it.error
+                log_cb(f"[{i + 1}/{iterations}] {'ok' if it.ok else 'FAILED'}: {outcome} ({it.elapsed_s:.2f}s total)")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Time-to-confirm percentiles for run_booking on the mock portal.")
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    parser.add_argument("--release-in", type=float, default=0.5, help="seconds after calendar-ready the day opens")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of page requests answered 503")
+    parser.add_argument("--heavy-assets-kb", type=int, default=0, help="size of each heavy asset on the page")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--postback", action="store_true", help="use the postback fast path")
+    parser.add_argument("--day-click-mode", choices=["locator", "evaluate"], default="locator")
+    parser.add_argument("--network-profile", help="network_profile.PROFILES key")
+    parser.add_argument("--race-tabs", type=int, default=1, help="racing mode with this many tabs")
+    parser.add_argument("--race-stagger-ms", type=float, default=50.0)
+    parser.add_argument("--trace", help="append phase spans to this JSON-lines file")
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run_benchmark(
+            iterations=args.iterations,
+            release_in_s=args.release_in,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            failure_rate=args.failure_rate,
+            heavy_assets_kb=args.heavy_assets_kb,
+            seed=args.seed,
+            headless=not args.headed,
+            trace_path=args.trace,
+            log_cb=print,
+            postback_fast_path=args.postback,
+            day_click_mode=args.day_click_mode,
+            network_profile=args.network_profile,
+            race_tabs=args.race_tabs,
+            race_stagger_ms=args.race_stagger_ms,
+        )
+    )
+    print(report.summary())
@@ -1,8 +1,23 @@
 import asyncio
+import dataclasses
 import datetime
-from typing import Callable, Optional, List
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, List, Sequence, Tuple, Union
 
-from playwright.async_api import async_playwright
+import har_capture
+from clock_sync import PORTAL_TZ, ReleaseScheduler, next_midnight
+from confirm_outcome import BOOKED, FULL, UNKNOWN, ConfirmOutcome, outcome_from_html
+from launch_profile import get_profile
+from network_profile import ReloadSample, install_network_profile
+from phase_budget import TIMEOUT, PhaseBudget, PhaseTimeout, close_within, settle
+from phase_trace import PhaseTracer
+from postback import CALENDAR_EPOCH, ConfirmUnread, DayNotReady, PostbackEngine, PostbackMismatch
+from retry_policy import PhaseStats, RetryPolicy
+from selector_profile import DAY_STRATEGIES, SelectorProfile, page_fingerprint
+from session_cache import SessionCache
+from slot_grid import SlotInfo, SlotPreference, rank_slots, read_slot_grid, slots_from_html
 
 # Selectors
 SEL_USERNAME = "#UC_Login_TXTUser"
@@ -15,6 +30,8 @@ SEL_SLOT_0 = "#UC_FreeFitness_GVPeriodi_CBScelta_0"  # 14-15.30
 SEL_SLOT_1 = "#UC_FreeFitness_GVPeriodi_CBScelta_1"  # 15.30-17
 SEL_SLOT_2 = "#UC_FreeFitness_GVPeriodi_CBScelta_2"  # 17-18.30
 SEL_SLOT_3 = "#UC_FreeFitness_GVPeriodi_CBScelta_3"  # 18.30-20
+SLOT_SELECTORS = [SEL_SLOT_0, SEL_SLOT_1, SEL_SLOT_2, SEL_SLOT_3]
+SEL_SLOT_GRID = "#UC_FreeFitness_GVPeriodi"
 SEL_CONFIRM = "#UC_FreeFitness_LBConferma"
 
 URL_LOGIN = "https://servizi.custorino.it/loginareariservata.aspx"
@@ -35,33 +52,254 @@ MONTH_IT = [
 ]
 
 
-def seconds_until_midnight() -> float:
-    now = datetime.datetime.now()
-    tomorrow = now + datetime.timedelta(days=1)
-    midnight = datetime.datetime.combine(tomorrow.date(), datetime.time(0, 0))
-    return max(0.0, (midnight - now).total_seconds())
+# Spellings of a booking_config.json boolean; the WPF app writes "True"/"False".
+TRUE_WORDS = ("1", "true", "yes", "on")
+FALSE_WORDS = ("0", "false", "no", "off", "")
 
 
-async def click_day(free_page, day_number: int, month_number: int):
-    month_name = MONTH_IT[month_number - 1]
+def parse_flag(value, key: str) -> bool:
+    """A config boolean: JSON true/false or one of the words above; ValueError otherwise."""
+    if isinstance(value, bool):
+        return value
+    word = str(value).strip().lower()
+    if word in TRUE_WORDS:
+        return True
+    if word in FALSE_WORDS:
+        return False
+    raise ValueError(f"{key} must be true or false, not {value!r}")
+
+
+def seconds_until_midnight(tz: datetime.tzinfo = PORTAL_TZ) -> float:
+    now = time.time()
+    return max(0.0, next_midnight(now, tz) - now)
+
+
+# One round trip: find the day by each strategy in the given order (title, exact
+# anchor text, cell text by default); report whether it is clickable (an anchor
+# not styled gray) and click it. The click is deferred so the postback
+# navigation starts after the result is sent; click_day_in_page waits for it.
+DAY_CLICK_JS = """
+([calendarSel, day, title, order]) => {
+  const cal = document.querySelector(calendarSel);
+  if (!cal) return {found: false, enabled: false, clicked: false, strategy: null, reason: "no calendar"};
+  const text = (el) => el.textContent.trim();
+  const gray = (el) => /gray/i.test(el.getAttribute("style") || "");
+  const anchors = Array.from(cal.querySelectorAll("a"));
+  const find = {
+    title: () => anchors.find((a) => a.getAttribute("title") === title),
+    anchor_text: () => anchors.find((a) => text(a) === String(day) && !gray(a)),
+    cell: () => {
+      const cell = Array.from(cal.querySelectorAll("td")).find((td) => text(td) === String(day) && !td.querySelector("table"));
+      return cell && (cell.querySelector("a") || cell);
+    },
+  };
+  let strategy = null;
+  let el = null;
+  for (const name of order) {
+    el = find[name]();
+    if (el) {
+      strategy = name;
+      break;
+    }
+  }
+  if (!el) return {found: false, enabled: false, clicked: false, strategy: null, reason: "day not in calendar"};
+  const cell = el.closest("td");
+  const enabled = el.tagName === "A" && !gray(el) && !(cell && gray(cell));
+  if (!enabled) return {found: true, enabled: false, clicked: false, strategy, reason: "gray"};
+  setTimeout(() => el.click(), 0);
+  return {found: true, enabled: true, clicked: true, strategy, reason: null};
+}
+"""
+
+
+class RoundTripCounter:
+    """Counts protocol round trips (awaited page/locator calls), per attempt and in total."""
+
+    def __init__(self):
+        self.total = 0
+        self.per_attempt: List[int] = []
+
+    def start_attempt(self):
+        self.per_attempt.append(0)
+
+    def tick(self, n: int = 1):
+        self.total += n
+        if self.per_attempt:
+            self.per_attempt[-1] += n
+
+
+# Day numbers (since 2000-01-01) of the calendar's previous/next month links ('V' arguments).
+CALENDAR_MONTH_LINKS_JS = """
+(calendarSel) => {
+  const cal = document.querySelector(calendarSel);
+  if (!cal) return [];
+  return Array.from(cal.querySelectorAll("a"))
+    .map((a) => (a.getAttribute("href") || "").match(/'V(\\d+)'/))
+    .filter(Boolean)
+    .map((m) => Number(m[1]));
+}
+"""
+
+
+def page_reloader(page) -> Callable[[], Awaitable]:
+    """Plain `reload(domcontentloaded)`; callers may swap in a metered or rate-capped one."""
+
+    async def reload():
+        return await page.reload(wait_until="domcontentloaded")
+
+    return reload
+
+
+# Same-origin HEAD over the page's own connection pool and cookies; no navigation,
+# so the calendar (and any month postback) stays as it is.
+WARM_PING_JS = """
+async (url) => {
+  const started = performance.now();
+  const resp = await fetch(url, {method: "HEAD", credentials: "same-origin", cache: "no-store"});
+  return {status: resp.status, ms: performance.now() - started};
+}
+"""
+
+# Absolute URL the WebForms postbacks go to.
+FORM_ACTION_JS = "() => (document.forms[0] && document.forms[0].action) || location.href"
+
+
+# Request types a postback to the form action can arrive as: a full-page
+# __doPostBack is a document, an UpdatePanel async postback an XHR or fetch.
+POSTBACK_TYPES = ("document", "xhr", "fetch")
+
+
+def is_form_post(action: str) -> Callable[[object], bool]:
+    """`expect_response` predicate for the page's own form postback, full or partial; not beacons."""
+    action = action.split("#")[0]
+    return lambda r: r.request.method == "POST" and r.request.resource_type in POSTBACK_TYPES and r.url == action
+
+
+async def keep_connection_warm(
+    page,
+    fire_local: float,
+    interval_s: float = 20.0,
+    window_s: float = 180.0,
+    last_s: float = 0.4,
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> int:
+    """Ping the page's URL until just before epoch `fire_local`; returns the number of pings.
+
+    Pings start `window_s` before the fire time, repeat every `interval_s` and
+    always end with one `last_s` before it, so the first reload reuses an open
+    TCP/TLS connection and a freshly touched ASP.NET session. Failed pings are
+    logged and otherwise ignored.
+    """
+    url = page.url
+    last_at = fire_local - last_s
+    await asyncio.sleep(max(0.0, fire_local - window_s - time.time()))
+    pings = 0
+    while True:
+        try:
+            ping = await page.evaluate(WARM_PING_JS, url)
+            pings += 1
+        except Exception as e:
+            ping = None
+            if log_cb:
+                log_cb(f"Warm-up ping failed: {e}")
+        remaining = last_at - time.time()
+        if remaining <= 0:
+            if log_cb and ping:
+                log_cb(f"Connection warm: {pings} pings, last HTTP {ping['status']} in {ping['ms']:.0f} ms.")
+            return pings
+        await asyncio.sleep(min(interval_s, remaining))
+
+
+def day_locators(free_page, day_number: int, month_number: int) -> Dict[str, object]:
+    """One locator per DAY_STRATEGIES entry."""
     calendar = free_page.locator(SEL_CALENDAR)
-    title_sel = f'a[title="{day_number} {month_name}"]'
-    anchor = calendar.locator(title_sel)
-    if await anchor.count() > 0:
-        await anchor.first.scroll_into_view_if_needed()
-        await anchor.first.wait_for(state="visible", timeout=5000)
-        await anchor.first.click()
-        return
-    anchor_fallback = calendar.locator(f'a:has-text("{day_number}")')
-    if await anchor_fallback.count() > 0:
-        await anchor_fallback.first.scroll_into_view_if_needed()
-        await anchor_fallback.first.wait_for(state="visible", timeout=5000)
-        await anchor_fallback.first.click()
-        return
-    cell = calendar.locator(f'td:has-text("{day_number}")')
-    await cell.first.scroll_into_view_if_needed()
-    await cell.first.wait_for(state="visible", timeout=5000)
-    await cell.first.click()
+    return {
+        "title": calendar.locator(f'a[title="{day_number} {MONTH_IT[month_number - 1]}"]'),
+        "anchor_text": calendar.locator(f'a:has-text("{day_number}")'),
+        "cell": calendar.locator(f'td:has-text("{day_number}")'),
+    }
+
+
+async def click_day(
+    free_page,
+    day_number: int,
+    month_number: int,
+    counter: Optional[RoundTripCounter] = None,
+    strategies: Sequence[str] = DAY_STRATEGIES,
+) -> str:
+    """Click the day with the first strategy that finds it (the last one is clicked blind).
+
+    Waits for the day's postback to load. Returns the strategy used.
+    """
+    counter = counter if counter is not None else RoundTripCounter()
+    locators = day_locators(free_page, day_number, month_number)
+    for strategy in strategies:
+        target = locators[strategy]
+        if strategy != strategies[-1]:
+            counter.tick()
+            if await target.count() == 0:
+                continue
+        await target.first.scroll_into_view_if_needed()
+        await target.first.wait_for(state="visible", timeout=5000)
+        async with free_page.expect_navigation(wait_until="domcontentloaded"):
+            await target.first.click()
+        counter.tick(3)
+        return strategy
+
+
+async def show_month(
+    free_page,
+    date: datetime.date,
+    log_cb: Optional[Callable[[str], None]] = None,
+    max_steps: int = 24,
+) -> int:
+    """Page the calendar with its previous/next links until `date`'s month is shown.
+
+    The shown month is the one after the previous-month link. Returns the number
+    of month postbacks clicked; 0 without any (also when the calendar has no
+    month links to go by).
+    """
+    wanted = (date.year, date.month)
+    for step in range(max_steps):
+        args = sorted(await free_page.evaluate(CALENDAR_MONTH_LINKS_JS, SEL_CALENDAR))
+        if not args:
+            return step
+        shown = (CALENDAR_EPOCH + datetime.timedelta(days=args[0] + 32)).replace(day=1)
+        if (shown.year, shown.month) == wanted:
+            return step
+        arg = args[-1] if wanted > (shown.year, shown.month) else args[0]
+        async with free_page.expect_navigation(wait_until="domcontentloaded"):
+            await free_page.locator(f"{SEL_CALENDAR} a[href*=\"'V{arg}'\"]").first.click()
+        if log_cb:
+            log_cb(f"Calendar moved {'forward' if arg == args[-1] else 'back'} a month.")
+    raise RuntimeError(f"Could not page the calendar to {date:%Y-%m}")
+
+
+class _DayNotClicked(Exception):
+    """Leaves `expect_navigation` without waiting when the in-page click did not happen."""
+
+    def __init__(self, outcome: dict):
+        self.outcome = outcome
+
+
+async def click_day_in_page(
+    free_page, day_number: int, month_number: int, strategies: Sequence[str] = DAY_STRATEGIES
+) -> dict:
+    """Locate, check and click the day in a single `page.evaluate`.
+
+    When the day was clicked, returns only once its postback has loaded, so the
+    next lookup cannot see the page from before the click. Returns {found,
+    enabled, clicked, strategy, reason}.
+    """
+    title = f"{day_number} {MONTH_IT[month_number - 1]}"
+    try:
+        async with free_page.expect_navigation(wait_until="domcontentloaded"):
+            outcome = await free_page.evaluate(DAY_CLICK_JS, [SEL_CALENDAR, day_number, title, list(strategies)])
+            if not outcome["clicked"]:
+                raise _DayNotClicked(outcome)
+    except _DayNotClicked as e:
+        return e.outcome
+    return outcome
 
 
 async def click_day_with_retry(
@@ -71,171 +309,1194 @@ async def click_day_with_retry(
     attempts: int = 5,
     pause_ms: int = 50,
     log_cb: Optional[Callable[[str], None]] = None,
-):
-    """Click the target day. One click per attempt; reload immediately if missing/failed."""
+    mode: str = "locator",
+    counter: Optional[RoundTripCounter] = None,
+    reload: Optional[Callable[[], Awaitable]] = None,
+    policy: Optional[RetryPolicy] = None,
+    profile: Optional[SelectorProfile] = None,
+) -> RoundTripCounter:
+    """Click the target day. One click per attempt; reload immediately if missing/failed.
+
+    `mode="locator"` probes with Playwright locators; `mode="evaluate"` does the
+    lookup and click in one in-page call. `policy` decides how many attempts and
+    how long to pause (default: `attempts` x `pause_ms`). With a `profile`, the
+    strategy that worked last time is tried first and the winner is recorded.
+    Returns the round-trip counter.
+    """
+    if mode not in ("locator", "evaluate"):
+        raise ValueError(f"Unknown day click mode: {mode}")
+    reload = reload or page_reloader(free_page)
+    counter = counter if counter is not None else RoundTripCounter()
+    policy = policy or RetryPolicy.fixed(attempts, pause_ms)
+    run = policy.begin("day_click")
+    order = profile.day_order() if profile else list(DAY_STRATEGIES)
+    # Locator probes only count anchors: a gray day is a plain cell.
+    probes = [s for s in order if s != "cell"]
     day_clicked = False
-    for i in range(1, attempts + 1):
+    while run.next_attempt():
+        i = run.attempt
+        counter.start_attempt()
         try:
-            month_name = MONTH_IT[month_number - 1]
-            calendar = free_page.locator(SEL_CALENDAR)
-            title_sel = f'a[title="{day_number} {month_name}"]'
-            anchor = calendar.locator(title_sel)
-            anchor_fallback = calendar.locator(f'a:has-text("{day_number}")')
-            has_anchor = await anchor.count() > 0 or await anchor_fallback.count() > 0
+            if mode == "evaluate":
+                outcome = await click_day_in_page(free_page, day_number, month_number, order)
+                counter.tick()
+                has_anchor = False  # gray or missing: reload below
+                if outcome["clicked"]:
+                    if log_cb:
+                        log_cb(f"Clicked day {day_number} on attempt {i} ({outcome['strategy']}).")
+                    if profile:
+                        profile.learn_day(outcome["strategy"])
+                    day_clicked = True
+                    break
+            else:
+                locators = day_locators(free_page, day_number, month_number)
+                has_anchor = False
+                for strategy in probes:
+                    counter.tick()
+                    if await locators[strategy].count() > 0:
+                        has_anchor = True
+                        break
 
             if has_anchor:
                 try:
-                    await click_day(free_page, day_number, month_number)
-                    msg = f"Clicked day {day_number} on attempt {i}."
+                    await click_day(free_page, day_number, month_number, counter=counter, strategies=[strategy])
+                    msg = f"Clicked day {day_number} on attempt {i} ({strategy})."
                     if log_cb:
                         log_cb(msg)
+                    if profile:
+                        profile.learn_day(strategy)
                     day_clicked = True
                     break
                 except Exception as e:
                     msg = f"Attempt {i}: click failed ({e}); reloading..."
                     if log_cb:
                         log_cb(msg)
-                    await free_page.reload(wait_until="domcontentloaded")
+                    await reload()
+                    counter.tick()
             else:
                 msg = f"Attempt {i}: day {day_number} anchor not found (gray); reloading..."
                 if log_cb:
                     log_cb(msg)
-                await free_page.reload(wait_until="domcontentloaded")
+                await reload()
+                counter.tick()
         except Exception as e:
             msg = f"Attempt {i} failed to click day {day_number}; will retry... ({e})"
             if log_cb:
                 log_cb(msg)
-            await free_page.reload(wait_until="domcontentloaded")
-        await free_page.wait_for_timeout(pause_ms)
+            await reload()
+            counter.tick()
+        await run.pause()
+    run.finish()
+    if log_cb:
+        log_cb(f"Day click round trips per attempt: {counter.per_attempt} ({mode} mode).")
     if not day_clicked:
-        raise RuntimeError(f"Could not click day {day_number} after {attempts} attempts")
+        raise RuntimeError(f"Could not click day {day_number} after {run.attempt} attempts")
+    return counter
 
 
-async def run_booking(
-    username: str,
-    password: str,
-    target_date: datetime.date,
-    primary_slot_selector: str,
-    wait_for_midnight: bool,
+@dataclass
+class BookingJob:
+    """Everything one booking needs; `run_booking` keyword arguments map onto these fields."""
+
+    username: str
+    password: str
+    target_date: datetime.date
+    primary_slot_selector: str
+    wait_for_midnight: bool
+    try_other_slots: bool = False
+    day_attempts: int = 5
+    start_early_seconds: int = 30
+    sync_server_clock: bool = True
+    portal_tz: datetime.tzinfo = PORTAL_TZ  # zone whose midnight releases the next day
+    use_session_cache: bool = True
+    postback_fast_path: bool = False
+    day_click_mode: str = "locator"  # or "evaluate": one in-page call per attempt
+    network_profile: Optional[str] = None  # network_profile.PROFILES key for the Free Fitness page
+    # Attempts/pauses for the day and slot phases; default is day_attempts x 50 ms.
+    # Policies carry per-run stats, so give every job its own instance.
+    retry_policy: Optional[RetryPolicy] = None
+    # Ranked slot choices (see slot_grid.rank_slots); overrides primary/try_other_slots.
+    slot_preferences: Optional[List[SlotPreference]] = None
+    # Receives one span per phase; run_booking/book_in_browser create one if unset.
+    tracer: Optional[PhaseTracer] = None
+    login_url: str = URL_LOGIN  # point at mock_portal.MockPortal.login_url for offline runs
+    screenshot_path: Optional[str] = "booking_result.png"  # taken in the background; None to skip
+    # >1: reload that many Free Fitness tabs, race_stagger_ms apart, across the release.
+    race_tabs: int = 1
+    race_stagger_ms: float = 50.0
+    # Keep the connection and session hot before the release: a same-origin HEAD every
+    # warmup_interval_s over the last warmup_window_s of the wait, and one more
+    # warmup_last_ms before the first reload. 0 disables.
+    warmup_interval_s: float = 20.0
+    warmup_window_s: float = 180.0
+    warmup_last_ms: float = 400.0
+    # Remember the winning day-click strategy and slot time ranges in
+    # selector_profile.PROFILE_PATH, and use them first on later runs. Off by
+    # default: the profile is shared state under the working directory.
+    learn_selectors: bool = False
+    launch_profile: str = "default"  # launch_profile.PROFILES key: "minimal" for small hosts, "debug" headed
+    # Seconds per phase (span name, e.g. {"popup": 15, "confirm": 10}) and for the
+    # whole run including launch and any midnight wait; a run that overshoots
+    # returns a BookingResult with outcome "timeout" and the phase named.
+    phase_budgets: Optional[Dict[str, float]] = None
+    deadline_s: Optional[float] = None
+    # Save a HAR / Playwright trace of the session (credentials and cookie values are
+    # scrubbed once the context closes), or serve the whole session from a recorded
+    # HAR, holding each response back replay_delay ms or "recorded" (see har_capture).
+    # Both skip the session cache, so the login is always part of the capture.
+    record_har: Optional[str] = None
+    record_trace: Optional[str] = None
+    replay_har: Optional[str] = None
+    replay_delay: Union[float, str] = 0.0
+    label: str = ""
+
+    def __post_init__(self):
+        if not self.label:
+            self.label = self.username
+
+    def ranked_preferences(self) -> List[SlotPreference]:
+        if self.slot_preferences:
+            return list(self.slot_preferences)
+        return [self.primary_slot_selector] + (["*"] if self.try_other_slots else [])
+
+
+@dataclass
+class BookingResult:
+    label: str
+    ok: bool
+    slot_selector: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_s: float = 0.0
+    startup_s: float = 0.0  # context creation until the calendar page is ready
+    warm_start: bool = False
+    outcome: Optional[str] = None  # confirm_outcome status of the portal's reply
+    message: str = ""
+    race_winner: Optional[int] = None  # tab index that clicked the day first (racing mode)
+    race_ms: Optional[float] = None  # race start until the winning click
+    day_round_trips: List[int] = field(default_factory=list)
+    slot_snapshot: List[SlotInfo] = field(default_factory=list)
+    reload_samples: List[ReloadSample] = field(default_factory=list)
+    phase_stats: Dict[str, PhaseStats] = field(default_factory=dict)
+    logs: List[str] = field(default_factory=list)
+    timeout_phase: Optional[str] = None  # phase that used up its budget or the deadline
+
+
+def timeout_result(job: BookingJob, error: PhaseTimeout) -> BookingResult:
+    return BookingResult(label=job.label, ok=False, error=str(error), outcome=TIMEOUT, timeout_phase=error.phase)
+
+
+def job_budget(job: BookingJob) -> PhaseBudget:
+    """The job's PhaseBudget, attached to its tracer (created on first use)."""
+    if job.tracer is None:
+        job.tracer = PhaseTracer(label=job.label)
+    if job.tracer.budget is None:
+        job.tracer.budget = PhaseBudget(job.phase_budgets, job.deadline_s)
+    return job.tracer.budget
+
+
+class NoSlotAvailable(RuntimeError):
+    """No ranked slot could be booked; `snapshot` is the grid as last seen."""
+
+    def __init__(self, message: str, snapshot: List[SlotInfo]):
+        super().__init__(message)
+        self.snapshot = snapshot
+
+
+class BookingRejected(RuntimeError):
+    """The portal answered the confirm with something other than success or "full"."""
+
+    def __init__(self, outcome: ConfirmOutcome, snapshot: List[SlotInfo]):
+        super().__init__(f"Portal refused the booking ({outcome.status}): {outcome.message}")
+        self.outcome = outcome
+        self.snapshot = snapshot
+
+
+def describe_slots(snapshot: List[SlotInfo]) -> str:
+    return "; ".join(f"{s.index}: {s.label}{'' if s.enabled else ' (full)'}" for s in snapshot) or "empty"
+
+
+async def wait_for_server_midnight(
+    free_page,
+    resync_seconds: int = 30,
     log_cb: Optional[Callable[[str], None]] = None,
-    try_other_slots: bool = False,
-    day_attempts: int = 5,
-    start_early_seconds: int = 30,
+    scheduler: Optional[ReleaseScheduler] = None,
+    reload: Optional[Callable[[], Awaitable]] = None,
+    early_s: float = 0.0,
+    warm: Optional[Callable[[float], Awaitable]] = None,
+    tz: datetime.tzinfo = PORTAL_TZ,
 ):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            args=[
-                "--disable-extensions",
-                "--disable-default-apps",
-                "--disable-sync",
-                "--disable-background-networking",
-                "--disable-component-update",
-                "--no-first-run",
-            ],
-        )
-        context = await browser.new_context(
-            viewport={"width": 1280, "height": 900},
-            java_script_enabled=True,
-        )
-        page = await context.new_page()
-        page.set_default_timeout(6000)
-        page.set_default_navigation_timeout(8000)
+    """Sleep until midnight on the portal's clock, then fire the first reload.
 
-        try:
-            await page.goto(URL_LOGIN, wait_until="domcontentloaded")
+    The offset is measured once up front and again `resync_seconds` before the
+    release so drift during a long wait does not matter. Pass a shared
+    `scheduler` when several sessions wait for the same instant; `early_s`
+    fires that much before midnight. `warm(fire_local)` runs alongside the
+    wait (see `keep_connection_warm`) and is cancelled at the fire time.
+    """
+    if scheduler is None:
+        scheduler = ReleaseScheduler(free_page.url, tz=tz)
+    offset = await scheduler.sync(max_age_s=resync_seconds / 2)
+    if log_cb:
+        log_cb(f"Server clock offset {offset.offset:+.3f}s (±{offset.uncertainty * 1000:.0f} ms).")
+    release = scheduler.next_release()
+    lead = scheduler.seconds_until(release)
+    warm_task = asyncio.create_task(warm(offset.to_local(release - early_s))) if warm else None
+    try:
+        if lead > resync_seconds:
             if log_cb:
-                log_cb("Loaded login page.")
+                log_cb(f"Waiting {lead - resync_seconds:.0f}s (until {resync_seconds}s before server midnight)...")
+            await asyncio.sleep(lead - resync_seconds)
+            await scheduler.sync(max_age_s=resync_seconds / 2)
+        report = await scheduler.fire_at(release - early_s)
+    finally:
+        if warm_task is not None:
+            warm_task.cancel()
+    await (reload or page_reloader(free_page))()
+    if log_cb:
+        when = f"{early_s * 1000:.0f} ms before server midnight" if early_s else "at server midnight"
+        log_cb(f"First reload fired {when} (timer error {report.error_ms:+.1f} ms).")
+    return report
 
-            async def do_login() -> bool:
-                await page.fill(SEL_USERNAME, username)
-                await page.fill(SEL_PASSWORD, password)
-                await page.click(SEL_LOGIN_BTN)
-                try:
-                    await page.wait_for_selector(SEL_NAV_PRENOTAZIONI, state="visible", timeout=4000)
-                    return True
-                except Exception:
-                    return False
 
-            if not await do_login():
-                if log_cb:
-                    log_cb("Login link not found; retrying once after reload...")
-                await page.reload(wait_until="domcontentloaded")
-                if not await do_login():
-                    raise RuntimeError("Login still not confirmed; credentials/selector may be wrong or a popup is blocking.")
-            if log_cb:
-                log_cb("Login successful.")
+async def launch_browser(p, headless: bool = False, profile: str = "default"):
+    """Launch Chromium with a `launch_profile.PROFILES` entry; a profile's own headless setting wins."""
+    lp = get_profile(profile)
+    return await p.chromium.launch(headless=headless if lp.headless is None else lp.headless, args=list(lp.args))
+
+
+async def new_booking_context(browser, storage_state: Optional[str] = None, profile: str = "default"):
+    lp = get_profile(profile)
+    return await browser.new_context(
+        viewport={"width": lp.viewport[0], "height": lp.viewport[1]},
+        java_script_enabled=True,
+        storage_state=storage_state,
+        **lp.context_options,
+    )
 
-            await page.click(SEL_NAV_PRENOTAZIONI)
-            await page.wait_for_load_state("domcontentloaded")
+
+async def login_and_open_free_page(context, job: BookingJob, log_cb: Optional[Callable[[str], None]] = None):
+    """Cold path: log in, open Prenotazioni and return the Free Fitness popup."""
+    tracer = job.tracer or PhaseTracer()
+    page = await context.new_page()
+    page.set_default_timeout(6000)
+    page.set_default_navigation_timeout(8000)
+
+    async with tracer.span("login") as span:
+        await login(page, job, log_cb=log_cb, span=span)
+
+    async with tracer.span("nav"):
+        await page.click(SEL_NAV_PRENOTAZIONI)
+        await page.wait_for_load_state("domcontentloaded")
+    if log_cb:
+        log_cb("Opened Prenotazioni.")
+
+    async with tracer.span("popup"):
+        async with page.context.expect_page() as new_page_info:
+            await page.click(SEL_FREE_FITNESS)
+        free_page = await new_page_info.value
+        free_page.set_default_timeout(6000)
+        await free_page.wait_for_load_state("domcontentloaded")
+    if log_cb:
+        log_cb("Opened Free Fitness page.")
+    return free_page
+
+
+async def login(page, job: BookingJob, log_cb: Optional[Callable[[str], None]] = None, span=None):
+    """Load the login page and sign in, retrying once after a reload."""
+    await page.goto(job.login_url, wait_until="domcontentloaded")
+    if log_cb:
+        log_cb("Loaded login page.")
+
+    async def do_login() -> bool:
+        await page.fill(SEL_USERNAME, job.username)
+        await page.fill(SEL_PASSWORD, job.password)
+        await page.click(SEL_LOGIN_BTN)
+        try:
+            await page.wait_for_selector(SEL_NAV_PRENOTAZIONI, state="visible", timeout=4000)
+            return True
+        except Exception:
+            return False
+
+    attempts = 1
+    if not await do_login():
+        if log_cb:
+            log_cb("Login link not found; retrying once after reload...")
+        await page.reload(wait_until="domcontentloaded")
+        attempts = 2
+        if not await do_login():
+            if span:
+                span.set(attempts=attempts)
+            raise RuntimeError("Login still not confirmed; credentials/selector may be wrong or a popup is blocking.")
+    if span:
+        span.set(attempts=attempts)
+    if log_cb:
+        log_cb("Login successful.")
+
+
+async def open_cached_free_page(
+    context,
+    url: str,
+    log_cb: Optional[Callable[[str], None]] = None,
+    tracer: Optional[PhaseTracer] = None,
+):
+    """Warm path: one navigation straight to the Free Fitness page.
+
+    Returns None when the cached session has expired (the portal shows the login
+    form instead of the calendar), so the caller can fall back to a fresh login.
+    """
+    tracer = tracer or PhaseTracer()
+    free_page = await context.new_page()
+    free_page.set_default_timeout(6000)
+    free_page.set_default_navigation_timeout(8000)
+    try:
+        async with tracer.span("warm_nav") as span:
+            await free_page.goto(url, wait_until="domcontentloaded")
+            await free_page.locator(f"{SEL_CALENDAR}, {SEL_USERNAME}").first.wait_for(state="attached", timeout=4000)
+            on_calendar = await free_page.locator(SEL_CALENDAR).count() > 0
+            span.set(outcome="ok" if on_calendar else "expired")
+        if on_calendar:
             if log_cb:
-                log_cb("Opened Prenotazioni.")
+                log_cb("Opened Free Fitness page from cached session.")
+            return free_page
+    except Exception as e:
+        if log_cb:
+            log_cb(f"Cached session check failed ({e}).")
+    if log_cb:
+        log_cb("Cached session expired; logging in again.")
+    return None
+
+
+async def open_free_page(browser, job: BookingJob, log_cb: Optional[Callable[[str], None]] = None):
+    """New isolated context on the Free Fitness page: cached session first, else a full login.
+
+    Returns (context, free_page, warm, startup_s); the context is closed if this fails.
+    """
+    capturing = job.record_har or job.record_trace or job.replay_har
+    cache = SessionCache() if job.use_session_cache and not capturing else None
+    started = time.monotonic()
+    context = None
+    free_page = None
+    try:
+        cached = cache.load(job.username) if cache else None
+        if cached:
+            context = await new_booking_context(
+                browser, storage_state=str(cache.state_path(job.username)), profile=job.launch_profile
+            )
+            free_page = await open_cached_free_page(
+                context, cached["free_fitness_url"], log_cb=log_cb, tracer=job.tracer
+            )
+            if free_page is None:
+                cache.invalidate(job.username)
+                await context.close()
+                context = None
+        warm = free_page is not None
+        if not warm:
+            context = await new_booking_context(
+                browser, profile=job.launch_profile, **har_capture.context_options(job)
+            )
+            await har_capture.attach(context, job, log_cb=log_cb)
+            free_page = await login_and_open_free_page(context, job, log_cb=log_cb)
+            if cache:
+                await cache.save(context, job.username, free_page.url)
+    except BaseException:
+        if context is not None:
+            await release_context(context, job)
+        raise
+
+    startup_s = time.monotonic() - started
+    meta = cache.record_startup(job.username, warm, startup_s) if cache else {}
+    if log_cb:
+        msg = f"Calendar ready in {startup_s:.2f}s ({'warm' if warm else 'cold'} start)"
+        other = meta.get("cold_start_s" if warm else "warm_start_s")
+        if other is not None:
+            msg += f"; last {'cold' if warm else 'warm'} start {other:.2f}s"
+        log_cb(msg + ".")
+    return context, free_page, warm, startup_s
+
+
+async def release_context(context, job: BookingJob, log_cb: Optional[Callable[[str], None]] = None) -> bool:
+    """Close a booking context within CLOSE_TIMEOUT_S, then scrub any HAR/trace it wrote.
+
+    Returns False when the close failed or hung; the HAR is then discarded.
+    The scrub runs even when this is cancelled.
+    """
+    closed = False
+    try:
+        await har_capture.stop_trace(context, job)
+        closed = await close_within(context)
+    finally:
+        har_capture.scrub_outputs(job, log_cb=log_cb, closed=closed)
+    return closed
+
+
+async def book_in_browser(
+    browser,
+    job: BookingJob,
+    log_cb: Optional[Callable[[str], None]] = None,
+    scheduler: Optional[ReleaseScheduler] = None,
+) -> BookingResult:
+    """Run one booking in a fresh, isolated context of an already running browser.
+
+    With `job.use_session_cache`, a cached login lands directly on the calendar
+    and a fresh login refreshes the cache. Raises RuntimeError when no slot could
+    be booked; returns a "timeout" result when a phase budget or the deadline
+    runs out. The context is always closed, even when the run is cancelled.
+    """
+    budget = job_budget(job)
+    started = time.monotonic()
+    context = None
+    background: List[asyncio.Task] = []
+    try:
+        async with budget.deadline():
+            context, free_page, warm, startup_s = await open_free_page(browser, job, log_cb=log_cb)
+            result = await book_on_free_page(
+                free_page, job, log_cb=log_cb, scheduler=scheduler, background=background
+            )
+        result.startup_s = startup_s
+        result.warm_start = warm
+        return result
+    except PhaseTimeout as e:
+        if log_cb:
+            log_cb(f"Stopped: {e}.")
+        result = timeout_result(job, e)
+        result.elapsed_s = time.monotonic() - started
+        return result
+    finally:
+        await settle(background)
+        if context is not None and not await release_context(context, job, log_cb=log_cb) and log_cb:
+            log_cb("Browser context did not close in time; it goes with the browser.")
+        if log_cb and job.tracer.spans:
+            for line in job.tracer.summary_table().splitlines():
+                log_cb(line)
+
+
+BatchEntry = Tuple[datetime.date, Optional[List[SlotPreference]]]
+
+
+async def book_batch_in_browser(
+    browser,
+    job: BookingJob,
+    entries: Sequence[BatchEntry],
+    log_cb: Optional[Callable[[str], None]] = None,
+    scheduler: Optional[ReleaseScheduler] = None,
+) -> List[BookingResult]:
+    """Book several dates on one Free Fitness page: one login and popup, then clicks per date.
 
-            async with page.context.expect_page() as new_page_info:
-                await page.click(SEL_FREE_FITNESS)
-            free_page = await new_page_info.value
-            free_page.set_default_timeout(6000)
-            await free_page.wait_for_load_state("domcontentloaded")
+    `entries` are (date, slot preferences) pairs; None preferences fall back to
+    the job's. Every date gets a result, in input order; a failed date is
+    recorded and the next one is tried. Only the first date waits for midnight,
+    racing mode is not used, and each screenshot gets the date in its name.
+    Phase budgets apply per date; when the deadline passes, the date in
+    progress and all later ones get "timeout" results.
+    """
+    budget = job_budget(job)
+    if job.race_tabs > 1 and log_cb:
+        log_cb("Racing mode is not used for batch bookings.")
+    context = None
+    background: List[asyncio.Task] = []
+    results: List[BookingResult] = []
+    try:
+        try:
+            async with budget.deadline():
+                context, free_page, warm, startup_s = await open_free_page(browser, job, log_cb=log_cb)
+                start_url = free_page.url
+                for i, (date, preferences) in enumerate(entries):
+                    entry = dataclasses.replace(
+                        job,
+                        target_date=date,
+                        slot_preferences=preferences or job.slot_preferences,
+                        wait_for_midnight=job.wait_for_midnight and i == 0,
+                        race_tabs=1,
+                        retry_policy=dataclasses.replace(job.retry_policy, stats={}) if job.retry_policy else None,
+                        screenshot_path=(
+                            str(Path(job.screenshot_path).with_stem(f"{Path(job.screenshot_path).stem}_{date:%Y%m%d}"))
+                            if job.screenshot_path
+                            else None
+                        ),
+                        label=f"{job.label} {date}",
+                    )
+                    started = time.monotonic()
+                    try:
+                        if i > 0:
+                            # The previous screenshot must see its own page, and a GET (not a
+                            # reload) so the last confirm postback is never resubmitted.
+                            if background:
+                                await asyncio.wait(background, timeout=10)
+                            await free_page.goto(start_url, wait_until="domcontentloaded")
+                        result = await book_on_free_page(
+                            free_page, entry, log_cb=log_cb, scheduler=scheduler, background=background
+                        )
+                    except PhaseTimeout as e:
+                        if log_cb:
+                            log_cb(f"{date}: stopped ({e}).")
+                        result = timeout_result(entry, e)
+                    except Exception as e:
+                        if log_cb:
+                            log_cb(f"{date}: failed ({e}).")
+                        result = BookingResult(
+                            label=entry.label, ok=False, error=str(e), slot_snapshot=getattr(e, "snapshot", [])
+                        )
+                    result.elapsed_s = time.monotonic() - started
+                    if i == 0:
+                        result.startup_s = startup_s
+                        result.warm_start = warm
+                    results.append(result)
+        except PhaseTimeout as e:
             if log_cb:
-                log_cb("Opened Free Fitness page.")
+                log_cb(f"Stopped: {e}.")
+            for date, _ in entries[len(results):]:
+                result = timeout_result(job, e)
+                result.label = f"{job.label} {date}"
+                results.append(result)
+        return results
+    finally:
+        await settle(background)
+        if context is not None:
+            await release_context(context, job, log_cb=log_cb)
+        if log_cb and job.tracer.spans:
+            for line in job.tracer.summary_table().splitlines():
+                log_cb(line)
+
 
-            target_day = target_date.day
-            target_month = target_date.month
+def result_html_path(job: BookingJob) -> Optional[Path]:
+    """Where the postback path keeps the confirm reply: next to the screenshot, None without one."""
+    return Path(job.screenshot_path).with_suffix(".html") if job.screenshot_path else None
+
+
+async def book_via_postback(
+    free_page,
+    job: BookingJob,
+    log_cb: Optional[Callable[[str], None]] = None,
+    reload: Optional[Callable[[], Awaitable]] = None,
+    policy: Optional[RetryPolicy] = None,
+    profile: Optional[SelectorProfile] = None,
+) -> Optional[BookingResult]:
+    """Select the day and confirm with direct form posts instead of DOM clicks.
+
+    Uses the context's request client, so the browser's cookies go along. A gray
+    day is re-fetched over HTTP for as long as `policy` allows. Returns None after
+    reloading `free_page` when the markup does not match before the confirm, so
+    the caller can carry on with the Playwright path; once a confirm has been
+    posted there is no fallback, and an unreadable reply is an UNKNOWN result.
+    Raises NoSlotAvailable when every slot is full.
+    """
+    started = time.monotonic()
+    preferences = profile.resolve(job.ranked_preferences()) if profile else job.ranked_preferences()
+    try:
+        engine = PostbackEngine(free_page.context.request, free_page.url, await free_page.content(), log_cb=log_cb)
+        policy = policy or RetryPolicy.fixed(job.day_attempts, 0)
+        run = policy.begin("postback_day")
+        refresh = policy.throttled(engine.refresh, "postback_day")
+        while run.next_attempt():
+            try:
+                await engine.select_day(job.target_date, MONTH_IT)
+                break
+            except DayNotReady:
+                if log_cb:
+                    log_cb(f"Attempt {run.attempt}: day {job.target_date.day} still gray; refetching...")
+                await run.pause()
+                await refresh()
+        else:
+            raise DayNotReady(f"day {job.target_date.day} still gray after {run.attempt} attempts")
+        run.finish()
+        snapshot = slots_from_html(engine.html)
+        if log_cb:
+            log_cb(f"Slot grid: {describe_slots(snapshot)}")
+        tried = set()
+        pending = rank_slots(snapshot, preferences)
+        while pending:
+            slot = pending.pop(0)
+            if slot.id in tried:
+                continue
+            if not slot.enabled:
+                if log_cb:
+                    log_cb(f"Slot {slot.index} disabled/full; skipping.")
+                continue
+            tried.add(slot.id)
+            try:
+                page_html = await engine.confirm(slot.id)
+            except ConfirmUnread as e:
+                if log_cb:
+                    log_cb(f"{e}; not retrying, check the portal.")
+                return BookingResult(
+                    label=job.label,
+                    ok=False,
+                    slot_selector=slot.selector,
+                    outcome=UNKNOWN,
+                    message=str(e),
+                    slot_snapshot=snapshot,
+                    phase_stats=policy.stats,
+                )
+            outcome = outcome_from_html(page_html)
             if log_cb:
-                log_cb(f"Target date: {target_date}, day: {target_day}, month: {target_month}")
+                log_cb(
+                    f"Confirm for {slot.selector} answered {(time.monotonic() - started) * 1000:.0f} ms after start: "
+                    f"{outcome.status} ({outcome.message or 'no message'})"
+                )
+            if outcome.status == FULL:
+                snapshot = slots_from_html(page_html) or snapshot
+                pending = rank_slots(snapshot, preferences)
+                continue
+            html_path = result_html_path(job)
+            if html_path:
+                html_path.write_text(page_html, encoding="utf-8")
+            if outcome.status not in (BOOKED, UNKNOWN):
+                raise BookingRejected(outcome, snapshot)
+            if profile and outcome.ok:
+                profile.learn_slot(slot)
+            return BookingResult(
+                label=job.label,
+                ok=outcome.ok,
+                slot_selector=slot.selector,
+                outcome=outcome.status,
+                message=outcome.message,
+                slot_snapshot=snapshot,
+                phase_stats=policy.stats,
+            )
+    except PostbackMismatch as e:
+        if log_cb:
+            log_cb(f"Postback fast path unavailable ({e}); falling back to browser clicks.")
+        await (reload or page_reloader(free_page))()
+        return None
+    raise NoSlotAvailable("All slots disabled/full; no booking submitted.", snapshot)
+
+
+async def wait_for_release(
+    free_page,
+    job: BookingJob,
+    reload: Callable[[], Awaitable],
+    log_cb: Optional[Callable[[str], None]] = None,
+    scheduler: Optional[ReleaseScheduler] = None,
+    early_s: float = 0.0,
+) -> float:
+    """Block until midnight (server clock if `job.sync_server_clock`) and fire `reload`.
+
+    Keeps the connection warm meanwhile (`job.warmup_interval_s`) and returns
+    how long the first reload took, in seconds.
+    """
+    tracer = job.tracer or PhaseTracer()
+    warm = None
+    if job.warmup_interval_s > 0:
+
+        def warm(fire_local: float):
+            return keep_connection_warm(
+                free_page,
+                fire_local,
+                job.warmup_interval_s,
+                job.warmup_window_s,
+                job.warmup_last_ms / 1000,
+                log_cb=log_cb,
+            )
+
+    reload_s = []
 
-            if wait_for_midnight:
-                wait_s = seconds_until_midnight()
-                if wait_s > start_early_seconds:
-                    sleep_s = wait_s - start_early_seconds
+    async def first_reload():
+        started = time.perf_counter()
+        await reload()
+        reload_s.append(time.perf_counter() - started)
+
+    async with tracer.span("wait", server_clock=job.sync_server_clock, warmup=warm is not None) as span:
+        if job.sync_server_clock:
+            report = await wait_for_server_midnight(
+                free_page,
+                job.start_early_seconds,
+                log_cb=log_cb,
+                scheduler=scheduler,
+                reload=first_reload,
+                early_s=early_s,
+                warm=warm,
+                tz=job.portal_tz,
+            )
+            span.set(timer_error_ms=round(report.error_ms, 2))
+        else:
+            wait_s = seconds_until_midnight(job.portal_tz)
+            sleep_s = max(0.0, wait_s - job.start_early_seconds)
+            warm_task = asyncio.create_task(warm(time.time() + sleep_s + 0.2)) if warm else None
+            try:
+                if sleep_s > 0:
                     if log_cb:
-                        log_cb(f"Waiting {sleep_s:.0f}s (until {start_early_seconds}s before midnight)...")
-                    await asyncio.sleep(max(0, sleep_s))
+                        log_cb(f"Waiting {sleep_s:.0f}s (until {job.start_early_seconds}s before midnight)...")
+                    await asyncio.sleep(sleep_s)
                 await free_page.wait_for_timeout(200)
-                await free_page.reload(wait_until="domcontentloaded")
+            finally:
+                if warm_task is not None:
+                    warm_task.cancel()
+            await first_reload()
+        span.set(first_reload_ms=round(reload_s[0] * 1000, 1))
+    return reload_s[0]
+
+
+def report_first_reload(
+    job: BookingJob, warmed: bool, seconds: float, log_cb: Optional[Callable[[str], None]] = None
+):
+    """Log the first-reload latency next to the last one recorded with warm-up the other way."""
+    cache = SessionCache() if job.use_session_cache else None
+    meta = cache.record_first_reload(job.username, warmed, seconds) if cache else {}
+    if log_cb:
+        msg = f"First reload took {seconds * 1000:.0f} ms ({'with' if warmed else 'without'} warm-up)"
+        other = meta.get("cold_reload_s" if warmed else "warm_reload_s")
+        if other is not None:
+            msg += f"; last run {'without' if warmed else 'with'} warm-up {other * 1000:.0f} ms"
+        log_cb(msg + ".")
+
+
+async def open_racing_tabs(free_page, count: int, log_cb: Optional[Callable[[str], None]] = None) -> List:
+    """`free_page` plus `count - 1` more tabs on the same URL in the same (logged-in) context."""
+
+    async def open_tab():
+        page = await free_page.context.new_page()
+        page.set_default_timeout(6000)
+        page.set_default_navigation_timeout(8000)
+        await page.goto(free_page.url, wait_until="domcontentloaded")
+        return page
+
+    pages = [free_page] + list(await asyncio.gather(*(open_tab() for _ in range(count - 1))))
+    if log_cb:
+        log_cb(f"Opened {count} Free Fitness tabs for racing.")
+    return pages
+
 
+async def race_for_day(
+    pages: List,
+    job: BookingJob,
+    policy: RetryPolicy,
+    reloads: List[Callable[[], Awaitable]],
+    stagger_s: float,
+    log_cb: Optional[Callable[[str], None]] = None,
+):
+    """Reload the tabs in turn, `stagger_s` apart, until one of them clicks the target day.
+
+    Tab k first reloads k * `stagger_s` after the call and then every
+    len(pages) * `stagger_s` (longer once `policy` backs off). The first tab
+    whose in-page click lands wins; every other tab task is cancelled and
+    awaited before this returns, so only the winner can go on to confirm.
+    Returns (winner index, seconds from the start of the race).
+    """
+    day, month = job.target_date.day, job.target_date.month
+    period = stagger_s * len(pages)
+    started = time.monotonic()
+    winner: List[int] = []
+
+    async def tab(k: int):
+        await asyncio.sleep(k * stagger_s)
+        run = policy.begin(f"race_tab{k}")
+        while run.next_attempt():
+            try:
+                await reloads[k]()
+                outcome = await click_day_in_page(pages[k], day, month)
+            except Exception as e:
+                if log_cb:
+                    log_cb(f"Tab {k} attempt {run.attempt} failed ({e}).")
+                outcome = {"clicked": False}
+            if outcome["clicked"]:
+                if not winner:
+                    winner.append(k)
+                run.finish()
+                return
+            await asyncio.sleep(max(period, run.next_delay()))
+        run.finish()
+
+    tasks = [asyncio.create_task(tab(k)) for k in range(len(pages))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            await finished
+            if winner:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if not winner:
+        raise RuntimeError(f"No tab could click day {day}; attempts: {policy.summary()}")
+    return winner[0], time.monotonic() - started
+
+
+async def book_with_racing_tabs(
+    free_page,
+    job: BookingJob,
+    policy: RetryPolicy,
+    log_cb: Optional[Callable[[str], None]] = None,
+    scheduler: Optional[ReleaseScheduler] = None,
+    background: Optional[List["asyncio.Task"]] = None,
+) -> BookingResult:
+    """Racing mode: `job.race_tabs` tabs reload staggered across the release; the first
+    to click the day picks the slot and confirms, the others are cancelled and closed."""
+    tracer = job.tracer or PhaseTracer()
+    stagger_s = job.race_stagger_ms / 1000
+    if job.postback_fast_path and log_cb:
+        log_cb("Postback fast path is not used in racing mode.")
+    pages = await open_racing_tabs(free_page, job.race_tabs, log_cb=log_cb)
+    meters = []
+    reloads = []
+    for page in pages:
+        reload = page_reloader(page)
+        if job.network_profile:
+            meter = await install_network_profile(page, job.network_profile, log_cb=log_cb if page is free_page else None)
+            meters.append(meter)
+            reload = meter.reload
+        reloads.append(tracer.traced(reload, "reload"))
+    async with tracer.span("month_nav"):
+        await asyncio.gather(*(show_month(page, job.target_date) for page in pages))
+
+    if job.wait_for_midnight:
+        # No reload at the release itself: the race starts early enough to centre
+        # the staggered reloads on it.
+        await wait_for_release(
+            free_page,
+            job,
+            lambda: asyncio.sleep(0),
+            log_cb=log_cb,
+            scheduler=scheduler,
+            early_s=stagger_s * (job.race_tabs - 1) / 2,
+        )
+        policy.mark_release()
+
+    async with tracer.span("race", tabs=job.race_tabs, stagger_ms=job.race_stagger_ms) as span:
+        winner, race_s = await race_for_day(pages, job, policy, reloads, stagger_s, log_cb=log_cb)
+        span.set(winner=winner)
+    if log_cb:
+        log_cb(f"Tab {winner} clicked day {job.target_date.day} first, {race_s * 1000:.0f} ms into the race.")
+    for k, page in enumerate(pages):
+        if k != winner:
+            task = asyncio.create_task(page.close())
+            if background is not None:
+                background.append(task)
+
+    slot_selector, snapshot, outcome = await select_slot_and_confirm(
+        pages[winner], job, policy, log_cb=log_cb, background=background
+    )
+    if log_cb:
+        log_cb(f"Retry phases: {policy.summary()}")
+    return BookingResult(
+        label=job.label,
+        ok=outcome.ok,
+        slot_selector=slot_selector,
+        outcome=outcome.status,
+        message=outcome.message,
+        race_winner=winner,
+        race_ms=race_s * 1000,
+        slot_snapshot=snapshot,
+        reload_samples=[sample for meter in meters for sample in meter.samples],
+        phase_stats=policy.stats,
+    )
+
+
+def start_screenshot(
+    free_page,
+    path: str,
+    tracer: PhaseTracer,
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> "asyncio.Task":
+    """Write the screenshot in a background task; the caller awaits it before closing the page."""
+
+    async def shoot():
+        try:
+            async with tracer.span("screenshot"):
+                await free_page.screenshot(path=path, full_page=True)
             if log_cb:
-                log_cb("Clicking target day...")
-            await click_day_with_retry(free_page, target_day, target_month, attempts=day_attempts, log_cb=log_cb)
-
-            # Try primary slot, optionally fall back to others
-            slot_order: List[str] = [primary_slot_selector]
-            if try_other_slots:
-                all_slots = [SEL_SLOT_0, SEL_SLOT_1, SEL_SLOT_2, SEL_SLOT_3]
-                for s in all_slots:
-                    if s not in slot_order:
-                        slot_order.append(s)
-
-            last_error = None
-            for idx, slot_selector in enumerate(slot_order, 1):
-                try:
-                    if not await free_page.is_enabled(slot_selector):
-                        msg = f"Slot {idx-1} disabled/full; skipping."
-                        if log_cb:
-                            log_cb(msg)
-                        continue
+                log_cb(f"Screenshot saved to {path}.")
+        except Exception as e:
+            if log_cb:
+                log_cb(f"Screenshot failed: {e}")
+
+    return asyncio.create_task(shoot())
+
+
+async def outcome_after_lost_reply(free_page) -> Tuple[ConfirmOutcome, str]:
+    """What the page shows after a confirm whose reply was lost: BOOKED if it says so, else UNKNOWN.
+
+    Any other message may be left over from an earlier confirm, so only a
+    success is taken at face value.
+    """
+    try:
+        await free_page.wait_for_load_state("domcontentloaded", timeout=5000)
+        page_html = await free_page.content()
+    except Exception as e:
+        return ConfirmOutcome(UNKNOWN, f"confirm reply lost ({e})"), ""
+    outcome = outcome_from_html(page_html)
+    if outcome.status != BOOKED:
+        return ConfirmOutcome(UNKNOWN, "confirm reply lost; check the portal"), page_html
+    return outcome, page_html
+
+
+async def select_slot_and_confirm(
+    free_page,
+    job: BookingJob,
+    policy: RetryPolicy,
+    log_cb: Optional[Callable[[str], None]] = None,
+    background: Optional[List["asyncio.Task"]] = None,
+    profile: Optional[SelectorProfile] = None,
+):
+    """Submit the best enabled ranked slot and read the portal's reply to it.
+
+    Detection ends as soon as the confirm response arrives. A slot the portal
+    reports as full is dropped and the next ranked slot is tried from the grid
+    in that reply. A pass is repeated (as `policy` allows) only when the grid was
+    not rendered yet or a slot failed before confirm was clicked; once confirm
+    was clicked and its reply is lost, the run stops with what the page says
+    (BOOKED) or UNKNOWN, because the slot may already be booked. Returns
+    (selector, snapshot, outcome); raises BookingRejected for any other refusal.
+    The screenshot task, if any, is appended to `background`. A `profile` maps
+    fixed checkbox IDs to the time ranges they booked before and learns the
+    slot that books now.
+    """
+    tracer = job.tracer or PhaseTracer()
+    run = policy.begin("slot")
+    snapshot: List[SlotInfo] = []
+    last_error = None
+    tried = set()
+    form_action: Optional[str] = None
+    preferences = profile.resolve(job.ranked_preferences()) if profile else job.ranked_preferences()
+    while run.next_attempt():
+        try:
+            async with tracer.span("slot_check", attempt=run.attempt):
+                await free_page.wait_for_selector(SEL_SLOT_GRID, state="attached")
+                snapshot = await read_slot_grid(free_page, SEL_SLOT_GRID)
+        except Exception as e:
+            last_error = e
+            if log_cb:
+                log_cb(f"Slot grid not ready on attempt {run.attempt} ({e}).")
+            await run.pause()
+            continue
+        if log_cb:
+            log_cb(f"Slot grid: {describe_slots(snapshot)}")
+
+        retry = False
+        pending = rank_slots(snapshot, preferences)
+        while pending:
+            slot = pending.pop(0)
+            slot_selector = slot.selector
+            if slot.id in tried:
+                continue
+            if not slot.enabled:
+                if log_cb:
+                    log_cb(f"Slot {slot.index} disabled/full; skipping.")
+                continue
+            confirm_clicked = False
+            try:
+                async with tracer.span("slot_check", slot=slot.index):
                     await free_page.check(slot_selector, force=True)
-                    if log_cb:
-                        log_cb(f"Slot selected ({slot_selector}); submitting.")
-                    await free_page.click(SEL_CONFIRM)
-                    if log_cb:
-                        log_cb("Confirm clicked; waiting for server response.")
-                    await free_page.wait_for_timeout(1500)
-                    await free_page.screenshot(path="booking_result.png", full_page=True)
-                    if log_cb:
-                        log_cb("Attempted booking; see booking_result.png")
-                        log_cb("Booking flow completed (check booking_result.png or portal for success).")
-                    return
-                except Exception as e:
+                    if form_action is None:
+                        form_action = await free_page.evaluate(FORM_ACTION_JS)
+                if log_cb:
+                    log_cb(f"Slot selected ({slot_selector}); submitting.")
+                async with tracer.span("confirm", slot=slot.index) as span:
+                    async with free_page.expect_response(is_form_post(form_action)) as reply:
+                        await free_page.click(SEL_CONFIRM)
+                        confirm_clicked = True
+                    page_html = await (await reply.value).text()
+                    outcome = outcome_from_html(page_html)
+                    span.set(reply=outcome.status)
+            except Exception as e:
+                if not confirm_clicked:
                     last_error = e
-                    msg = f"Slot attempt failed ({slot_selector}): {e}"
+                    retry = True
                     if log_cb:
-                        log_cb(msg)
+                        log_cb(f"Slot attempt failed before confirm ({slot_selector}): {e}")
                     continue
+                # The confirm went out, so it may have booked: never move on to another slot.
+                outcome, page_html = await outcome_after_lost_reply(free_page)
+                if log_cb:
+                    log_cb(f"No readable reply to the confirm for {slot_selector} ({e}); page says {outcome.status}.")
+            tried.add(slot.id)
+            if log_cb:
+                log_cb(f"Portal reply for {slot_selector}: {outcome.status} ({outcome.message or 'no message'}).")
+            if outcome.status == FULL:
+                snapshot = slots_from_html(page_html) or snapshot
+                await free_page.wait_for_load_state("domcontentloaded")
+                pending = rank_slots(snapshot, preferences)
+                continue
 
-            if last_error:
-                raise RuntimeError(f"All slots failed; last error: {last_error}")
-            else:
-                raise RuntimeError("All slots disabled/full; no booking submitted.")
+            run.finish()
+            if job.screenshot_path:
+                task = start_screenshot(free_page, job.screenshot_path, tracer, log_cb=log_cb)
+                if background is not None:
+                    background.append(task)
+            if outcome.status not in (BOOKED, UNKNOWN):
+                raise BookingRejected(outcome, snapshot)
+            if profile and outcome.ok:
+                profile.learn_slot(slot)
+            return slot_selector, snapshot, outcome
+        if not retry:
+            break
+        await run.pause()
+    run.finish()
+
+    if last_error:
+        raise NoSlotAvailable(f"All slots failed; last error: {last_error}", snapshot)
+    else:
+        raise NoSlotAvailable("All slots disabled/full; no booking submitted.", snapshot)
+
+
+async def book_on_free_page(
+    free_page,
+    job: BookingJob,
+    log_cb: Optional[Callable[[str], None]] = None,
+    scheduler: Optional[ReleaseScheduler] = None,
+    background: Optional[List["asyncio.Task"]] = None,
+) -> BookingResult:
+    """Wait for the release if asked, click the day, then pick a slot and confirm."""
+    target_day = job.target_date.day
+    target_month = job.target_date.month
+    if log_cb:
+        log_cb(f"Target date: {job.target_date}, day: {target_day}, month: {target_month}")
+
+    tracer = job.tracer or PhaseTracer()
+    policy = job.retry_policy or RetryPolicy.fixed(job.day_attempts, 50)
+    if job.race_tabs > 1:
+        return await book_with_racing_tabs(
+            free_page, job, policy, log_cb=log_cb, scheduler=scheduler, background=background
+        )
+
+    meter = None
+    reload = page_reloader(free_page)
+    if job.network_profile:
+        meter = await install_network_profile(free_page, job.network_profile, log_cb=log_cb)
+        reload = meter.reload
+    reload = policy.throttled(tracer.traced(reload, "reload"))
+
+    # Before the wait: reloading the month postback keeps the month on screen.
+    profile = SelectorProfile() if job.learn_selectors else None
+    async with tracer.span("month_nav") as span:
+        span.set(attempts=await show_month(free_page, job.target_date, log_cb=log_cb))
+        if profile:
+            known = profile.use(page_fingerprint(await free_page.content()))
+            span.set(fingerprint=profile.fingerprint, learned=known)
+            if log_cb:
+                learned = f"day strategy {profile.day_order()[0]}" if known else "nothing learned yet"
+                log_cb(f"Page fingerprint {profile.fingerprint}: {learned}.")
+
+    if job.wait_for_midnight:
+        first_reload_s = await wait_for_release(free_page, job, reload, log_cb=log_cb, scheduler=scheduler)
+        policy.mark_release()
+        report_first_reload(job, job.warmup_interval_s > 0, first_reload_s, log_cb=log_cb)
+
+    if job.postback_fast_path:
+        async with tracer.span("postback") as span:
+            result = await book_via_postback(
+                free_page, job, log_cb=log_cb, reload=reload, policy=policy, profile=profile
+            )
+            span.set(outcome="ok" if result else "fallback")
+        if result is not None:
+            if profile:
+                profile.save()
+            return result
+
+    if log_cb:
+        log_cb("Clicking target day...")
+    async with tracer.span("day_click", mode=job.day_click_mode) as span:
+        try:
+            counter = await click_day_with_retry(
+                free_page,
+                target_day,
+                target_month,
+                log_cb=log_cb,
+                mode=job.day_click_mode,
+                reload=reload,
+                policy=policy,
+                profile=profile,
+            )
+        finally:
+            span.set(attempts=policy.stats["day_click"].attempts)
+    if meter and log_cb:
+        log_cb(f"Reloads: {meter.summary()}")
+
+    slot_selector, snapshot, outcome = await select_slot_and_confirm(
+        free_page, job, policy, log_cb=log_cb, background=background, profile=profile
+    )
+    if profile:
+        profile.save()
+    if log_cb:
+        log_cb(f"Retry phases: {policy.summary()}")
+    return BookingResult(
+        label=job.label,
+        ok=outcome.ok,
+        slot_selector=slot_selector,
+        outcome=outcome.status,
+        message=outcome.message,
+        day_round_trips=counter.per_attempt,
+        slot_snapshot=snapshot,
+        reload_samples=meter.samples if meter else [],
+        phase_stats=policy.stats,
+    )
+
+
+async def run_booking(
+    username: str,
+    password: str,
+    target_date: datetime.date,
+    primary_slot_selector: str,
+    wait_for_midnight: bool,
+    log_cb: Optional[Callable[[str], None]] = None,
+    headless: bool = False,
+    **options,
+) -> BookingResult:
+    """Launch Chromium, book one slot and close the browser.
+
+    `options` are the remaining `BookingJob` fields (try_other_slots, day_attempts,
+    phase_budgets, deadline_s, ...). The deadline covers the launch too; the
+    browser is closed however the run ends.
+    """
+    from playwright.async_api import async_playwright  # deferred: importing the backend stays cheap
+
+    job = BookingJob(username, password, target_date, primary_slot_selector, wait_for_midnight, **options)
+    budget = job_budget(job)
+    async with async_playwright() as p:
+        browser = None
+        try:
+            async with budget.deadline():
+                async with job.tracer.span("launch"):
+                    browser = await launch_browser(p, headless=headless, profile=job.launch_profile)
+                return await book_in_browser(browser, job, log_cb=log_cb)
+        except PhaseTimeout as e:
+            if log_cb:
+                log_cb(f"Stopped: {e}.")
+            return timeout_result(job, e)
+        finally:
+            if browser is not None:
+                await close_within(browser)
+
+
+async def run_batch(
+    username: str,
+    password: str,
+    entries: Sequence[BatchEntry],
+    primary_slot_selector: str,
+    wait_for_midnight: bool = False,
+    log_cb: Optional[Callable[[str], None]] = None,
+    headless: bool = False,
+    **options,
+) -> List[BookingResult]:
+    """Launch Chromium once and book every (date, slot preferences) entry in one session.
+
+    `options` are the remaining `BookingJob` fields, shared by all entries. The
+    deadline covers the launch too.
+    """
+    from playwright.async_api import async_playwright
+
+    if not entries:
+        return []
+    job = BookingJob(username, password, entries[0][0], primary_slot_selector, wait_for_midnight, **options)
+    budget = job_budget(job)
+    budget.start()  # the launch and the batch share one deadline
+    async with async_playwright() as p:
+        browser = None
+        try:
+            try:
+                async with budget.deadline():
+                    async with job.tracer.span("launch"):
+                        browser = await launch_browser(p, headless=headless, profile=job.launch_profile)
+            except PhaseTimeout as e:
+                if log_cb:
+                    log_cb(f"Stopped: {e}.")
+                results = []
+                for date, _ in entries:
+                    result = timeout_result(job, e)
+                    result.label = f"{job.label} {date}"
+                    results.append(result)
+                return results
+            # Entered again with what is left, so the dates already done keep their results on a timeout.
+            return await book_batch_in_browser(browser, job, entries, log_cb=log_cb)
         finally:
-            await browser.close()
+            if browser is not None:
+                await close_within(browser)
@@ -0,0 +1,205 @@
+"""Headless command-line entry point for cron/systemd; no Tk, Playwright only once a run starts.
+
+Reads the GUI's booking_config.json. A "jobs" list books several accounts
+at once, each entry overriding the top-level keys:
+
+    {"wait_midnight": true, "slot_idx": "2", "day": 25, "month": 11,
+     "jobs": [{"username": "anna", "password": "..."},
+              {"username": "bruno", "password": "...", "slot_idx": "3"}]}
+
+Exit status: 0 when every job booked, 1 when any did not, 2 for a bad
+config, 130 when interrupted.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import dataclasses  # noqa: E402
+import datetime  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import List, Optional  # noqa: E402
+
+import booking_backend as bb  # noqa: E402
+from launch_profile import PROFILES, get_profile, measure_profile  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CONFIG = 2
+EXIT_INTERRUPTED = 130
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def peak_rss_mib() -> Optional[float]:
+    """Peak resident set size of this process, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def startup_report(stage: str) -> str:
+    rss = peak_rss_mib()
+    elapsed_ms = (time.perf_counter() - _STARTED) * 1000
+    return f"{stage}: {elapsed_ms:.0f} ms since start" + (f", peak RSS {rss:.1f} MiB" if rss is not None else "")
+
+
+def slot_selector_from(cfg: dict) -> str:
+    slot_idx = int(cfg.get("slot_idx", 0))
+    if not 0 <= slot_idx < len(bb.SLOT_SELECTORS):
+        raise ConfigError(f"slot_idx must be 0-{len(bb.SLOT_SELECTORS) - 1}, not {slot_idx}")
+    return bb.SLOT_SELECTORS[slot_idx]
+
+
+def target_date_from(cfg: dict) -> datetime.date:
+    if cfg.get("date"):
+        return datetime.date.fromisoformat(cfg["date"])
+    today = datetime.date.today()
+    date = datetime.date(today.year, int(cfg["month"]), int(cfg["day"]))
+    # A December run for early January means next year.
+    return date if date >= today else date.replace(year=today.year + 1)
+
+
+def job_from_config(cfg: dict) -> bb.BookingJob:
+    try:
+        retry_window_s = float(cfg.get("retry_window_s", 0) or 0)
+        return bb.BookingJob(
+            cfg["username"],
+            cfg["password"],
+            target_date_from(cfg),
+            slot_selector_from(cfg),
+            bb.parse_flag(cfg.get("wait_midnight", False), "wait_midnight"),
+            try_other_slots=bb.parse_flag(cfg.get("try_other_slots", False), "try_other_slots"),
+            learn_selectors=bb.parse_flag(cfg.get("learn_selectors", False), "learn_selectors"),
+            day_attempts=int(cfg.get("day_attempts", 5)),
+            retry_policy=RetryPolicy.hammer(deadline_s=retry_window_s) if retry_window_s > 0 else None,
+            warmup_interval_s=float(cfg.get("warmup_interval_s", 20.0)),
+            warmup_window_s=float(cfg.get("warmup_window_s", 180.0)),
+            launch_profile=get_profile(cfg.get("launch_profile", "default")).name,
+            phase_budgets={k: float(v) for k, v in (cfg.get("phase_budgets") or {}).items()} or None,
+            deadline_s=float(cfg["deadline_s"]) if cfg.get("deadline_s") else None,
+            label=cfg.get("label", ""),
+        )
+    except KeyError as e:
+        raise ConfigError(f"missing key {e}") from None
+    except (ValueError, TypeError, IndexError, AttributeError) as e:
+        raise ConfigError(str(e)) from None
+
+
+def jobs_from_config(cfg: dict) -> List[bb.BookingJob]:
+    entries = cfg.get("jobs") or [{}]
+    shared = {k: v for k, v in cfg.items() if k != "jobs"}
+    return [job_from_config({**shared, **entry}) for entry in entries]
+
+
+def load_config(path: Path) -> dict:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ConfigError(f"{path} not found") from None
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path}: {e}") from None
+
+
+async def run_jobs(jobs: List[bb.BookingJob], headless: bool, concurrency: int, log_cb) -> List[bb.BookingResult]:
+    if len(jobs) == 1:
+        job = jobs[0]
+        try:
+            fields = {f.name: getattr(job, f.name) for f in dataclasses.fields(job)}
+            return [await bb.run_booking(log_cb=log_cb, headless=headless, **fields)]
+        except Exception as e:
+            log_cb(f"Failed: {e}")
+            return [bb.BookingResult(label=job.label, ok=False, error=str(e), slot_snapshot=getattr(e, "snapshot", []))]
+    import multi_account
+
+    return await multi_account.run_accounts(jobs, concurrency=concurrency, headless=headless, log_cb=log_cb)
+
+
+async def measure_profiles(names: List[str], url: Optional[str], runs: int) -> List[str]:
+    """Launch latency and peak memory of each launch profile, one summary line each.
+
+    Without `url` every browser loads the Free Fitness page of a local mock
+    portal, so measuring never touches the real one.
+    """
+    from playwright.async_api import async_playwright
+
+    import mock_portal
+
+    with mock_portal.MockPortal() as portal:
+        async with async_playwright() as p:
+            return [(await measure_profile(p, name, url or portal.free_fitness_url, runs)).summary() for name in names]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Book gym slots without the GUI.")
+    parser.add_argument("-c", "--config", type=Path, default=Path("booking_config.json"))
+    parser.add_argument("--headed", action="store_true", help="show the browser window")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="launch profile unless a job sets its own")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs in flight at once")
+    parser.add_argument("--check", action="store_true", help="validate the config and exit")
+    parser.add_argument("--startup-report", action="store_true", help="print startup time and peak RSS")
+    parser.add_argument("--record", type=Path, help="save a scrubbed HAR and trace of each job in this directory")
+    parser.add_argument(
+        "--measure-profiles", nargs="+", choices=sorted(PROFILES), metavar="PROFILE",
+        help="report launch latency and peak RSS of these launch profiles and exit",
+    )
+    parser.add_argument("--measure-runs", type=int, default=3, help="browsers launched per measured profile")
+    parser.add_argument("--measure-url", help="page each measured browser loads (default: a local mock portal)")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.measure_profiles:
+        for line in asyncio.run(measure_profiles(args.measure_profiles, args.measure_url, args.measure_runs)):
+            print(line)
+        return EXIT_OK
+
+    def log_cb(msg: str):
+        if not args.quiet:
+            print(f"{datetime.datetime.now():%H:%M:%S.%f}"[:-3] + f" {msg}", flush=True)
+
+    try:
+        cfg = load_config(args.config)
+        if args.profile:
+            cfg["launch_profile"] = args.profile
+        jobs = jobs_from_config(cfg)
+        if args.record:
+            args.record.mkdir(parents=True, exist_ok=True)
+            for i, job in enumerate(jobs):
+                stem = f"{i:02d}_{''.join(c if c.isalnum() else '_' for c in job.label)}"
+                job.record_har = str(args.record / f"{stem}.har")
+                job.record_trace = str(args.record / f"{stem}.zip")
+    except ConfigError as e:
+        print(f"Config error: {e}", file=sys.stderr)
+        return EXIT_CONFIG
+    if args.startup_report:
+        print(startup_report("config loaded"), file=sys.stderr)
+    if args.check:
+        for job in jobs:
+            print(f"{job.label}: {job.target_date} {job.primary_slot_selector} wait_for_midnight={job.wait_for_midnight}")
+        return EXIT_OK
+
+    try:
+        results = asyncio.run(run_jobs(jobs, not args.headed, args.concurrency, log_cb))
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    finally:
+        if args.startup_report:
+            print(startup_report("finished"), file=sys.stderr)
+    for result in results:
+        status = result.outcome or ("ok" if result.ok else "failed")
+        print(f"{result.label}: {status} {result.slot_selector or ''} {result.error or result.message}".rstrip())
+    return EXIT_OK if all(r.ok for r in results) else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
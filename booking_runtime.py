@@ -0,0 +1,119 @@
+"""Long-lived asyncio loop thread that owns Playwright and a warmed-up Chromium."""
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from playwright.async_api import async_playwright
+
+import booking_backend as bb
+from clock_sync import ReleaseScheduler
+
+T = TypeVar("T")
+
+
+class BookingRuntime:
+    """Runs booking coroutines on one background event loop, sharing one browser.
+
+    `start()` launches the loop thread and immediately starts Chromium (plus a
+    throwaway context and page to warm it up), so a GUI can do this while the
+    user is still typing. Work goes in through `submit()`/`book()`, which are
+    safe to call from any thread and return `concurrent.futures.Future`s;
+    `future.cancel()` cancels the running coroutine (the booking context is
+    closed by its own `finally`). `shutdown()` cancels what is left, closes the
+    browser and stops the loop.
+    """
+
+    def __init__(
+        self,
+        headless: bool = False,
+        log_cb: Optional[Callable[[str], None]] = None,
+        profile: str = "default",
+    ):
+        self.headless = headless
+        self.profile = profile
+        self.log_cb = log_cb
+        self.loop = asyncio.new_event_loop()
+        self.warmup: Optional[concurrent.futures.Future] = None
+        self._thread = threading.Thread(target=self._run, name="booking-runtime", daemon=True)
+        self._playwright = None
+        self._browser = None
+        self._browser_lock: Optional[asyncio.Lock] = None
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def start(self) -> "BookingRuntime":
+        self._thread.start()
+        self.warmup = self.call(self._ensure_browser())
+        self.warmup.add_done_callback(self._warmup_done)
+        return self
+
+    def _warmup_done(self, fut: concurrent.futures.Future):
+        if not fut.cancelled() and fut.exception() is not None and self.log_cb:
+            self.log_cb(f"Browser warm-up failed ({fut.exception()}); retrying on the first booking.")
+
+    def call(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """Schedule `coro` on the runtime loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _ensure_browser(self):
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            started = time.monotonic()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await bb.launch_browser(self._playwright, headless=self.headless, profile=self.profile)
+            context = await bb.new_booking_context(self._browser, profile=self.profile)
+            await context.new_page()
+            await context.close()
+            if self.log_cb:
+                self.log_cb(f"Browser ready in {time.monotonic() - started:.2f}s.")
+            return self._browser
+
+    def submit(self, fn: Callable[..., Awaitable[T]]) -> "concurrent.futures.Future[T]":
+        """Run `fn(browser)` on the loop once the browser is up (relaunched if it died)."""
+
+        async def run():
+            return await fn(await self._ensure_browser())
+
+        return self.call(run())
+
+    def book(
+        self,
+        job: bb.BookingJob,
+        log_cb: Optional[Callable[[str], None]] = None,
+        scheduler: Optional[ReleaseScheduler] = None,
+    ) -> "concurrent.futures.Future[bb.BookingResult]":
+        return self.submit(lambda browser: bb.book_in_browser(browser, job, log_cb=log_cb, scheduler=scheduler))
+
+    async def _close(self):
+        current = asyncio.current_task()
+        pending = [t for t in asyncio.all_tasks() if t is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Cancel running jobs, close the browser and Playwright, stop and join the loop thread."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self.call(self._close()).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
@@ -0,0 +1,222 @@
+"""Long-running watcher that books slots freed up by cancellations."""
+import asyncio
+import collections
+import datetime
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+import booking_backend as bb
+from confirm_outcome import ALREADY, BOOKED, FULL, UNKNOWN, ConfirmOutcome, outcome_from_html
+from postback import ConfirmUnread, DayNotReady, PostbackEngine, PostbackMismatch
+from retry_policy import RetryPolicy
+from slot_grid import SlotPreference, rank_slots, slots_from_html
+
+MAX_BACKOFF_S = 1800.0
+
+
+@dataclass
+class WatchTarget:
+    date: datetime.date
+    preferences: List[SlotPreference] = field(default_factory=lambda: ["*"])
+
+
+@dataclass
+class WatchEvent:
+    at: float  # epoch seconds
+    date: Optional[datetime.date]
+    kind: str  # opened | closed | freed | filled | booked | unknown | rejected | dropped | session | error
+    detail: str = ""
+
+
+class CancellationWatcher:
+    """Polls the Free Fitness grid of several dates over one logged-in session.
+
+    Every `interval_s` (+/- `jitter`) each target date is selected with a
+    postback, its grid is diffed against the previous poll and the best
+    enabled preferred slot is booked at once; a booked (or already booked)
+    date leaves the watch list. Requests are spaced at least
+    `min_request_interval_s` apart. The polls themselves keep the session
+    alive as long as `interval_s` is below the portal's session timeout; an
+    expired session or any other failure leads to a fresh login, with
+    exponential backoff while failures repeat. Memory stays bounded: one grid
+    snapshot per target and the last `max_events` events.
+    """
+
+    def __init__(
+        self,
+        job: bb.BookingJob,
+        targets: Sequence[WatchTarget],
+        interval_s: float = 60.0,
+        jitter: float = 0.2,
+        min_request_interval_s: float = 2.0,
+        max_events: int = 500,
+        log_cb: Optional[Callable[[str], None]] = None,
+    ):
+        self.job = job
+        self.targets: List[WatchTarget] = sorted(targets, key=lambda t: t.date)
+        self.interval_s = interval_s
+        self.jitter = jitter
+        self.pacing = RetryPolicy(min_reload_interval_ms=min_request_interval_s * 1000)
+        self.events: Deque[WatchEvent] = collections.deque(maxlen=max_events)
+        self.results: List[bb.BookingResult] = []
+        self.polls = 0
+        self.log_cb = log_cb
+        self._grids: Dict[datetime.date, Optional[Dict[str, bool]]] = {}  # None: day not open
+        self._engine: Optional[PostbackEngine] = None
+
+    def _event(self, date: Optional[datetime.date], kind: str, detail: str = ""):
+        self.events.append(WatchEvent(time.time(), date, kind, detail))
+        if self.log_cb:
+            self.log_cb(f"{date or '-'} {kind}: {detail}" if detail else f"{date or '-'} {kind}")
+
+    async def _paced(self, call: Callable[[], Awaitable]):
+        return await self.pacing.throttled(call, "watch")()
+
+    async def _login(self, context):
+        free_page = await bb.login_and_open_free_page(context, self.job, log_cb=self.log_cb)
+        self._engine = PostbackEngine(context.request, free_page.url, await free_page.content())
+        for page in context.pages:
+            await page.close()
+        self._event(None, "session", "logged in")
+
+    def _diff(self, date: datetime.date, grid: Optional[Dict[str, bool]], labels: Dict[str, str]):
+        if date not in self._grids:
+            self._grids[date] = grid
+            return
+        before = self._grids[date]
+        self._grids[date] = grid
+        if before is None and grid is not None:
+            self._event(date, "opened")
+        elif before is not None and grid is None:
+            self._event(date, "closed")
+        if before is None or grid is None:
+            return
+        for slot_id, enabled in grid.items():
+            if enabled and not before.get(slot_id, False):
+                self._event(date, "freed", labels[slot_id])
+            elif not enabled and before.get(slot_id, False):
+                self._event(date, "filled", labels[slot_id])
+
+    async def _check(self, target: WatchTarget):
+        engine = self._engine
+        try:
+            await self._paced(lambda: engine.select_day(target.date, bb.MONTH_IT))
+        except DayNotReady:
+            self._diff(target.date, None, {})
+            return
+        snapshot = slots_from_html(engine.html)
+        self._diff(target.date, {s.id: s.enabled for s in snapshot}, {s.id: s.label for s in snapshot})
+
+        for slot in rank_slots(snapshot, target.preferences):
+            if not slot.enabled:
+                continue
+            try:
+                page_html = await self._paced(lambda: engine.confirm(slot.id))
+                outcome = outcome_from_html(page_html)
+            except ConfirmUnread as e:
+                # It may have booked: stop watching this date rather than confirm again.
+                outcome = ConfirmOutcome(UNKNOWN, str(e))
+            if outcome.status == FULL:
+                self._event(target.date, "filled", f"{slot.label} taken before our confirm")
+                continue
+            if outcome.status in (BOOKED, ALREADY, UNKNOWN):
+                event = "booked" if outcome.ok else "unknown" if outcome.status == UNKNOWN else "rejected"
+                self._event(target.date, event, f"{slot.label}: {outcome.message}")
+                self.targets.remove(target)
+                self._grids.pop(target.date, None)
+                self.results.append(
+                    bb.BookingResult(
+                        label=self.job.label,
+                        ok=outcome.ok,
+                        slot_selector=slot.selector,
+                        outcome=outcome.status,
+                        message=outcome.message,
+                        slot_snapshot=snapshot,
+                    )
+                )
+            else:
+                self._event(target.date, "rejected", f"{slot.label}: {outcome.message or outcome.status}")
+            return
+
+    async def poll_once(self):
+        """One pass over every target date; needs a logged-in engine."""
+        today = datetime.date.today()
+        await self._paced(self._engine.refresh)  # fresh calendar; doubles as the keep-alive
+        for target in list(self.targets):
+            if target.date < today:
+                self.targets.remove(target)
+                self._grids.pop(target.date, None)
+                self._event(target.date, "dropped", "date has passed")
+                continue
+            await self._check(target)
+        self._engine.timings.clear()
+        self.polls += 1
+
+    async def _sleep(self, seconds: float, stop: Optional[asyncio.Event]) -> bool:
+        """Sleep `seconds` or until `stop` is set; True when stopped."""
+        if stop is None:
+            await asyncio.sleep(seconds)
+            return False
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(
+        self,
+        headless: bool = True,
+        stop: Optional[asyncio.Event] = None,
+        max_polls: Optional[int] = None,
+    ) -> List[bb.BookingResult]:
+        """Watch until every target is booked or gone, `stop` is set or `max_polls` ran."""
+        from playwright.async_api import async_playwright  # deferred: importing the watcher stays cheap
+
+        async with async_playwright() as p:
+            browser = await bb.launch_browser(p, headless=headless, profile=self.job.launch_profile)
+            context = None
+
+            async def login():
+                nonlocal context
+                if context is not None:
+                    await context.close()
+                context = await bb.new_booking_context(browser, profile=self.job.launch_profile)
+                await self._login(context)
+
+            try:
+                return await self.watch(login, stop=stop, max_polls=max_polls)
+            finally:
+                if context is not None:
+                    await context.close()
+                await browser.close()
+
+    async def watch(
+        self,
+        login: Callable[[], Awaitable],
+        stop: Optional[asyncio.Event] = None,
+        max_polls: Optional[int] = None,
+    ) -> List[bb.BookingResult]:
+        """The poll loop of `run()`; `login()` must leave a logged-in engine in `_engine`."""
+        failures = 0
+        while self.targets and (max_polls is None or self.polls < max_polls):
+            try:
+                if self._engine is None:
+                    await login()
+                await self.poll_once()
+                failures = 0
+                delay = self.interval_s * (1 + random.uniform(-self.jitter, self.jitter))
+            except PostbackMismatch as e:
+                failures += 1
+                self._engine = None
+                self._event(None, "session", f"lost ({e}); logging in again")
+                delay = min(MAX_BACKOFF_S, self.interval_s * 2 ** (failures - 1))
+            except Exception as e:
+                failures += 1
+                self._engine = None
+                self._event(None, "error", str(e))
+                delay = min(MAX_BACKOFF_S, self.interval_s * 2 ** (failures - 1))
+            if self.targets and await self._sleep(delay, stop):
+                break
+        return self.results
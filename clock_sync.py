@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import email.utils
+import http.client
+import math
+import time
+import urllib.parse
+import zoneinfo
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+# Once the remaining wait drops below FINE_WINDOW_S we stop trusting the event
+# loop's coarse timers and sleep in 1 ms steps; the last SPIN_WINDOW_S is a
+# busy-wait on the monotonic clock.
+FINE_WINDOW_S = 0.05
+SPIN_WINDOW_S = 0.002
+
+# The portal's day rolls over at midnight in Turin, whatever zone the host runs in.
+PORTAL_TZ = zoneinfo.ZoneInfo("Europe/Rome")
+
+
+@dataclass
+class ClockSample:
+    t_send: float  # local epoch seconds, just before the request went out
+    t_recv: float  # local epoch seconds, when the response headers arrived
+    server_second: float  # value of the Date header (1 s resolution)
+
+    @property
+    def rtt(self) -> float:
+        return self.t_recv - self.t_send
+
+
+@dataclass
+class ClockOffset:
+    offset: float  # server clock minus local clock, seconds
+    uncertainty: float  # half-width of the bracketing interval, seconds
+    rtt: float  # best round trip seen while sampling, seconds
+    samples: int
+
+    def server_now(self) -> float:
+        return time.time() + self.offset
+
+    def to_local(self, server_ts: float) -> float:
+        return server_ts - self.offset
+
+
+@dataclass
+class FireReport:
+    target_server: float  # instant we aimed for, server epoch seconds
+    error_ms: float  # how late (positive) or early (negative) we woke up
+    offset: ClockOffset
+
+
+class _EpochClock:
+    """Epoch time derived from the monotonic clock so NTP steps cannot bite mid-run."""
+
+    def __init__(self):
+        self.anchor_wall = time.time()
+        self.anchor_mono = time.monotonic()
+
+    def now(self) -> float:
+        return self.anchor_wall + (time.monotonic() - self.anchor_mono)
+
+
+def _sample_offsets(url: str, samples: int, timeout: float) -> List[ClockSample]:
+    parts = urllib.parse.urlsplit(url)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parts.hostname, parts.port, timeout=timeout)
+    path = parts.path or "/"
+    clock = _EpochClock()
+
+    def one() -> ClockSample:
+        t_send = clock.now()
+        conn.request("HEAD", path, headers={"Cache-Control": "no-cache"})
+        resp = conn.getresponse()
+        t_recv = clock.now()
+        resp.read()
+        date = resp.getheader("Date")
+        if not date:
+            raise RuntimeError(f"{url} did not send a Date header; cannot estimate server clock")
+        return ClockSample(t_send, t_recv, email.utils.parsedate_to_datetime(date).timestamp())
+
+    try:
+        one()  # pays for DNS/TCP/TLS so the measured round trips are steady-state
+        collected: List[ClockSample] = []
+        for _ in range(samples):
+            if collected:
+                # Aim the request so the server stamps it right on the predicted
+                # second boundary; whichever side it lands on halves the interval.
+                estimate = offset_from_samples(collected)
+                half_rtt = estimate.rtt / 2
+                boundary = math.ceil(clock.now() + estimate.offset + half_rtt + 0.05)
+                time.sleep(max(0.0, boundary - estimate.offset - half_rtt - clock.now()))
+            collected.append(one())
+        return collected
+    finally:
+        conn.close()
+
+
+def offset_from_samples(samples: List[ClockSample]) -> ClockOffset:
+    """Intersect the per-sample offset intervals; each one is widened by its own RTT."""
+    lo, hi = -math.inf, math.inf
+    for s in samples:
+        s_lo, s_hi = s.server_second - s.t_recv, s.server_second + 1 - s.t_send
+        if max(lo, s_lo) > min(hi, s_hi):
+            # Inconsistent stamp (load balancer with another clock?); start over from this sample.
+            lo, hi = s_lo, s_hi
+        else:
+            lo, hi = max(lo, s_lo), min(hi, s_hi)
+    return ClockOffset(
+        offset=(lo + hi) / 2,
+        uncertainty=(hi - lo) / 2,
+        rtt=min(s.rtt for s in samples),
+        samples=len(samples),
+    )
+
+
+async def estimate_offset(url: str, samples: int = 8, timeout: float = 5.0) -> ClockOffset:
+    """Estimate server-minus-local clock offset from the HTTP Date headers of `url`."""
+    collected = await asyncio.to_thread(_sample_offsets, url, samples, timeout)
+    return offset_from_samples(collected)
+
+
+def next_midnight(server_now: float, tz: datetime.tzinfo = PORTAL_TZ) -> float:
+    """Epoch seconds of the first midnight after `server_now`, in `tz` (default: the portal's zone)."""
+    now = datetime.datetime.fromtimestamp(server_now, tz)
+    tomorrow = now.date() + datetime.timedelta(days=1)
+    midnight = datetime.datetime.combine(tomorrow, datetime.time(0, 0), tzinfo=now.tzinfo)
+    return midnight.timestamp()
+
+
+async def sleep_until(local_ts: float) -> float:
+    """Sleep until epoch `local_ts` on the local clock; returns the wake-up error in seconds."""
+    deadline = time.monotonic() + (local_ts - time.time())
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= FINE_WINDOW_S:
+            break
+        await asyncio.sleep(remaining - FINE_WINDOW_S)
+    while deadline - time.monotonic() > SPIN_WINDOW_S:
+        await asyncio.sleep(0.001)
+    while time.monotonic() < deadline:
+        pass
+    return time.monotonic() - deadline
+
+
+class ReleaseScheduler:
+    """Fires at an instant on the portal's clock rather than ours."""
+
+    def __init__(
+        self,
+        url: str,
+        tz: datetime.tzinfo = PORTAL_TZ,
+        samples: int = 8,
+        log_cb: Optional[Callable[[str], None]] = None,
+    ):
+        self.url = url
+        self.tz = tz
+        self.samples = samples
+        self.log_cb = log_cb
+        self.offset: Optional[ClockOffset] = None
+        self.synced_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def sync(self, max_age_s: Optional[float] = None) -> ClockOffset:
+        """Measure the offset; with `max_age_s`, reuse a measurement that is still fresh.
+
+        Concurrent callers (one per account in a batch) share one measurement.
+        """
+        async with self._lock:
+            if (
+                max_age_s is not None
+                and self.offset is not None
+                and time.monotonic() - self.synced_at < max_age_s
+            ):
+                return self.offset
+            self.offset = await estimate_offset(self.url, samples=self.samples)
+            self.synced_at = time.monotonic()
+        if self.log_cb:
+            self.log_cb(
+                f"Server clock offset {self.offset.offset:+.3f}s "
+                f"(±{self.offset.uncertainty * 1000:.0f} ms, rtt {self.offset.rtt * 1000:.0f} ms)."
+            )
+        return self.offset
+
+    def next_release(self) -> float:
+        if self.offset is None:
+            raise RuntimeError("ReleaseScheduler.sync() must run before next_release()")
+        return next_midnight(self.offset.server_now(), self.tz)
+
+    def seconds_until(self, server_ts: float) -> float:
+        if self.offset is None:
+            raise RuntimeError("ReleaseScheduler.sync() must run before seconds_until()")
+        return server_ts - self.offset.server_now()
+
+    async def fire_at(self, server_ts: float) -> FireReport:
+        if self.offset is None:
+            raise RuntimeError("ReleaseScheduler.sync() must run before fire_at()")
+        error = await sleep_until(self.offset.to_local(server_ts))
+        return FireReport(target_server=server_ts, error_ms=error * 1000, offset=self.offset)
+
@@ -0,0 +1,51 @@
+"""Classify the portal's reply to the Conferma postback."""
+import html
+import re
+from dataclasses import dataclass
+
+MESSAGE_ID = "UC_FreeFitness_LBLMessaggio"
+
+BOOKED = "booked"
+FULL = "full"  # the slot filled up under us; the next ranked slot may still work
+ALREADY = "already"  # the member already has a booking that day
+ERROR = "error"  # any other portal message
+UNKNOWN = "unknown"  # no message in the reply
+
+_MESSAGE_RE = re.compile(
+    rf"<span[^>]*\bid=[\"']{MESSAGE_ID}[\"'][^>]*>(.*?)</span>", re.IGNORECASE | re.DOTALL
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# Checked in order: "già una prenotazione" also contains "prenotazione".
+_PATTERNS = [
+    (ALREADY, re.compile(r"\bgi[aà]\b'?.*prenot", re.IGNORECASE)),
+    (FULL, re.compile(r"esaurit|complet[oa]|non (?:più |piu' )?disponibil", re.IGNORECASE)),
+    (BOOKED, re.compile(r"effettuat|confermat|success", re.IGNORECASE)),
+]
+
+
+@dataclass
+class ConfirmOutcome:
+    status: str
+    message: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status == BOOKED
+
+
+def classify_message(text: str) -> str:
+    text = text.strip()
+    if not text:
+        return UNKNOWN
+    for status, pattern in _PATTERNS:
+        if pattern.search(text):
+            return status
+    return ERROR
+
+
+def outcome_from_html(page_html: str) -> ConfirmOutcome:
+    """Read the message label out of a full page or an UpdatePanel delta."""
+    m = _MESSAGE_RE.search(page_html)
+    message = html.unescape(_TAG_RE.sub("", m.group(1))).strip() if m else ""
+    return ConfirmOutcome(classify_message(message), message)
@@ -0,0 +1,284 @@
+"""Book the best (date, slot) in a window of dates from one availability sweep."""
+import datetime
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+
+import booking_backend as bb
+from confirm_outcome import ALREADY, BOOKED, FULL, UNKNOWN, ConfirmOutcome, outcome_from_html
+from phase_budget import PhaseTimeout, close_within
+from postback import ConfirmUnread, DayNotReady, PostbackEngine, PostbackMismatch
+from slot_grid import SlotInfo, SlotPreference, preference_index, slots_from_html
+
+# (date, slot) -> comparable score, higher is better; None leaves the option out.
+Scorer = Callable[[datetime.date, SlotInfo], Optional[Any]]
+
+MISMATCH = "mismatch"
+
+
+def ranked_rules(
+    preferences: Sequence[SlotPreference],
+    earlier_days_first: bool = True,
+    days_before_slots: bool = False,
+) -> Scorer:
+    """Scorer from ranked slot preferences (see `slot_grid.rank_slots`) plus a day order.
+
+    ["18:30", "17:00"] with the defaults reads "prefer 18:30 on any day, then
+    17:00, earlier days first"; `days_before_slots` makes it "the earliest day
+    with any preferred slot, best slot on it".
+    """
+
+    def score(date: datetime.date, slot: SlotInfo):
+        rank = preference_index(slot, preferences)
+        if rank is None:
+            return None
+        day = -date.toordinal() if earlier_days_first else date.toordinal()
+        return (day, -rank) if days_before_slots else (-rank, day)
+
+    return score
+
+
+@dataclass
+class WindowOption:
+    date: datetime.date
+    slot: Optional[SlotInfo]  # None: the day was not open
+    score: Optional[Any] = None
+    # Confirm outcome once tried; "full" also when a re-read grid shows it taken,
+    # "already" for every option on a day the member has booked, MISMATCH when
+    # the day's page could not be read.
+    status: str = ""
+
+    @property
+    def bookable(self) -> bool:
+        return self.slot is not None and self.slot.enabled and self.score is not None and not self.status
+
+
+@dataclass
+class WindowResult:
+    result: bb.BookingResult
+    chosen: Optional[WindowOption] = None
+    options: List[WindowOption] = field(default_factory=list)
+    postbacks: int = 0
+
+    def table(self) -> str:
+        """Every option considered, best first, one line each (rank "-": excluded by the scorer)."""
+        scored = sorted((o for o in self.options if o.score is not None), key=lambda o: o.score, reverse=True)
+        lines = []
+        for rank, option in enumerate(scored + [o for o in self.options if o.score is None], 1):
+            if option.slot is None:
+                lines.append(f"{option.date}    {option.status or 'closed'}")
+                continue
+            state = option.status or ("free" if option.slot.enabled else "full")
+            mark = "*" if option is self.chosen else " "
+            shown_rank = rank if option.score is not None else "-"
+            lines.append(f"{option.date} {mark} {shown_rank:>3} {option.slot.label:<28} {state}")
+        return "\n".join(lines)
+
+
+def _update_day(options: List[WindowOption], date: datetime.date, page_html: str):
+    """Refresh the slot states of `date`'s options from a grid the portal just sent."""
+    fresh = {s.id: s for s in slots_from_html(page_html)}
+    for option in options:
+        if option.date == date and option.slot is not None and option.slot.id in fresh:
+            option.slot = fresh[option.slot.id]
+
+
+async def collect_options(
+    engine: PostbackEngine,
+    dates: Sequence[datetime.date],
+    scorer: Scorer,
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> List[WindowOption]:
+    """Select every date once, in calendar order, and score every slot on it.
+
+    Costs one day postback per open date plus one per month boundary crossed;
+    a gray day has no link and costs nothing. A day whose reply does not parse
+    is recorded as MISMATCH and the sweep goes on from a refreshed page.
+    """
+    options: List[WindowOption] = []
+    for date in sorted(set(dates)):
+        try:
+            await engine.select_day(date, bb.MONTH_IT)
+        except DayNotReady:
+            options.append(WindowOption(date, None))
+            continue
+        except PostbackMismatch as e:
+            if log_cb:
+                log_cb(f"{date}: unreadable ({e}); skipping it.")
+            options.append(WindowOption(date, None, status=MISMATCH))
+            await engine.refresh()
+            continue
+        snapshot = slots_from_html(engine.html)
+        if log_cb:
+            log_cb(f"{date}: {bb.describe_slots(snapshot)}")
+        options.extend(WindowOption(date, slot, scorer(date, slot)) for slot in snapshot)
+    return options
+
+
+async def book_best(
+    engine: PostbackEngine,
+    options: List[WindowOption],
+    log_cb: Optional[Callable[[str], None]] = None,
+):
+    """Confirm the best bookable option, falling back to the next one while slots fill up.
+
+    The day is posted again only when it is not the one on screen, so the
+    confirm never relies on an earlier day's form. A day the member already
+    has a booking on, or whose page does not parse, is set aside and the next
+    best option is tried. A confirm whose reply was lost ends the search with
+    UNKNOWN, since it may have booked. Returns (option, outcome) or (None,
+    None) when nothing could be booked; raises BookingRejected for any other
+    refusal.
+    """
+    # The sweep ends on the last date's grid, unless that day was gray.
+    shown = options[-1].date if options and options[-1].slot is not None else None
+    while True:
+        candidates = sorted((o for o in options if o.bookable), key=lambda o: o.score, reverse=True)
+        if not candidates:
+            return None, None
+        option = candidates[0]
+        try:
+            if option.date != shown:
+                shown = None
+                await engine.select_day(option.date, bb.MONTH_IT)
+                shown = option.date
+                _update_day(options, option.date, engine.html)
+                if not option.slot.enabled:
+                    option.status = FULL
+                    continue
+            page_html = await engine.confirm(option.slot.id)
+        except ConfirmUnread as e:
+            option.status = UNKNOWN
+            if log_cb:
+                log_cb(f"Confirm {option.date} {option.slot.label}: {e}; not trying other options.")
+            return option, ConfirmOutcome(UNKNOWN, str(e))
+        except PostbackMismatch as e:
+            _set_day_status(options, option.date, MISMATCH)
+            if log_cb:
+                log_cb(f"{option.date}: unreadable ({e}); trying the next option.")
+            shown = None
+            await engine.refresh()
+            continue
+        outcome = outcome_from_html(page_html)
+        option.status = outcome.status
+        if log_cb:
+            log_cb(f"Confirm {option.date} {option.slot.label}: {outcome.status} ({outcome.message or 'no message'}).")
+        if outcome.status == FULL:
+            _update_day(options, option.date, page_html)
+            continue
+        if outcome.status == ALREADY:
+            _set_day_status(options, option.date, ALREADY)
+            continue
+        if outcome.status not in (BOOKED, UNKNOWN):
+            raise bb.BookingRejected(outcome, [o.slot for o in options if o.date == option.date and o.slot])
+        return option, outcome
+
+
+def _set_day_status(options: List[WindowOption], date: datetime.date, status: str):
+    for option in options:
+        if option.date == date and not option.status:
+            option.status = status
+
+
+async def book_window_in_browser(
+    browser,
+    job: bb.BookingJob,
+    dates: Sequence[datetime.date],
+    scorer: Scorer,
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> WindowResult:
+    """Sweep `dates` over HTTP postbacks in one logged-in context and book the best option.
+
+    The grid of each date is read from its postback reply, so the browser only
+    renders the first calendar. Returns the whole option table whether or not
+    anything was booked; the result is a "timeout" one when a phase budget or
+    the job's deadline runs out.
+    """
+    budget = bb.job_budget(job)
+    tracer = job.tracer
+    started = time.monotonic()
+    context = None
+    window = WindowResult(bb.BookingResult(label=job.label, ok=False))
+    try:
+        async with budget.deadline():
+            context, free_page, warm, startup_s = await bb.open_free_page(browser, job, log_cb=log_cb)
+            window.result.startup_s, window.result.warm_start = startup_s, warm
+            engine = PostbackEngine(context.request, free_page.url, await free_page.content())
+            async with tracer.span("sweep", dates=len(dates)) as span:
+                window.options = await collect_options(engine, dates, scorer, log_cb=log_cb)
+                span.set(postbacks=engine.posts, options=len(window.options))
+            try:
+                async with tracer.span("confirm") as span:
+                    option, outcome = await book_best(engine, window.options, log_cb=log_cb)
+                    span.set(reply=outcome.status if outcome else "none")
+            except bb.BookingRejected as e:
+                option, outcome = None, e.outcome
+                window.result.error = str(e)
+        window.postbacks = engine.posts
+        result = window.result
+        result.elapsed_s = time.monotonic() - started
+        if option is not None:
+            window.chosen = option
+            result.ok = outcome.ok
+            result.slot_selector = option.slot.selector
+            result.slot_snapshot = [o.slot for o in window.options if o.date == option.date and o.slot]
+        elif result.error is None:
+            result.error = "No option in the window could be booked."
+        if outcome is not None:
+            result.outcome, result.message = outcome.status, outcome.message
+        if log_cb:
+            chosen = f"{option.date} {option.slot.label}" if option else "nothing"
+            log_cb(f"Booked {chosen} after {window.postbacks} postbacks; options:\n{window.table()}")
+        return window
+    except PhaseTimeout as e:
+        if log_cb:
+            log_cb(f"Stopped: {e}.")
+        timed_out = bb.timeout_result(job, e)
+        timed_out.startup_s, timed_out.warm_start = window.result.startup_s, window.result.warm_start
+        timed_out.elapsed_s = time.monotonic() - started
+        window.result = timed_out
+        return window
+    finally:
+        if context is not None:
+            await bb.release_context(context, job, log_cb=log_cb)
+
+
+async def run_window_booking(
+    username: str,
+    password: str,
+    dates: Sequence[datetime.date],
+    preferences: Sequence[SlotPreference] = ("*",),
+    scorer: Optional[Scorer] = None,
+    log_cb: Optional[Callable[[str], None]] = None,
+    headless: bool = False,
+    **options,
+) -> WindowResult:
+    """Launch Chromium, book the best option among `dates` and close the browser.
+
+    Options are scored by `scorer`, else by `ranked_rules(preferences)`.
+    `options` are `BookingJob` fields (login_url, use_session_cache,
+    deadline_s, ...); there is no midnight wait, the window is for days that
+    are already open. The deadline covers the launch too.
+    """
+    from playwright.async_api import async_playwright
+
+    if not dates:
+        raise ValueError("empty date window")
+    job = bb.BookingJob(username, password, min(dates), "*", False, slot_preferences=list(preferences), **options)
+    budget = bb.job_budget(job)
+    async with async_playwright() as p:
+        browser = None
+        try:
+            async with budget.deadline():
+                async with job.tracer.span("launch"):
+                    browser = await bb.launch_browser(p, headless=headless, profile=job.launch_profile)
+                return await book_window_in_browser(
+                    browser, job, dates, scorer or ranked_rules(preferences), log_cb=log_cb
+                )
+        except PhaseTimeout as e:
+            if log_cb:
+                log_cb(f"Stopped: {e}.")
+            return WindowResult(bb.timeout_result(job, e))
+        finally:
+            if browser is not None:
+                await close_within(browser)
@@ -1,18 +1,31 @@
-import asyncio
 import datetime
 import json
-import threading
 import queue
 import tkinter as tk
+from dataclasses import dataclass
 from pathlib import Path
 from tkinter import ttk, messagebox
 
 import booking_backend as bb
+from booking_runtime import BookingRuntime
+from confirm_outcome import UNKNOWN
+from retry_policy import RetryPolicy
 
 CONFIG_PATH = Path("booking_config.json")
-log_queue = queue.Queue()
+MAX_LOG_LINES = 2000  # status panel keeps only the newest lines
+POLL_MIN_MS = 20  # log polling interval while messages keep arriving...
+POLL_MAX_MS = 250  # ...backing off to this when idle
+log_queue = queue.Queue()  # str log lines and StatusEvent objects, in order
+poll_ms = POLL_MAX_MS
 countdown_job = None
 countdown_stop = False
+current_job = None  # concurrent.futures.Future of the running booking
+
+
+@dataclass(frozen=True)
+class StatusEvent:
+    kind: str  # done | unknown | error | cancelled
+    detail: str = ""
 
 
 # ---------------- Config helpers ----------------
@@ -36,23 +49,26 @@ def save_config(data: dict):
 
 # ---------------- Booking trigger ----------------
 def start_booking():
+    global current_job
+    if current_job is not None and not current_job.done():
+        messagebox.showinfo("Running", "A booking is already running; cancel it first.")
+        return
     username = entry_user.get().strip()
     password = entry_pass.get().strip()
     day = int(entry_day.get().strip())
     month = int(entry_month.get().strip())
     wait_midnight = bool(wait_var.get())
     slot_idx = slot_idx_var.get()
-    slot_selector = {
-        "0": bb.SEL_SLOT_0,
-        "1": bb.SEL_SLOT_1,
-        "2": bb.SEL_SLOT_2,
-        "3": bb.SEL_SLOT_3,
-    }.get(slot_idx, bb.SEL_SLOT_0)
+    slot_selector = bb.SLOT_SELECTORS[int(slot_idx)] if slot_idx in ("0", "1", "2", "3") else bb.SEL_SLOT_0
     try_others = bool(try_other_var.get())
     try:
         day_attempts = int(entry_day_attempts.get().strip())
     except Exception:
         day_attempts = 5
+    try:
+        retry_window_s = float(entry_retry_window.get().strip() or 0)
+    except Exception:
+        retry_window_s = 0.0
 
     target_date = datetime.date(datetime.date.today().year, month, day)
 
@@ -66,6 +82,7 @@ def start_booking():
                 "wait_midnight": wait_midnight,
                 "slot_idx": slot_idx,
                 "day_attempts": day_attempts,
+                "retry_window_s": retry_window_s,
             }
         )
 
@@ -84,25 +101,49 @@ def start_booking():
     def log_cb(msg: str):
         log_queue.put(msg)
 
-    def worker():
-        try:
-            asyncio.run(
-                bb.run_booking(
-                    username,
-                    password,
-                    target_date,
-                    slot_selector,
-                    wait_midnight,
-                    log_cb=log_cb,
-                    try_other_slots=try_others,
-                    day_attempts=day_attempts,
-                )
-            )
-            log_queue.put("STATUS:DONE")
-        except Exception as e:
-            log_queue.put(f"STATUS:ERROR:{e}")
-
-    threading.Thread(target=worker, daemon=True).start()
+    job = bb.BookingJob(
+        username,
+        password,
+        target_date,
+        slot_selector,
+        wait_midnight,
+        try_other_slots=try_others,
+        day_attempts=day_attempts,
+        retry_policy=RetryPolicy.hammer(deadline_s=retry_window_s) if retry_window_s > 0 else None,
+    )
+
+    def on_done(fut):
+        if fut.cancelled():
+            log_queue.put(StatusEvent("cancelled"))
+        elif fut.exception() is not None:
+            log_queue.put(StatusEvent("error", str(fut.exception())))
+        else:
+            log_queue.put(status_for(fut.result()))
+
+    current_job = runtime.book(job, log_cb=log_cb)
+    current_job.add_done_callback(on_done)
+
+
+def status_for(result: bb.BookingResult) -> StatusEvent:
+    """A finished run is only "done" when the portal confirmed the booking."""
+    if result.ok:
+        return StatusEvent("done", result.message)
+    if result.outcome == UNKNOWN:
+        return StatusEvent("unknown", result.message or "The portal gave no clear answer.")
+    detail = result.error or result.message or "Booking failed."
+    return StatusEvent("error", f"{result.outcome}: {detail}" if result.outcome else detail)
+
+
+def cancel_booking():
+    if current_job is not None and not current_job.done():
+        log_queue.put("Cancelling...")
+        current_job.cancel()
+
+
+def on_close():
+    stop_countdown()
+    runtime.shutdown()
+    root.destroy()
 
 
 # ---------------- Countdown ----------------
@@ -143,35 +184,61 @@ def stop_countdown():
 
 
 # ---------------- Log polling ----------------
+def append_lines(lines):
+    """Insert `lines` in one pass and trim the panel to MAX_LOG_LINES."""
+    if not lines:
+        return
+    if len(lines) > MAX_LOG_LINES:
+        skipped = len(lines) - MAX_LOG_LINES
+        lines = [f"... {skipped} lines skipped ..."] + lines[-MAX_LOG_LINES:]
+    status_box.configure(state="normal")
+    status_box.insert("end", "\n".join(lines) + "\n")
+    excess = int(status_box.index("end-1c").split(".")[0]) - 1 - MAX_LOG_LINES
+    if excess > 0:
+        status_box.delete("1.0", f"{excess + 1}.0")
+    status_box.see("end")
+    status_box.configure(state="disabled")
+
+
+def handle_status(event: StatusEvent):
+    stop_countdown()
+    if event.kind == "done":
+        status_var.set("Done")
+        append_lines(["Done"])
+        messagebox.showinfo("Done", event.detail or "Booking confirmed; see the status log.")
+    elif event.kind == "unknown":
+        status_var.set("Unknown")
+        append_lines([f"Unknown: {event.detail}"])
+        messagebox.showwarning("Check the portal", f"{event.detail}\nCheck your bookings on the portal before retrying.")
+    elif event.kind == "cancelled":
+        status_var.set("Cancelled")
+        append_lines(["Cancelled"])
+    else:
+        status_var.set("Error")
+        append_lines([f"Error: {event.detail}"])
+        messagebox.showerror("Error", event.detail)
+
+
 def poll_logs():
+    """Drain everything queued, render it in one insert, and adapt the polling rate."""
+    global poll_ms
+    lines = []
+    got_any = False
     try:
         while True:
-            msg = log_queue.get_nowait()
-            if msg.startswith("STATUS:DONE"):
-                status_var.set("Done")
-                status_box.configure(state="normal")
-                status_box.insert("end", "Done\n")
-                status_box.see("end")
-                status_box.configure(state="disabled")
-                messagebox.showinfo("Done", "Booking flow finished; check status log and booking_result.png")
-                stop_countdown()
-            elif msg.startswith("STATUS:ERROR:"):
-                status_var.set("Error")
-                err = msg.split("STATUS:ERROR:", 1)[1]
-                status_box.configure(state="normal")
-                status_box.insert("end", f"Error: {err}\n")
-                status_box.see("end")
-                status_box.configure(state="disabled")
-                messagebox.showerror("Error", err)
-                stop_countdown()
+            item = log_queue.get_nowait()
+            got_any = True
+            if isinstance(item, StatusEvent):
+                append_lines(lines)
+                lines = []
+                handle_status(item)
             else:
-                status_box.configure(state="normal")
-                status_box.insert("end", msg + "\n")
-                status_box.see("end")
-                status_box.configure(state="disabled")
+                lines.append(item)
     except queue.Empty:
         pass
-    root.after(200, poll_logs)
+    append_lines(lines)
+    poll_ms = POLL_MIN_MS if got_any else min(POLL_MAX_MS, poll_ms * 2)
+    root.after(poll_ms, poll_logs)
 
 
 # ---------------- GUI ----------------
@@ -283,6 +350,12 @@ entry_day_attempts.insert(0, "5")
 entry_day_attempts.grid(row=row, column=1, sticky="w", pady=6)
 row += 1
 
+ttk.Label(card, text="Retry window (s, 0 = attempts)", style="Card.TLabel").grid(row=row, column=0, sticky="w", pady=6)
+entry_retry_window = ttk.Entry(card, width=10, font=("Segoe UI", 11), background="#cce5ff", foreground="#000000")
+entry_retry_window.insert(0, "0")
+entry_retry_window.grid(row=row, column=1, sticky="w", pady=6)
+row += 1
+
 # Countdown just below toggles/inputs
 countdown_var = tk.StringVar(value="Countdown: --:--:--")
 ttk.Label(card, textvariable=countdown_var, style="Card.TLabel", font=("Segoe UI Semibold", 12)).grid(
@@ -307,6 +380,15 @@ btn_frame = ttk.Frame(main, style="Main.TFrame")
 btn_frame.grid(row=2, column=0, sticky="ew")
 btn_frame.columnconfigure(0, weight=1)
 ttk.Button(btn_frame, text="Start Booking", command=start_booking, style="Primary.TButton").grid(row=0, column=0, sticky="ew", pady=8)
+ttk.Button(btn_frame, text="Cancel", command=cancel_booking).grid(row=0, column=1, sticky="ew", pady=8, padx=(8, 0))
+
+
+def saved_flag(cfg: dict, key: str) -> int:
+    """A checkbox value from the saved config; an unreadable flag leaves the box unticked."""
+    try:
+        return int(bb.parse_flag(cfg.get(key, False), key))
+    except ValueError:
+        return 0
 
 
 def preload():
@@ -318,12 +400,15 @@ def preload():
     entry_day.insert(0, cfg.get("day", ""))
     entry_month.insert(0, cfg.get("month", ""))
     slot_idx_var.set(cfg.get("slot_idx", "0"))
-    wait_var.set(1 if cfg.get("wait_midnight") else 0)
-    remember_var.set(1 if cfg.get("remember_details") else 0)
-    try_other_var.set(1 if cfg.get("try_other_slots") else 0)
+    wait_var.set(saved_flag(cfg, "wait_midnight"))
+    remember_var.set(saved_flag(cfg, "remember_details"))
+    try_other_var.set(saved_flag(cfg, "try_other_slots"))
     if "day_attempts" in cfg:
         entry_day_attempts.delete(0, "end")
         entry_day_attempts.insert(0, str(cfg.get("day_attempts", 5)))
+    if "retry_window_s" in cfg:
+        entry_retry_window.delete(0, "end")
+        entry_retry_window.insert(0, str(cfg.get("retry_window_s", 0)))
 
     # refresh toggle button visuals
     for var, btn in [(wait_var, wait_btn), (remember_var, remember_btn), (try_other_var, try_other_btn)]:
@@ -331,6 +416,10 @@ def preload():
         btn.configure(**style_dict)
 
 
+# Launch and warm Chromium while the form is being filled in.
+runtime = BookingRuntime(log_cb=log_queue.put).start()
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 preload()
 poll_logs()
 root.mainloop()
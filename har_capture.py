@@ -0,0 +1,435 @@
+"""Record a booking session as a scrubbed HAR and trace; replay a HAR offline with set delays.
+
+Recording (`BookingJob.record_har` / `record_trace`) always takes the login
+path, so the capture holds the whole flow. Playwright writes to a ".partial"
+file; once the context has closed, the username and password are replaced
+by SCRUBBED_USER / SCRUBBED_PASSWORD wherever a query or form field, a
+header, an input value or a trace string is exactly one of them, cookie
+values are blanked, and the result is written under the requested name.
+Substrings are never touched, so __VIEWSTATE and timestamps survive a
+numeric username. The HAR comment keeps the target date and slot.
+
+Replaying (`BookingJob.replay_har`) serves every browser request from the HAR
+through `route_from_har` and aborts anything not in it, so no network is
+needed. Replay logs in with the scrubbed credentials, which keeps the
+recorded login POST matching. Only the Playwright path is covered: the
+postback fast path talks through `context.request`, which routes do not
+see, and a midnight release cannot be replayed because a URL always gets
+the same recorded answer.
+"""
+import asyncio
+import base64
+import collections
+import contextlib
+import datetime
+import html
+import json
+import os
+import re
+import urllib.parse
+import zipfile
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+SCRUBBED_USER = "har-user"
+SCRUBBED_PASSWORD = "har-password"
+SCRUBBED_COOKIE = "scrubbed"
+
+_COOKIE_PAIR_RE = re.compile(r"(^|;\s*)([^=;\s]+)=([^;]*)")
+_INPUT_VALUE_RE = re.compile(r"""(<input\b[^>]*?\bvalue\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+
+
+def partial_path(path: str) -> str:
+    """Where Playwright writes a recording before it is scrubbed into `path`."""
+    return f"{path}.partial"
+
+
+def context_options(job) -> dict:
+    """Extra `browser.new_context` arguments for recording a HAR."""
+    if not job.record_har:
+        return {}
+    return {"record_har_path": partial_path(job.record_har), "record_har_content": "embed", "record_har_mode": "full"}
+
+
+class ReplayDelay:
+    """How long each replayed response is held back.
+
+    A number is a fixed delay in ms for every request. "recorded" makes every
+    request wait as long as its HAR entry took on the real portal (repeats of
+    one URL use the recorded times in order, then the last one);
+    "recorded:0.5" scales those times.
+    """
+
+    def __init__(self, fixed_ms: float = 0.0, recorded: Optional[Dict[Tuple[str, str], List[float]]] = None, scale=1.0):
+        self.fixed_ms = fixed_ms
+        self.scale = scale
+        self._recorded: Dict[Tuple[str, str], Deque[float]] = {
+            key: collections.deque(times) for key, times in (recorded or {}).items()
+        }
+
+    @classmethod
+    def from_spec(cls, spec: Union[float, str], har_path: str) -> Optional["ReplayDelay"]:
+        if isinstance(spec, str):
+            name, _, scale = spec.partition(":")
+            if name != "recorded":
+                raise ValueError(f"Unknown replay delay {spec!r}; expected ms or 'recorded[:scale]'")
+            recorded: Dict[Tuple[str, str], List[float]] = {}
+            for entry in load_har(har_path)["log"]["entries"]:
+                key = (entry["request"]["method"], entry["request"]["url"])
+                recorded.setdefault(key, []).append(max(0.0, float(entry.get("time") or 0.0)))
+            return cls(recorded=recorded, scale=float(scale or 1.0))
+        return cls(fixed_ms=float(spec)) if spec else None
+
+    def delay_ms(self, method: str, url: str) -> float:
+        times = self._recorded.get((method, url))
+        if not times:
+            return self.fixed_ms
+        return (times.popleft() if len(times) > 1 else times[0]) * self.scale
+
+    async def route(self, route):
+        await asyncio.sleep(self.delay_ms(route.request.method, route.request.url) / 1000)
+        await route.fallback()
+
+
+async def attach(context, job, log_cb: Optional[Callable[[str], None]] = None):
+    """Install HAR replay and/or start tracing on a fresh booking context."""
+    if job.replay_har:
+        await context.route_from_har(job.replay_har, not_found="abort")
+        delay = ReplayDelay.from_spec(job.replay_delay, job.replay_har)
+        if delay is not None:
+            # Registered last, so it runs first and falls back to the HAR route.
+            await context.route("**/*", delay.route)
+        if log_cb:
+            log_cb(f"Replaying {job.replay_har} (delay {job.replay_delay}).")
+    if job.record_trace:
+        # No screenshots: they would show the typed username, and pixels cannot be scrubbed.
+        await context.tracing.start(snapshots=True, screenshots=False, sources=False)
+
+
+async def stop_trace(context, job):
+    if not job.record_trace:
+        return
+    try:
+        await context.tracing.stop(path=partial_path(job.record_trace))
+    except Exception:
+        pass
+
+
+def _placeholder(value: str, secrets: Dict[str, str]) -> Optional[str]:
+    """The placeholder when `value` is a whole secret, raw or form-encoded; else None."""
+    if value in secrets:
+        return secrets[value]
+    return secrets.get(urllib.parse.unquote_plus(value))
+
+
+def _scrub_pairs(encoded: str, secrets: Dict[str, str]) -> str:
+    """`a=1&b=2` with each value that is a whole secret replaced; every other byte is kept."""
+    parts = []
+    for part in encoded.split("&"):
+        name, sep, value = part.partition("=")
+        placeholder = _placeholder(value, secrets) if sep else None
+        parts.append(f"{name}={urllib.parse.quote_plus(placeholder)}" if placeholder is not None else part)
+    return "&".join(parts)
+
+
+def _scrub_url(url: str, secrets: Dict[str, str]) -> str:
+    base, sep, rest = url.partition("?")
+    if not sep:
+        return url
+    query, hash_sign, fragment = rest.partition("#")
+    return f"{base}?{_scrub_pairs(query, secrets)}{hash_sign}{fragment}"
+
+
+def _scrub_html(text: str, secrets: Dict[str, str]) -> str:
+    """Input `value` attributes that are a whole secret (a re-rendered login form)."""
+
+    def sub(m):
+        placeholder = secrets.get(html.unescape(m.group(3)))
+        if placeholder is None:
+            return m.group(0)
+        return f"{m.group(1)}{m.group(2)}{html.escape(placeholder)}{m.group(2)}"
+
+    return _INPUT_VALUE_RE.sub(sub, text)
+
+
+def _is_form(mime_type: Optional[str]) -> bool:
+    return (mime_type or "").startswith("application/x-www-form-urlencoded")
+
+
+def _scrub_body(content: dict, scrub: Callable[[str, Dict[str, str]], str], secrets: Dict[str, str]):
+    if not content.get("text"):
+        return
+    if content.get("encoding") != "base64":
+        content["text"] = scrub(content["text"], secrets)
+        return
+    try:
+        text = base64.b64decode(content["text"]).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return
+    content["text"] = base64.b64encode(scrub(text, secrets).encode("utf-8")).decode("ascii")
+
+
+def _scrub_message(message: dict, secrets: Dict[str, str]):
+    """Scrub one HAR request or response in place.
+
+    Only whole values go: query and form fields, plain headers, input values
+    in an HTML body. Cookie values are blanked whatever they hold. Hidden
+    fields such as __VIEWSTATE, timestamps and other bodies are left alone, so
+    a short or numeric username cannot corrupt them.
+    """
+    if "url" in message:
+        message["url"] = _scrub_url(message["url"], secrets)
+    for param in message.get("queryString", []):
+        placeholder = _placeholder(param.get("value", ""), secrets)
+        if placeholder is not None:
+            param["value"] = placeholder
+    post = message.get("postData") or {}
+    for param in post.get("params", []):
+        placeholder = _placeholder(param.get("value", ""), secrets)
+        if placeholder is not None:
+            param["value"] = placeholder
+    if post.get("text") and _is_form(post.get("mimeType")):
+        post["text"] = _scrub_pairs(post["text"], secrets)
+    for cookie in message.get("cookies", []):
+        cookie["value"] = SCRUBBED_COOKIE
+    for header in message.get("headers", []):
+        name = header.get("name", "").lower()
+        if name == "cookie":
+            header["value"] = _COOKIE_PAIR_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}={SCRUBBED_COOKIE}", header["value"])
+        elif name == "set-cookie":
+            header["value"] = _COOKIE_PAIR_RE.sub(
+                lambda m: f"{m.group(1)}{m.group(2)}={SCRUBBED_COOKIE}", header["value"], count=1
+            )
+        elif name in ("location", "referer"):
+            header["value"] = _scrub_url(header["value"], secrets)
+        else:
+            placeholder = _placeholder(header.get("value", ""), secrets)
+            if placeholder is not None:
+                header["value"] = placeholder
+    content = message.get("content") or {}
+    if "html" in content.get("mimeType", ""):
+        _scrub_body(content, _scrub_html, secrets)
+
+
+def _scrub_strings(node, secrets: Dict[str, str]):
+    """Every JSON string that is exactly a secret (trace action params, DOM snapshot attributes)."""
+    if isinstance(node, str):
+        return secrets.get(node, node)
+    if isinstance(node, list):
+        return [_scrub_strings(n, secrets) for n in node]
+    if isinstance(node, dict):
+        return {k: _scrub_strings(v, secrets) for k, v in node.items()}
+    return node
+
+
+def load_har(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_atomic(dest: str, write: Callable[[Path], None]):
+    tmp = Path(dest).with_suffix(".tmp")
+    write(tmp)
+    os.replace(tmp, dest)
+
+
+def scrub_har(path: str, secrets: Dict[str, str], comment: Optional[dict] = None, dest: Optional[str] = None):
+    """Write the HAR at `path` to `dest` (default: in place) with credentials replaced and cookies blanked."""
+    secrets = {k: v for k, v in secrets.items() if k}
+    har = load_har(path)
+    for entry in har["log"]["entries"]:
+        _scrub_message(entry["request"], secrets)
+        _scrub_message(entry["response"], secrets)
+    if comment is not None:
+        har["log"]["comment"] = json.dumps(comment)
+
+    def write(tmp: Path):
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(har, f)
+
+    _write_atomic(dest or path, write)
+
+
+def _scrub_trace_events(text: str, secrets: Dict[str, str], bodies: Dict[str, Callable]) -> str:
+    """One trace member (JSON lines). Network snapshots are scrubbed like HAR entries and
+    the resource files holding their form posts and HTML pages are noted in `bodies`."""
+    lines = []
+    for line in text.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            lines.append(line)
+            continue
+        snapshot = event.get("snapshot") if isinstance(event, dict) and event.get("type") == "resource-snapshot" else None
+        if isinstance(snapshot, dict):
+            request, response = snapshot.get("request") or {}, snapshot.get("response") or {}
+            _scrub_message(request, secrets)
+            _scrub_message(response, secrets)
+            post, content = request.get("postData") or {}, response.get("content") or {}
+            if post.get("_sha1") and _is_form(post.get("mimeType")):
+                bodies[f"resources/{post['_sha1']}"] = _scrub_pairs
+            if content.get("_sha1") and "html" in content.get("mimeType", ""):
+                bodies[f"resources/{content['_sha1']}"] = _scrub_html
+        lines.append(json.dumps(_scrub_strings(event, secrets)))
+    return "\n".join(lines) + "\n"
+
+
+def scrub_zip(path: str, secrets: Dict[str, str], dest: Optional[str] = None):
+    """Same for a Playwright trace: events are scrubbed by whole value, form-post and
+    HTML resources like their HAR counterparts; everything else is copied."""
+    secrets = {k: v for k, v in secrets.items() if k}
+    bodies: Dict[str, Callable] = {}
+    with zipfile.ZipFile(path) as src:
+        events = {
+            info.filename: _scrub_trace_events(src.read(info).decode("utf-8", "replace"), secrets, bodies)
+            for info in src.infolist()
+            if info.filename.endswith((".trace", ".network"))
+        }
+
+        def write(tmp: Path):
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as dst:
+                for info in src.infolist():
+                    if info.filename in events:
+                        dst.writestr(info, events[info.filename].encode("utf-8"))
+                        continue
+                    data = src.read(info)
+                    scrub = bodies.get(info.filename)
+                    if scrub is not None:
+                        try:
+                            data = scrub(data.decode("utf-8"), secrets).encode("utf-8")
+                        except UnicodeDecodeError:
+                            pass
+                    dst.writestr(info, data)
+
+        _write_atomic(dest or path, write)
+
+
+def scrub_outputs(job, log_cb: Optional[Callable[[str], None]] = None, closed: bool = True):
+    """Scrub what the context recorded into the requested paths; call once `context.close()` returned.
+
+    Recordings are written to `partial_path()` and deleted here in any case, so
+    an unscrubbed copy never sits under the requested name. When the close
+    failed or hung (`closed` False) the HAR may be incomplete and still being
+    written, so it is discarded instead of scrubbed.
+    """
+    secrets = {job.username: SCRUBBED_USER, job.password: SCRUBBED_PASSWORD}
+    for path, scrub in ((job.record_har, scrub_har), (job.record_trace, scrub_zip)):
+        if not path:
+            continue
+        partial = partial_path(path)
+        try:
+            if not os.path.exists(partial):
+                continue
+            if scrub is scrub_har and not closed:
+                if log_cb:
+                    log_cb("HAR discarded: the context did not close cleanly.")
+                continue
+            if scrub is scrub_har:
+                comment = {"target_date": job.target_date.isoformat(), "slot": job.primary_slot_selector}
+                scrub_har(partial, secrets, comment=comment, dest=path)
+            else:
+                scrub_zip(partial, secrets, dest=path)
+            if log_cb:
+                log_cb(f"{'HAR' if scrub is scrub_har else 'Trace'} saved to {path} (credentials scrubbed).")
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(partial)
+
+
+def recorded_run(har_path: str) -> dict:
+    """Login URL, target date and slot of the recording (for replaying it as it was)."""
+    log = load_har(har_path)["log"]
+    try:
+        meta = json.loads(log.get("comment") or "{}")
+    except ValueError:
+        meta = {}
+    documents = [
+        e["request"]["url"]
+        for e in log["entries"]
+        if e["request"]["method"] == "GET" and "html" in e["response"].get("content", {}).get("mimeType", "")
+    ]
+    return {
+        "login_url": documents[0] if documents else None,
+        "target_date": datetime.date.fromisoformat(meta["target_date"]) if meta.get("target_date") else None,
+        "slot": meta.get("slot"),
+    }
+
+
+async def replay_booking(
+    har_path: str,
+    delay: Union[float, str] = 0.0,
+    log_cb: Optional[Callable[[str], None]] = None,
+    headless: bool = True,
+    **options,
+):
+    """`run_booking` against a recorded HAR, offline and as recorded.
+
+    Login URL, date and slot come from the HAR unless given in `options`;
+    session cache, selector learning, the postback fast path and the
+    screenshot are off so every replay takes the same path.
+    """
+    import booking_backend as bb
+
+    recorded = recorded_run(har_path)
+    target_date = options.pop("target_date", None) or recorded["target_date"]
+    slot = options.pop("primary_slot_selector", None) or recorded["slot"] or bb.SEL_SLOT_0
+    if target_date is None:
+        raise ValueError(f"{har_path} does not say which date it booked; pass target_date")
+    run_options = {
+        "login_url": recorded["login_url"] or bb.URL_LOGIN,
+        "use_session_cache": False,
+        "learn_selectors": False,
+        "postback_fast_path": False,
+        "screenshot_path": None,
+        **options,
+    }
+    return await bb.run_booking(
+        SCRUBBED_USER,
+        SCRUBBED_PASSWORD,
+        target_date,
+        slot,
+        False,
+        log_cb=log_cb,
+        headless=headless,
+        replay_har=har_path,
+        replay_delay=delay,
+        **run_options,
+    )
+
+
+def click_to_confirm_ms(tracer) -> Optional[float]:
+    """From the first day click to the end of the last confirm: the locator and retry part."""
+    clicks = [s for s in tracer.spans if s.name == "day_click"]
+    confirms = [s for s in tracer.spans if s.name == "confirm"]
+    if not clicks or not confirms:
+        return None
+    return confirms[-1].start_ms + confirms[-1].duration_ms - clicks[0].start_ms
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from phase_trace import PhaseTracer
+
+    parser = argparse.ArgumentParser(description="Replay a recorded HAR offline and time click-to-confirm.")
+    parser.add_argument("har", help="a HAR saved with booking_cli --record")
+    parser.add_argument("--delay", default="recorded", help="ms per request, or recorded[:scale]")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-ms", type=float, help="exit 1 if click-to-confirm exceeds this in any run")
+    args = parser.parse_args()
+
+    async def replay() -> int:
+        worst = 0.0
+        for i in range(args.runs):
+            tracer = PhaseTracer(run_id=f"replay-{i}")
+            delay: Union[float, str] = args.delay if args.delay.startswith("recorded") else float(args.delay)
+            result = await replay_booking(args.har, delay=delay, tracer=tracer)
+            ms = click_to_confirm_ms(tracer)
+            worst = max(worst, ms or 0.0)
+            shown = f"{ms:.0f} ms" if ms is not None else "n/a"
+            print(f"[{i + 1}/{args.runs}] ok={result.ok} click-to-confirm {shown} ({result.outcome or result.error})")
+        print(tracer.summary_table())
+        return 1 if args.max_ms is not None and worst > args.max_ms else 0
+
+    sys.exit(asyncio.run(replay()))
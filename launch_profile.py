@@ -0,0 +1,154 @@
+"""Chromium launch profiles, and a probe that measures their launch time and memory."""
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_ARGS: Tuple[str, ...] = (
+    "--disable-extensions",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--no-first-run",
+)
+
+# Headless booking needs no GPU, audio, crash reporting, images or per-site
+# renderer processes; caches are capped so a long watcher does not grow them.
+MINIMAL_ARGS: Tuple[str, ...] = DEFAULT_ARGS + (
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-site-isolation-trials",
+    "--disable-breakpad",
+    "--disable-notifications",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+    "--disk-cache-size=1048576",
+    "--media-cache-size=1048576",
+)
+
+
+@dataclass
+class LaunchProfile:
+    name: str
+    headless: Optional[bool]  # None: the caller's `headless` decides
+    args: Tuple[str, ...] = DEFAULT_ARGS
+    viewport: Tuple[int, int] = (1280, 900)
+    context_options: Dict[str, object] = field(default_factory=dict)  # extra browser.new_context kwargs
+
+
+PROFILES: Dict[str, LaunchProfile] = {
+    "default": LaunchProfile("default", None),
+    "minimal": LaunchProfile(
+        "minimal",
+        True,
+        MINIMAL_ARGS,
+        viewport=(800, 600),
+        context_options={"service_workers": "block", "reduced_motion": "reduce", "device_scale_factor": 1},
+    ),
+    "debug": LaunchProfile("debug", False),
+}
+
+
+def get_profile(name: str) -> LaunchProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown launch profile {name!r}; expected one of {', '.join(PROFILES)}") from None
+
+
+def _parents() -> Dict[int, int]:
+    parents = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        parents[int(entry.name)] = int(stat.rsplit(")", 1)[1].split()[1])
+    return parents
+
+
+def _memory_kib(pid: int) -> int:
+    """Proportional set size where the kernel reports it (shared pages split), else RSS."""
+    for path, key in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    if line.startswith(key):
+                        return int(line.split()[1])
+        except OSError:
+            continue
+    return 0
+
+
+def child_tree_mib(root: Optional[int] = None) -> Optional[float]:
+    """Memory of every descendant of `root` (default: this process), i.e. the Playwright
+    driver plus Chromium; None where /proc is not available."""
+    if not os.path.isdir("/proc"):
+        return None
+    root = os.getpid() if root is None else root
+    parents = _parents()
+    tree, frontier = set(), {root}
+    while frontier:
+        frontier = {pid for pid, ppid in parents.items() if ppid in frontier and pid not in tree}
+        tree |= frontier
+    return sum(_memory_kib(pid) for pid in tree) / 1024
+
+
+@dataclass
+class ProfileMeasurement:
+    profile: str
+    launch_ms: List[float] = field(default_factory=list)  # chromium.launch() returning
+    ready_ms: List[float] = field(default_factory=list)  # launch + context + page + first page load
+    peak_mib: Optional[float] = None
+
+    def summary(self) -> str:
+        peak = f"{self.peak_mib:.0f} MiB" if self.peak_mib is not None else "n/a"
+        return (
+            f"{self.profile:<8} launch {min(self.launch_ms):.0f}-{max(self.launch_ms):.0f} ms, "
+            f"ready {min(self.ready_ms):.0f}-{max(self.ready_ms):.0f} ms, peak {peak}"
+        )
+
+
+async def measure_profile(p, name: str, url: str, runs: int = 3, sample_s: float = 0.05) -> ProfileMeasurement:
+    """Launch `runs` fresh browsers with profile `name`, load `url` in each and close it.
+
+    Memory is sampled every `sample_s` over the whole run; the peak is the
+    largest driver-plus-Chromium total seen, which is what one concurrent
+    booking adds to a host.
+    """
+    import booking_backend as bb
+
+    measurement = ProfileMeasurement(name)
+    peaks: List[float] = []
+
+    async def sample():
+        while True:
+            mib = child_tree_mib()
+            if mib is not None:
+                peaks.append(mib)
+            await asyncio.sleep(sample_s)
+
+    sampler = asyncio.create_task(sample())
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            browser = await bb.launch_browser(p, headless=True, profile=name)
+            measurement.launch_ms.append((time.perf_counter() - started) * 1000)
+            try:
+                context = await bb.new_booking_context(browser, profile=name)
+                page = await context.new_page()
+                await page.goto(url, wait_until="domcontentloaded")
+                measurement.ready_ms.append((time.perf_counter() - started) * 1000)
+                peaks.append(child_tree_mib() or 0.0)
+            finally:
+                await browser.close()
+    finally:
+        sampler.cancel()
+    measurement.peak_mib = max(peaks) if peaks else None
+    return measurement
+
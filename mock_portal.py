@@ -0,0 +1,469 @@
+"""Local stand-in for the custorino portal, used to exercise the backend offline.
+
+It serves the login form, the reserved-area home with the Prenotazioni link
+and the bookings page whose Free Fitness link opens in a new tab. The Free Fitness page mimics the WebForms markup the backend drives: the
+same element IDs, `__doPostBack` links, `__VIEWSTATE`/`__EVENTVALIDATION`
+hidden fields (validated on every post) and an ASP.NET Calendar whose target
+day stays gray until `release_at` on the portal's (optionally skewed) clock.
+"""
+import base64
+import datetime
+import hashlib
+import hmac
+import html
+import json
+import random
+import secrets
+import threading
+import time
+import urllib.parse
+from email.utils import formatdate
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+MONTH_IT = [
+    "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno",
+    "luglio", "agosto", "settembre", "ottobre", "novembre", "dicembre",
+]
+CALENDAR_EPOCH = datetime.date(2000, 1, 1)
+DEFAULT_SLOTS = ["14.00 - 15.30", "15.30 - 17.00", "17.00 - 18.30", "18.30 - 20.00"]
+
+MSG_BOOKED = "Prenotazione effettuata con successo."
+MSG_FULL = "Posti esauriti per la fascia oraria selezionata."
+MSG_ALREADY = "Risulta già una prenotazione per il giorno selezionato."
+MSG_NO_SLOT = "Selezionare una fascia oraria."
+
+PATH_LOGIN = "/loginareariservata.aspx"
+PATH_HOME = "/areariservata.aspx"
+PATH_BOOKINGS = "/Prenotazioni.aspx"
+PATH_FREE_FITNESS = "/FreeFitness.aspx"
+SESSION_COOKIE = "ASP.NET_SessionId"
+
+_ASSET_TYPES = {
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".png": "image/png",
+    ".woff2": "font/woff2",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_PortalServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def date_time_string(self, timestamp=None):
+        return formatdate(self.server.portal.now(), usegmt=True)
+
+    def _send(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str = "text/html; charset=utf-8",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _redirect(self, location: str, headers: Optional[Dict[str, str]] = None):
+        self._send(302, b"", headers={"Location": location, **(headers or {})})
+
+    def _session(self) -> Optional[str]:
+        cookies = SimpleCookie(self.headers.get("Cookie") or "")
+        return cookies[SESSION_COOKIE].value if SESSION_COOKIE in cookies else None
+
+    def _disturb(self, path: str) -> bool:
+        """Apply the injected latency; True when this request should fail."""
+        return self.server.portal.disturb(is_page=not path.startswith("/assets/"))
+
+    def do_HEAD(self):
+        self.server.portal.disturb(is_page=False)
+        self._send(200, b"")
+
+    def do_GET(self):
+        portal = self.server.portal
+        path = urllib.parse.urlsplit(self.path).path
+        if self._disturb(path):
+            self._send(503, b"<html><body>Service Unavailable</body></html>")
+        elif path == PATH_LOGIN:
+            self._send(200, portal.render_login().encode("utf-8"))
+        elif path in (PATH_HOME, PATH_BOOKINGS, PATH_FREE_FITNESS) and not portal.has_session(self._session()):
+            self._redirect(PATH_LOGIN)
+        elif path == PATH_HOME:
+            self._send(200, portal.render_home().encode("utf-8"))
+        elif path == PATH_BOOKINGS:
+            self._send(200, portal.render_bookings().encode("utf-8"))
+        elif path == PATH_FREE_FITNESS:
+            self._send(200, portal.render_free_fitness({}).encode("utf-8"))
+        elif path.startswith("/assets/"):
+            ext = path[path.rfind("."):]
+            self._send(200, self.server.portal.asset_body(ext), _ASSET_TYPES.get(ext, "application/octet-stream"))
+        else:
+            self._send(200, b"<html><body>mock portal</body></html>")
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+        if self._disturb(path):
+            self._send(503, b"<html><body>Service Unavailable</body></html>")
+            return
+        if path == PATH_LOGIN:
+            session = self.server.portal.login(form.get("UC_Login$TXTUser", ""), form.get("UC_Login$TXTPwd", ""))
+            if session is None:
+                self._send(200, self.server.portal.render_login("Credenziali non valide.").encode("utf-8"))
+            else:
+                self._redirect(PATH_HOME, {"Set-Cookie": f"{SESSION_COOKIE}={session}; Path=/; HttpOnly"})
+            return
+        if path != PATH_FREE_FITNESS:
+            self._send(404, b"not found")
+            return
+        if not self.server.portal.has_session(self._session()):
+            self._redirect(PATH_LOGIN)
+            return
+        try:
+            body = self.server.portal.handle_free_fitness_post(form)
+        except ValueError as e:
+            self._send(500, f"<html><body>{html.escape(str(e))}</body></html>".encode("utf-8"))
+            return
+        self._send(200, body.encode("utf-8"))
+
+
+class _PortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, portal: "MockPortal"):
+        super().__init__((portal.host, portal.port), _Handler)
+        self.portal = portal
+
+
+class MockPortal:
+    """Threaded HTTP server; use as a context manager or call start()/stop().
+
+    `target_date` is gray until `release_at` (portal epoch seconds); every other
+    day from today up to `horizon_days` ahead is clickable. `capacity` gives the
+    free places per slot index for every date. With `heavy_assets_kb`, the page
+    also pulls a stylesheet, web font, images and scripts of that size each,
+    some of them from a third-party host (`localhost` instead of 127.0.0.1).
+
+    With `users` (username -> password) only those credentials log in and the
+    reserved pages need the session cookie; without it any credentials work and
+    Free Fitness is open to everyone. Every page request is delayed by
+    `latency_ms` +/- `jitter_ms` and fails with 503 at `failure_rate`; assets
+    and HEAD requests get the delay but never fail. `seed` makes the noise
+    reproducible.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        clock_skew_s: float = 0.0,
+        target_date: Optional[datetime.date] = None,
+        release_at: Optional[float] = None,
+        horizon_days: int = 7,
+        slots: Optional[List[str]] = None,
+        capacity: Optional[List[int]] = None,
+        heavy_assets_kb: int = 0,
+        users: Optional[Dict[str, str]] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.clock_skew_s = clock_skew_s
+        self.target_date = target_date
+        self.release_at = release_at
+        self.horizon_days = horizon_days
+        self.slots = list(slots or DEFAULT_SLOTS)
+        self.capacity = list(capacity if capacity is not None else [1] * len(self.slots))
+        self.heavy_assets_kb = heavy_assets_kb
+        self.users = users
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.bookings: List[Tuple[datetime.date, int]] = []
+        self.booked_at: List[float] = []  # portal clock, parallel to `bookings`
+        self.failures = 0
+        self._sessions = set()
+        self._random = random.Random(seed)
+        self._free: Dict[Tuple[datetime.date, int], int] = {}
+        self._lock = threading.Lock()
+        self._secret = hashlib.sha256(str(time.time_ns()).encode()).digest()
+        self._server: Optional[_PortalServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def now(self) -> float:
+        """The portal's idea of the current epoch time (deliberately skewed)."""
+        return time.time() + self.clock_skew_s
+
+    def today(self) -> datetime.date:
+        return datetime.datetime.fromtimestamp(self.now()).date()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    @property
+    def login_url(self) -> str:
+        return f"http://{self.host}:{self.port}{PATH_LOGIN}"
+
+    @property
+    def free_fitness_url(self) -> str:
+        return f"http://{self.host}:{self.port}{PATH_FREE_FITNESS}"
+
+    def reset(self, release_at: Optional[float] = None):
+        """Forget bookings and sessions, and move the target day's release instant."""
+        with self._lock:
+            self.bookings.clear()
+            self.booked_at.clear()
+            self._free.clear()
+            self._sessions.clear()
+            self.failures = 0
+            self.release_at = release_at
+
+    # ---------------- fault injection ----------------
+    def disturb(self, is_page: bool) -> bool:
+        with self._lock:
+            delay_ms = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = is_page and self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return fail
+
+    # ---------------- login ----------------
+    def login(self, username: str, password: str) -> Optional[str]:
+        """New session id, or None for wrong credentials."""
+        if not username or (self.users is not None and self.users.get(username) != password):
+            return None
+        session = secrets.token_hex(12)
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    def has_session(self, session: Optional[str]) -> bool:
+        return self.users is None or session in self._sessions
+
+    # ---------------- booking state ----------------
+    def is_bookable(self, day: datetime.date) -> bool:
+        if day == self.target_date and self.release_at is not None:
+            return self.now() >= self.release_at
+        return self.today() <= day <= self.today() + datetime.timedelta(days=self.horizon_days)
+
+    def free_places(self, day: datetime.date, slot: int) -> int:
+        return self._free.get((day, slot), self.capacity[slot])
+
+    def _book(self, day: datetime.date, slot: int) -> str:
+        with self._lock:
+            if any(d == day for d, _ in self.bookings):
+                return MSG_ALREADY
+            if self.free_places(day, slot) <= 0:
+                return MSG_FULL
+            self._free[(day, slot)] = self.free_places(day, slot) - 1
+            self.bookings.append((day, slot))
+            self.booked_at.append(self.now())
+            return MSG_BOOKED
+
+    def cancel(self, day: datetime.date, slot: int):
+        """Give one place back, as if another member cancelled."""
+        with self._lock:
+            self._free[(day, slot)] = self.free_places(day, slot) + 1
+
+    # ---------------- heavy assets ----------------
+    def asset_body(self, ext: str) -> bytes:
+        filler = "x" * (self.heavy_assets_kb * 1024)
+        if ext == ".css":
+            return ("@font-face{font-family:Portal;src:url(/assets/portal.woff2)}"
+                    f"body{{font-family:Portal}}/*{filler}*/").encode("ascii")
+        if ext == ".js":
+            return f"/*{filler}*/".encode("ascii")
+        return filler.encode("ascii")
+
+    def _render_assets(self) -> str:
+        if not self.heavy_assets_kb:
+            return ""
+        third_party = f"http://localhost:{self.port}"
+        images = "".join(f'<img src="/assets/banner{i}.png" alt="" />' for i in range(4))
+        return (
+            '<link rel="stylesheet" href="/assets/site.css" />'
+            '<script src="/assets/app.js"></script>'
+            f'<script src="{third_party}/assets/tracker.js"></script>'
+            f'{images}<img src="{third_party}/assets/pixel.png" alt="" />'
+        )
+
+    # ---------------- view state ----------------
+    def _sign(self, viewstate: str) -> str:
+        return base64.b64encode(hmac.new(self._secret, viewstate.encode("ascii"), "sha256").digest()[:18]).decode()
+
+    def _encode_state(self, state: dict) -> str:
+        return base64.b64encode(json.dumps(state, sort_keys=True).encode("utf-8")).decode("ascii")
+
+    def _decode_state(self, form: Dict[str, str]) -> dict:
+        viewstate = form.get("__VIEWSTATE", "")
+        if not hmac.compare_digest(self._sign(viewstate), form.get("__EVENTVALIDATION", "")):
+            raise ValueError("Invalid postback or callback argument.")
+        return json.loads(base64.b64decode(viewstate))
+
+    # ---------------- login, home and bookings pages ----------------
+    def render_login(self, message: str = "") -> str:
+        return f"""<!DOCTYPE html>
+<html><head><title>Area riservata</title></head><body>
+<form method="post" action=".{PATH_LOGIN}" id="form1">
+<input type="text" name="UC_Login$TXTUser" id="UC_Login_TXTUser" />
+<input type="password" name="UC_Login$TXTPwd" id="UC_Login_TXTPwd" />
+<input type="submit" name="UC_Login$BTNLogin1" id="UC_Login_BTNLogin1" value="Accedi" />
+<span id="UC_Login_LBLMessaggio">{html.escape(message)}</span>
+</form></body></html>"""
+
+    def render_home(self) -> str:
+        return f"""<!DOCTYPE html>
+<html><head><title>Area riservata</title></head><body>
+<div id="BoxHeader"><a id="BoxHeader_HyperLink3" href=".{PATH_BOOKINGS}">Prenotazioni</a></div>
+</body></html>"""
+
+    def render_bookings(self) -> str:
+        return f"""<!DOCTYPE html>
+<html><head><title>Prenotazioni</title></head><body>
+<div id="BoxHeader"><a id="BoxHeader_HyperLink3" href=".{PATH_BOOKINGS}">Prenotazioni</a></div>
+<a id="UC_ElencoPrenotazioni_HLFreeFitness" href=".{PATH_FREE_FITNESS}" target="_blank">Free Fitness</a>
+</body></html>"""
+
+    # ---------------- Free Fitness page ----------------
+    def handle_free_fitness_post(self, form: Dict[str, str]) -> str:
+        state = self._decode_state(form)
+        target = form.get("__EVENTTARGET", "")
+        argument = form.get("__EVENTARGUMENT", "")
+        checked = [i for i in range(len(self.slots)) if form.get(self._slot_name(i)) == "on"]
+        message = ""
+        if target == "UC_FreeFitness$Calendar1" and argument.startswith("V"):
+            first = CALENDAR_EPOCH + datetime.timedelta(days=int(argument[1:]))
+            state["month"] = [first.year, first.month]
+        elif target == "UC_FreeFitness$Calendar1":
+            day = CALENDAR_EPOCH + datetime.timedelta(days=int(argument))
+            if not self.is_bookable(day):
+                raise ValueError("Invalid postback or callback argument.")
+            state["day"] = day.isoformat()
+            state["month"] = [day.year, day.month]
+        elif target == "UC_FreeFitness$LBConferma":
+            if not state.get("day") or not checked:
+                message = MSG_NO_SLOT
+            else:
+                message = self._book(datetime.date.fromisoformat(state["day"]), checked[0])
+        state["checked"] = checked if target != "UC_FreeFitness$LBConferma" else []
+        return self.render_free_fitness(state, message)
+
+    def _slot_name(self, idx: int) -> str:
+        return f"UC_FreeFitness$GVPeriodi$ctl{idx + 2:02d}$CBScelta"
+
+    def _render_calendar(self, year: int, month: int, selected: Optional[datetime.date]) -> str:
+        first = datetime.date(year, month, 1)
+        prev_first = (first - datetime.timedelta(days=1)).replace(day=1)
+        next_first = (first + datetime.timedelta(days=32)).replace(day=1)
+
+        def nav(day: datetime.date, label: str, title: str) -> str:
+            arg = f"V{(day - CALENDAR_EPOCH).days}"
+            return (f"<a href=\"javascript:__doPostBack('UC_FreeFitness$Calendar1','{arg}')\" "
+                    f"style=\"color:Black\" title=\"{title}\">{label}</a>")
+
+        rows = [
+            '<table id="UC_FreeFitness_Calendar1" cellspacing="0" cellpadding="2" title="Calendario">',
+            "<tr><td colspan=\"7\"><table class=\"title\"><tr>"
+            f"<td>{nav(prev_first, '&lt;', 'Vai al mese precedente')}</td>"
+            f"<td align=\"center\">{MONTH_IT[month - 1]} {year}</td>"
+            f"<td align=\"right\">{nav(next_first, '&gt;', 'Vai al mese successivo')}</td>"
+            "</tr></table></td></tr>",
+        ]
+        day = first - datetime.timedelta(days=first.weekday())
+        while day < next_first or day.weekday() != 0:
+            if day.weekday() == 0:
+                rows.append("<tr>")
+            if day.month != month:
+                rows.append(f'<td style="color:Gray">{day.day}</td>')
+            elif self.is_bookable(day):
+                style = "background-color:Silver;" if day == selected else ""
+                rows.append(
+                    f"<td style=\"{style}\"><a href=\"javascript:__doPostBack('UC_FreeFitness$Calendar1',"
+                    f"'{(day - CALENDAR_EPOCH).days}')\" style=\"color:Black\" "
+                    f"title=\"{day.day} {MONTH_IT[month - 1]}\">{day.day}</a></td>"
+                )
+            else:
+                rows.append(f'<td style="color:Gray">{day.day}</td>')
+            if day.weekday() == 6:
+                rows.append("</tr>")
+            day += datetime.timedelta(days=1)
+        rows.append("</table>")
+        return "".join(rows)
+
+    def _render_grid(self, day: datetime.date, checked: List[int]) -> str:
+        rows = ['<table id="UC_FreeFitness_GVPeriodi"><tr><th></th><th>Fascia oraria</th><th>Posti</th></tr>']
+        for i, label in enumerate(self.slots):
+            free = self.free_places(day, i)
+            attrs = f'id="UC_FreeFitness_GVPeriodi_CBScelta_{i}" type="checkbox" name="{self._slot_name(i)}"'
+            if free <= 0:
+                box = f'<span class="aspNetDisabled"><input {attrs} disabled="disabled" /></span>'
+            else:
+                checked_attr = ' checked="checked"' if i in checked else ""
+                box = f"<input {attrs}{checked_attr} />"
+            rows.append(f"<tr><td>{box}</td><td>{label}</td><td>{free}</td></tr>")
+        rows.append("</table>")
+        return "".join(rows)
+
+    def render_free_fitness(self, state: dict, message: str = "") -> str:
+        today = self.today()
+        year, month = state.get("month") or [today.year, today.month]
+        selected = datetime.date.fromisoformat(state["day"]) if state.get("day") else None
+        state = {"month": [year, month], "day": state.get("day"), "checked": state.get("checked", [])}
+        viewstate = self._encode_state(state)
+        grid = self._render_grid(selected, state["checked"]) if selected else ""
+        return f"""<!DOCTYPE html>
+<html><head><title>Free Fitness</title>{self._render_assets()}</head><body>
+<form method="post" action="./FreeFitness.aspx" id="form1">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{self._sign(viewstate)}" />
+<script type="text/javascript">
+function __doPostBack(t, a) {{
+  var f = document.forms['form1'];
+  f.__EVENTTARGET.value = t; f.__EVENTARGUMENT.value = a; f.submit();
+}}
+</script>
+{self._render_calendar(year, month, selected)}
+<span id="UC_FreeFitness_LBLMessaggio">{html.escape(message)}</span>
+{grid}
+<a id="UC_FreeFitness_LBConferma" href="javascript:__doPostBack('UC_FreeFitness$LBConferma','')">Conferma</a>
+</form></body></html>"""
+
+    # ---------------- server lifecycle ----------------
+    def start(self) -> "MockPortal":
+        self._server = _PortalServer(self)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockPortal":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,82 @@
+"""Book for several members at once, each in its own context of a shared Chromium."""
+import asyncio
+import collections
+import dataclasses
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from playwright.async_api import async_playwright
+
+import booking_backend as bb
+from clock_sync import ReleaseScheduler
+
+
+async def run_accounts(
+    jobs: List[bb.BookingJob],
+    concurrency: int = 4,
+    headless: bool = False,
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> List[bb.BookingResult]:
+    """Run `jobs` concurrently; returns one BookingResult per job, in input order.
+
+    Every job gets an isolated `browser.new_context()`, so cookies and sessions
+    never leak between accounts. At most `concurrency` jobs are in flight; a job
+    failure is recorded in its result and does not affect the others. Jobs that
+    wait for midnight share one server-clock measurement per portal (login URL
+    and time zone). One Chromium is launched per launch profile in use.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if not jobs:
+        return []
+    if log_cb and concurrency < len(jobs) and any(j.wait_for_midnight for j in jobs):
+        log_cb(f"Only {concurrency} of {len(jobs)} jobs can wait for midnight at once; the rest start later.")
+
+    gate = asyncio.Semaphore(concurrency)
+    # Concurrent jobs must not overwrite each other's screenshot and confirm reply.
+    shots = collections.Counter(j.screenshot_path for j in jobs if j.screenshot_path)
+    schedulers: Dict[Tuple[str, str], ReleaseScheduler] = {}
+    for job in jobs:
+        key = (job.login_url, str(job.portal_tz))
+        if job.wait_for_midnight and job.sync_server_clock and key not in schedulers:
+            schedulers[key] = ReleaseScheduler(job.login_url, tz=job.portal_tz)
+
+    async def run_one(browser, job: bb.BookingJob) -> bb.BookingResult:
+        logs: List[str] = []
+        if shots[job.screenshot_path] > 1:
+            shot = Path(job.screenshot_path)
+            suffix = "".join(c if c.isalnum() else "_" for c in job.label)
+            job = dataclasses.replace(job, screenshot_path=str(shot.with_stem(f"{shot.stem}_{suffix}")))
+
+        def job_log(msg: str):
+            logs.append(msg)
+            if log_cb:
+                log_cb(f"[{job.label}] {msg}")
+
+        async with gate:
+            started = time.monotonic()
+            try:
+                scheduler = schedulers.get((job.login_url, str(job.portal_tz)))
+                result = await bb.book_in_browser(browser, job, log_cb=job_log, scheduler=scheduler)
+            except Exception as e:
+                job_log(f"Failed: {e}")
+                result = bb.BookingResult(
+                    label=job.label, ok=False, error=str(e), slot_snapshot=getattr(e, "snapshot", [])
+                )
+            result.elapsed_s = time.monotonic() - started
+            result.logs = logs
+            return result
+
+    async with async_playwright() as p:
+        browsers: Dict[str, object] = {}
+        try:
+            for job in jobs:
+                if job.launch_profile not in browsers:
+                    browsers[job.launch_profile] = await bb.launch_browser(
+                        p, headless=headless, profile=job.launch_profile
+                    )
+            return list(await asyncio.gather(*(run_one(browsers[job.launch_profile], job) for job in jobs)))
+        finally:
+            for browser in browsers.values():
+                await browser.close()
@@ -0,0 +1,148 @@
+"""Request-blocking profiles for the Free Fitness page and per-reload traffic counters.
+
+Note that any Playwright route disables Chromium's HTTP cache for the page, so
+a profile only pays off when it blocks the heavy resource types; "off" installs
+no route at all.
+"""
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    name: str
+    blocked_types: FrozenSet[str] = frozenset()
+    block_third_party: bool = False
+    allowed_hosts: Tuple[str, ...] = ()  # extra hosts treated as first-party
+
+
+PROFILES = {
+    "off": NetworkProfile("off"),
+    # Keep documents, scripts and XHR (the postbacks need __doPostBack/WebResource.axd).
+    "lean": NetworkProfile(
+        "lean",
+        blocked_types=frozenset({"image", "media", "font"}),
+        block_third_party=True,
+    ),
+    "bare": NetworkProfile(
+        "bare",
+        blocked_types=frozenset({"image", "media", "font", "stylesheet", "texttrack", "manifest", "ping", "other"}),
+        block_third_party=True,
+    ),
+}
+
+
+@dataclass
+class ReloadSample:
+    """One reload. `latency_ms` is to domcontentloaded; the counters keep growing
+    while that navigation's late requests finish."""
+
+    latency_ms: float = 0.0
+    bytes: int = 0
+    requests: int = 0
+    blocked: int = 0
+
+
+@dataclass
+class NetworkMeter:
+    """Running totals for one page, plus one sample per `reload()`.
+
+    A request is charged to the reload that was current when it started, so
+    bytes that arrive after `reload()` returned still land in its sample.
+    """
+
+    page: object
+    profile: NetworkProfile
+    bytes: int = 0
+    requests: int = 0
+    blocked: int = 0
+    samples: List[ReloadSample] = field(default_factory=list)
+    _current: Optional[ReloadSample] = field(default=None, init=False, repr=False)
+    _owners: Dict[object, ReloadSample] = field(default_factory=dict, init=False, repr=False)
+
+    def _on_request(self, request):
+        if self._current is not None:
+            self._owners[request] = self._current
+
+    def _on_failed(self, request):
+        self._owners.pop(request, None)
+
+    def _on_blocked(self):
+        self.blocked += 1
+        if self._current is not None:
+            self._current.blocked += 1
+
+    async def _on_finished(self, request):
+        sample = self._owners.pop(request, None)
+        self.requests += 1
+        if sample is not None:
+            sample.requests += 1
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        size = sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        self.bytes += size
+        if sample is not None:
+            sample.bytes += size
+
+    async def reload(self, wait_until: str = "domcontentloaded"):
+        sample = ReloadSample()
+        self._current = sample
+        self.samples.append(sample)
+        started = time.monotonic()
+        response = await self.page.reload(wait_until=wait_until)
+        sample.latency_ms = (time.monotonic() - started) * 1000
+        return response
+
+    def summary(self) -> str:
+        if not self.samples:
+            return f"{self.profile.name}: no reloads"
+        n = len(self.samples)
+        latency = sum(s.latency_ms for s in self.samples) / n
+        size = sum(s.bytes for s in self.samples) / n
+        blocked = sum(s.blocked for s in self.samples) / n
+        return f"{self.profile.name}: {n} reloads, avg {latency:.0f} ms, {size / 1024:.1f} KiB, {blocked:.0f} blocked"
+
+
+def _first_party_hosts(page_url: str, profile: NetworkProfile) -> FrozenSet[str]:
+    return frozenset({urllib.parse.urlsplit(page_url).hostname or ""} | set(profile.allowed_hosts))
+
+
+async def install_network_profile(
+    page,
+    profile: Union[NetworkProfile, str],
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> NetworkMeter:
+    """Route `page` through `profile` and start counting its traffic."""
+    if isinstance(profile, str):
+        try:
+            profile = PROFILES[profile]
+        except KeyError:
+            raise ValueError(f"Unknown network profile: {profile}") from None
+    meter = NetworkMeter(page=page, profile=profile)
+    page.on("request", meter._on_request)
+    page.on("requestfinished", meter._on_finished)
+    page.on("requestfailed", meter._on_failed)
+
+    if profile.blocked_types or profile.block_third_party:
+        first_party = _first_party_hosts(page.url, profile)
+
+        async def handle(route):
+            request = route.request
+            host = urllib.parse.urlsplit(request.url).hostname or ""
+            if request.resource_type in profile.blocked_types or (
+                profile.block_third_party and host not in first_party and request.resource_type != "document"
+            ):
+                meter._on_blocked()
+                await route.abort()
+            else:
+                await route.fallback()  # lets a context route (HAR replay) answer it
+
+        await page.route("**/*", handle)
+    if log_cb:
+        log_cb(f"Network profile '{profile.name}' active on Free Fitness page.")
+    return meter
+
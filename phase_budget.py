@@ -0,0 +1,108 @@
+"""Per-phase time budgets and an overall run deadline, enforced with `asyncio.timeout`."""
+import asyncio
+import contextlib
+import sys
+import time
+from typing import Dict, List, Optional
+
+if sys.version_info < (3, 11):
+    raise ImportError("phase_budget needs Python 3.11 or newer (asyncio.timeout)")
+
+TIMEOUT = "timeout"  # BookingResult.outcome of a run stopped by a budget or the deadline
+CLOSE_TIMEOUT_S = 10.0
+
+
+class PhaseTimeout(TimeoutError):
+    """`phase` ran past its own budget, or the run's deadline passed while in it."""
+
+    def __init__(self, phase: str, limit_s: float, deadline: bool = False):
+        if deadline:
+            super().__init__(f"Run deadline of {limit_s:g}s passed during {phase}")
+        else:
+            super().__init__(f"{phase} ran out of its {limit_s:g}s budget")
+        self.phase = phase
+        self.limit_s = limit_s
+        self.deadline = deadline
+
+
+class PhaseBudget:
+    """Time limits keyed by span name, plus one for the whole run.
+
+    Attached to a `PhaseTracer`, every span enters `phase(name)`, so a phase
+    with a budget is cancelled at its next await once the budget is spent and
+    surfaces as PhaseTimeout naming it. `deadline()` does the same for the
+    whole run and names the innermost phase that was running; entering it
+    again while it is active is a no-op, so nested entry points can all use it.
+    After `start()`, every `deadline()` counts from that instant instead of
+    from its own entry, so a run can leave and re-enter it.
+    """
+
+    def __init__(self, phases: Optional[Dict[str, float]] = None, deadline_s: Optional[float] = None):
+        self.phases = dict(phases or {})
+        self.deadline_s = deadline_s
+        self.active: List[str] = []  # open phases, innermost last
+        self._deadline_at: Optional[float] = None
+        self._expired_in: Optional[str] = None
+        self._started_at: Optional[float] = None
+
+    def start(self):
+        """Start the run clock now, unless it already runs."""
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def phase(self, name: str):
+        limit = self.phases.get(name)
+        self.active.append(name)
+        try:
+            async with asyncio.timeout(limit) as cm:
+                yield
+        except TimeoutError:
+            if cm.expired():
+                raise PhaseTimeout(name, limit) from None
+            raise
+        except asyncio.CancelledError:
+            if self._deadline_at is not None and time.monotonic() >= self._deadline_at and self._expired_in is None:
+                self._expired_in = name
+            raise
+        finally:
+            self.active.pop()
+
+    @contextlib.asynccontextmanager
+    async def deadline(self):
+        if self.deadline_s is None or self._deadline_at is not None:
+            yield
+            return
+        now = time.monotonic()
+        self._deadline_at = now + self.deadline_s if self._started_at is None else self._started_at + self.deadline_s
+        self._expired_in = None
+        try:
+            async with asyncio.timeout(self._deadline_at - now) as cm:
+                yield
+        except TimeoutError:
+            if cm.expired():
+                raise PhaseTimeout(self._expired_in or "run", self.deadline_s, deadline=True) from None
+            raise
+        finally:
+            self._deadline_at = None
+
+
+async def close_within(resource, timeout_s: float = CLOSE_TIMEOUT_S) -> bool:
+    """`resource.close()` (a context or browser) bounded by `timeout_s`; False if it failed or hung."""
+    try:
+        async with asyncio.timeout(timeout_s):
+            await resource.close()
+        return True
+    except Exception:
+        return False
+
+
+async def settle(tasks: List["asyncio.Task"], timeout_s: float = CLOSE_TIMEOUT_S):
+    """Give background tasks `timeout_s` to finish, then cancel whatever is left."""
+    if not tasks:
+        return
+    _, pending = await asyncio.wait(tasks, timeout=timeout_s)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
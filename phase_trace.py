@@ -0,0 +1,131 @@
+"""Structured timing spans for the booking phases, emitted as JSON lines."""
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from phase_budget import PhaseTimeout
+
+Sink = Union[str, Path, Callable[[dict], None]]
+
+
+@dataclass
+class Span:
+    name: str
+    start_ms: float  # monotonic, relative to the tracer's creation
+    duration_ms: float = 0.0
+    outcome: str = "ok"  # ok | error | cancelled | timeout
+    attempts: Optional[int] = None
+    error: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class _SpanScope:
+    """`with` / `async with` wrapper that closes the span and records the outcome."""
+
+    def __init__(self, tracer: "PhaseTracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self._t0 = 0.0
+        self._limit = None
+
+    def set(self, attempts: Optional[int] = None, outcome: Optional[str] = None, **attrs):
+        if attempts is not None:
+            self.span.attempts = attempts
+        if outcome is not None:
+            self.span.outcome = outcome
+        self.span.attrs.update(attrs)
+
+    def __enter__(self) -> "_SpanScope":
+        self._t0 = time.monotonic()
+        self.span.start_ms = (self._t0 - self.tracer.origin) * 1000
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration_ms = (time.monotonic() - self._t0) * 1000
+        if exc_type is not None:
+            cancelled = issubclass(exc_type, asyncio.CancelledError)
+            timed_out = issubclass(exc_type, PhaseTimeout)
+            self.span.outcome = "cancelled" if cancelled else "timeout" if timed_out else "error"
+            self.span.error = None if cancelled else str(exc)
+        self.tracer._emit(self.span)
+        return False
+
+    async def __aenter__(self) -> "_SpanScope":
+        if self.tracer.budget is not None:
+            self._limit = self.tracer.budget.phase(self.span.name)
+            await self._limit.__aenter__()
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._limit is not None:
+            try:
+                await self._limit.__aexit__(exc_type, exc, tb)
+            except BaseException as e:  # the budget turned a cancellation into PhaseTimeout
+                self.__exit__(type(e), e, e.__traceback__)
+                raise
+        return self.__exit__(exc_type, exc, tb)
+
+
+class PhaseTracer:
+    """Collects spans for one run and streams them to a JSON-lines file or callback.
+
+    Every line carries the run id, so several runs can share one file and be
+    compared later; `summary_table()` aggregates the spans by phase. With a
+    `budget` (phase_budget.PhaseBudget), every async span is also held to its
+    phase's time limit.
+    """
+
+    def __init__(self, sink: Optional[Sink] = None, run_id: Optional[str] = None, **run_attrs):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.run_attrs = run_attrs
+        self.origin = time.monotonic()
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self.budget = None
+        self._sink = sink
+
+    def span(self, name: str, **attrs) -> _SpanScope:
+        return _SpanScope(self, Span(name=name, start_ms=0.0, attrs=dict(attrs)))
+
+    def traced(self, fn: Callable[[], Awaitable], name: str) -> Callable[[], Awaitable]:
+        """Wrap a no-argument coroutine function (e.g. a reload) so every call is a span."""
+
+        async def wrapped():
+            async with self.span(name):
+                return await fn()
+
+        return wrapped
+
+    def _emit(self, span: Span):
+        self.spans.append(span)
+        if self._sink is None:
+            return
+        record = {"run": self.run_id, "ts": self.started_at + span.start_ms / 1000, **self.run_attrs, **asdict(span)}
+        if callable(self._sink):
+            self._sink(record)
+        else:
+            with Path(self._sink).open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def summary_table(self) -> str:
+        """Phase | count | total | max | outcomes, in first-seen order."""
+        rows: Dict[str, dict] = {}
+        for s in self.spans:
+            row = rows.setdefault(s.name, {"count": 0, "total": 0.0, "max": 0.0, "attempts": 0, "outcomes": {}})
+            row["count"] += 1
+            row["total"] += s.duration_ms
+            row["max"] = max(row["max"], s.duration_ms)
+            row["attempts"] += s.attempts or 0
+            row["outcomes"][s.outcome] = row["outcomes"].get(s.outcome, 0) + 1
+        lines = [f"{'phase':<14}{'n':>4}{'total ms':>11}{'max ms':>10}{'tries':>7}  outcome"]
+        for name, row in rows.items():
+            outcomes = ", ".join(f"{k}x{v}" if v > 1 else k for k, v in row["outcomes"].items())
+            lines.append(
+                f"{name:<14}{row['count']:>4}{row['total']:>11.0f}{row['max']:>10.0f}"
+                f"{row['attempts'] or '':>7}  {outcomes}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,302 @@
+"""HTTP-level fast path for the Free Fitness WebForms page.
+
+The calendar day, the slot checkbox and the confirm link are all
+`__doPostBack` form posts. Instead of rendering each one in the browser, the
+engine parses the hidden fields out of the last response and posts the next
+form itself. Any surprise in the markup raises PostbackMismatch so the caller
+can fall back to the Playwright path.
+"""
+import asyncio
+import datetime
+import html.parser
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar
+from typing import Callable, Dict, List, Optional, Tuple
+
+CALENDAR_EPOCH = datetime.date(2000, 1, 1)  # ASP.NET Calendar day arguments count days from here
+CALENDAR_ID = "UC_FreeFitness_Calendar1"
+CONFIRM_ID = "UC_FreeFitness_LBConferma"
+
+_DOPOSTBACK_RE = re.compile(r"__doPostBack\(\\?'([^'\\]*)\\?',\s*\\?'([^'\\]*)\\?'\)")
+
+
+class PostbackMismatch(RuntimeError):
+    """The page does not look the way the fast path expects."""
+
+
+class DayNotReady(PostbackMismatch):
+    """The target day is rendered without a link (still gray)."""
+
+
+class ConfirmUnread(RuntimeError):
+    """The confirm post went out but its reply could not be read; the slot may be booked.
+
+    Deliberately not a PostbackMismatch: falling back to another path would
+    confirm a second time.
+    """
+
+
+@dataclass
+class PostbackLink:
+    id: str
+    text: str
+    title: str
+    target: str
+    argument: str
+
+
+@dataclass
+class Checkbox:
+    id: str
+    name: str
+    disabled: bool
+    checked: bool
+    autopostback: bool
+
+
+@dataclass
+class WebForm:
+    action: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    links: List[PostbackLink] = field(default_factory=list)
+    checkboxes: Dict[str, Checkbox] = field(default_factory=dict)
+
+
+class _FormParser(html.parser.HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form = WebForm(action="")
+        self._link: Optional[dict] = None
+        self._select: Optional[str] = None
+        self._select_first: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: (v or "") for k, v in attrs}
+        if tag == "form" and not self.form.action:
+            self.form.action = a.get("action", "")
+        elif tag == "input":
+            kind = a.get("type", "text").lower()
+            name = a.get("name")
+            if not name:
+                return
+            if kind == "checkbox":
+                self.form.checkboxes[a.get("id", name)] = Checkbox(
+                    id=a.get("id", name),
+                    name=name,
+                    disabled="disabled" in a,
+                    checked="checked" in a,
+                    autopostback="__doPostBack" in a.get("onclick", ""),
+                )
+            elif kind in ("hidden", "text", "password"):
+                self.form.fields[name] = a.get("value", "")
+            elif kind == "radio" and "checked" in a:
+                self.form.fields[name] = a.get("value", "on")
+        elif tag == "select":
+            self._select = a.get("name")
+            self._select_first = None
+        elif tag == "option" and self._select:
+            if self._select_first is None:
+                self._select_first = a.get("value", "")
+            if "selected" in a:
+                self.form.fields[self._select] = a.get("value", "")
+        elif tag == "a":
+            m = _DOPOSTBACK_RE.search(a.get("href", ""))
+            if m:
+                self._link = {"id": a.get("id", ""), "title": a.get("title", ""), "target": m.group(1),
+                              "argument": m.group(2), "text": ""}
+
+    def handle_endtag(self, tag):
+        if tag == "select" and self._select:
+            self.form.fields.setdefault(self._select, self._select_first or "")
+            self._select = None
+        elif tag == "a" and self._link is not None:
+            self._link["text"] = self._link["text"].strip()
+            self.form.links.append(PostbackLink(**self._link))
+            self._link = None
+
+    def handle_data(self, data):
+        if self._link is not None:
+            self._link["text"] += data
+
+
+def parse_webform(page_html: str) -> WebForm:
+    parser = _FormParser()
+    parser.feed(page_html)
+    parser.close()
+    form = parser.form
+    for required in ("__VIEWSTATE", "__EVENTVALIDATION"):
+        if required not in form.fields:
+            raise PostbackMismatch(f"{required} missing from page")
+    return form
+
+
+def calendar_unique_id(form: WebForm) -> str:
+    """The `$`-separated name the calendar posts back as (e.g. UC_FreeFitness$Calendar1)."""
+    for link in form.links:
+        if link.target.replace("$", "_") == CALENDAR_ID:
+            return link.target
+    raise PostbackMismatch("calendar postback target not found")
+
+
+def day_argument(date: datetime.date) -> str:
+    return str((date - CALENDAR_EPOCH).days)
+
+
+def _month_links(form: WebForm) -> List[Tuple[datetime.date, PostbackLink]]:
+    target = calendar_unique_id(form)
+    return sorted(
+        (
+            (CALENDAR_EPOCH + datetime.timedelta(days=int(link.argument[1:])), link)
+            for link in form.links
+            if link.target == target and link.argument.startswith("V") and link.argument[1:].isdigit()
+        ),
+        key=lambda item: item[0],
+    )
+
+
+def displayed_month(form: WebForm) -> Optional[Tuple[int, int]]:
+    """(year, month) the calendar shows, derived from its previous-month link; None without one."""
+    links = _month_links(form)
+    if not links:
+        return None
+    shown = (links[0][0] + datetime.timedelta(days=32)).replace(day=1)
+    return shown.year, shown.month
+
+
+class StdlibClient:
+    """Minimal cookie-keeping client with the same call shape as Playwright's APIRequestContext.
+
+    Lets the engine run without a browser (local checks, the mock portal).
+    """
+
+    class _Response:
+        def __init__(self, status: int, url: str, body: bytes):
+            self.status = status
+            self.url = url
+            self._body = body
+
+        async def text(self) -> str:
+            return self._body.decode("utf-8", "replace")
+
+    def __init__(self, cookies: Optional[CookieJar] = None):
+        self.cookies = cookies if cookies is not None else CookieJar()
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def _fetch(self, url: str, data: Optional[bytes]):
+        req = urllib.request.Request(url, data=data)
+        if data is not None:
+            req.add_header("Content-Type", "application/x-www-form-urlencoded")
+        try:
+            with self._opener.open(req) as resp:
+                return self._Response(resp.status, resp.geturl(), resp.read())
+        except urllib.error.HTTPError as e:
+            return self._Response(e.code, url, e.read())
+
+    async def get(self, url: str):
+        return await asyncio.to_thread(self._fetch, url, None)
+
+    async def post(self, url: str, form: Dict[str, str]):
+        return await asyncio.to_thread(self._fetch, url, urllib.parse.urlencode(form).encode("ascii"))
+
+
+class PostbackEngine:
+    """Drives day select, slot check and confirm as raw form posts.
+
+    `client` is normally `free_page.context.request`, which shares the
+    browser's cookies and keeps its connections alive between posts.
+    """
+
+    def __init__(self, client, page_url: str, page_html: str, log_cb: Optional[Callable[[str], None]] = None):
+        self.client = client
+        self.url = page_url
+        self.html = page_html
+        self.form = parse_webform(page_html)
+        self.log_cb = log_cb
+        self.timings: List[Tuple[str, float]] = []
+        self.posts = 0  # form posts sent; refresh GETs are only in `timings`
+
+    async def _request(self, label: str, form: Optional[Dict[str, str]] = None) -> str:
+        started = time.monotonic()
+        if form is None:
+            resp = await self.client.get(self.url)
+            target = self.url
+        else:
+            target = urllib.parse.urljoin(self.url, self.form.action or self.url)
+            self.posts += 1
+            resp = await self.client.post(target, form=form)
+        body = await resp.text()
+        self.timings.append((label, time.monotonic() - started))
+        if resp.status != 200:
+            raise PostbackMismatch(f"{label}: HTTP {resp.status}")
+        self.url = resp.url or target
+        self.html = body
+        self.form = parse_webform(body)
+        if self.log_cb:
+            self.log_cb(f"{label} took {self.timings[-1][1] * 1000:.0f} ms.")
+        return body
+
+    async def _postback(self, label: str, target: str, argument: str = "", checked: Tuple[str, ...] = ()):
+        form = dict(self.form.fields)
+        form["__EVENTTARGET"] = target
+        form["__EVENTARGUMENT"] = argument
+        for cb_id in checked:
+            form[self.form.checkboxes[cb_id].name] = "on"
+        return await self._request(label, form)
+
+    async def refresh(self) -> str:
+        return await self._request("Refresh")
+
+    def day_link(self, date: datetime.date, month_names: List[str]) -> PostbackLink:
+        target = calendar_unique_id(self.form)
+        title = f"{date.day} {month_names[date.month - 1]}"
+        argument = day_argument(date)
+        for link in self.form.links:
+            if link.target == target and (link.argument == argument or link.title == title):
+                return link
+        raise DayNotReady(f"day {date.day} has no postback link (still gray)")
+
+    async def show_month(self, date: datetime.date, max_steps: int = 24):
+        """Page the calendar with its previous/next links until `date`'s month is shown."""
+        for _ in range(max_steps):
+            shown = displayed_month(self.form)
+            if shown is None:
+                raise PostbackMismatch("calendar month links not found")
+            wanted = (date.year, date.month)
+            if shown == wanted:
+                return
+            links = _month_links(self.form)
+            _, link = links[-1] if wanted > shown else links[0]
+            await self._postback("Month postback", link.target, link.argument)
+        raise PostbackMismatch(f"could not page the calendar to {date:%Y-%m}")
+
+    async def select_day(self, date: datetime.date, month_names: List[str]):
+        shown = displayed_month(self.form)
+        if shown is not None and shown != (date.year, date.month):
+            await self.show_month(date)
+        link = self.day_link(date, month_names)
+        await self._postback("Day postback", link.target, link.argument)
+        if not self.form.checkboxes:
+            raise PostbackMismatch("slot grid not rendered after selecting the day")
+
+    async def confirm(self, slot_id: str) -> str:
+        cb = self.form.checkboxes.get(slot_id)
+        if cb is None:
+            raise PostbackMismatch(f"slot checkbox {slot_id} not in grid")
+        if cb.disabled:
+            raise PostbackMismatch(f"slot {slot_id} is disabled")
+        if cb.autopostback:
+            await self._postback("Slot postback", cb.name, checked=(slot_id,))
+            cb = self.form.checkboxes.get(slot_id, cb)
+        confirm = next((l for l in self.form.links if l.id == CONFIRM_ID), None)
+        if confirm is None:
+            raise PostbackMismatch("confirm link not found")
+        try:
+            return await self._postback("Confirm postback", confirm.target, confirm.argument, checked=(slot_id,))
+        except Exception as e:
+            raise ConfirmUnread(f"confirm sent but its reply was unreadable ({e})") from e
+
@@ -0,0 +1,137 @@
+"""Deadline-driven retry policy for the day-click and slot phases."""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class PhaseStats:
+    attempts: int = 0
+    reloads: int = 0
+    elapsed_s: float = 0.0
+
+
+@dataclass
+class RetryPolicy:
+    """When to retry, how long to pause, and how fast we may reload.
+
+    Right after the release instant (`mark_release`, or the phase start if no
+    release was marked) we hammer for `aggressive_window_s` with
+    `aggressive_pause_ms` between attempts; after that the pause grows
+    exponentially from `backoff_base_ms` up to `backoff_max_ms`, with
+    +/-`jitter` randomisation. A phase stops at `max_attempts` or once
+    `deadline_after_release_s` has passed, whichever comes first. Reloads are
+    spaced at least `min_reload_interval_ms` apart across all phases so the
+    portal does not throttle us.
+    """
+
+    max_attempts: Optional[int] = None
+    deadline_after_release_s: Optional[float] = None
+    aggressive_window_s: float = 0.0
+    aggressive_pause_ms: float = 0.0
+    backoff_base_ms: float = 50.0
+    backoff_factor: float = 2.0
+    backoff_max_ms: float = 2000.0
+    jitter: float = 0.2
+    min_reload_interval_ms: float = 0.0
+    release_mono: Optional[float] = None
+    stats: Dict[str, PhaseStats] = field(default_factory=dict)
+    _last_reload: float = field(default=float("-inf"), init=False, repr=False)
+
+    @classmethod
+    def fixed(cls, attempts: int, pause_ms: float = 50) -> "RetryPolicy":
+        """The historical behaviour: `attempts` tries, a constant pause between them."""
+        return cls(max_attempts=attempts, backoff_base_ms=pause_ms, backoff_factor=1.0, jitter=0.0)
+
+    @classmethod
+    def hammer(cls, window_s: float = 5.0, deadline_s: float = 120.0, min_reload_interval_ms: float = 150) -> "RetryPolicy":
+        """Hammer for `window_s` after the release, back off until `deadline_s`."""
+        return cls(
+            deadline_after_release_s=deadline_s,
+            aggressive_window_s=window_s,
+            aggressive_pause_ms=0.0,
+            backoff_base_ms=100.0,
+            backoff_max_ms=3000.0,
+            min_reload_interval_ms=min_reload_interval_ms,
+        )
+
+    def mark_release(self, mono: Optional[float] = None):
+        self.release_mono = time.monotonic() if mono is None else mono
+
+    def begin(self, phase: str) -> "PhaseRun":
+        return PhaseRun(self, phase)
+
+    def throttled(self, reload: Callable[[], Awaitable], phase: str = "reload") -> Callable[[], Awaitable]:
+        """Wrap `reload` so calls respect `min_reload_interval_ms` and are counted under `phase`."""
+
+        async def wrapped():
+            wait = self._last_reload + self.min_reload_interval_ms / 1000 - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_reload = time.monotonic()
+            self.stats.setdefault(phase, PhaseStats()).reloads += 1
+            return await reload()
+
+        return wrapped
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}: {s.attempts} attempts, {s.reloads} reloads, {s.elapsed_s:.2f}s" for name, s in self.stats.items()
+        )
+
+
+class PhaseRun:
+    """One phase's retry loop: `while run.next_attempt(): ...; await run.pause()`."""
+
+    def __init__(self, policy: RetryPolicy, phase: str):
+        self.policy = policy
+        self.phase = phase
+        self.stats = policy.stats.setdefault(phase, PhaseStats())
+        self.started = time.monotonic()
+        self.attempt = 0
+        self._backoff_step = 0
+
+    def _anchor(self) -> float:
+        return self.policy.release_mono if self.policy.release_mono is not None else self.started
+
+    def _deadline(self) -> Optional[float]:
+        if self.policy.deadline_after_release_s is None:
+            return None
+        return self._anchor() + self.policy.deadline_after_release_s
+
+    def next_attempt(self) -> bool:
+        """Start another attempt if the budget allows; updates the phase stats."""
+        self.stats.elapsed_s = time.monotonic() - self.started
+        if self.policy.max_attempts is not None and self.attempt >= self.policy.max_attempts:
+            return False
+        deadline = self._deadline()
+        if deadline is not None and self.attempt > 0 and time.monotonic() >= deadline:
+            return False
+        self.attempt += 1
+        self.stats.attempts += 1
+        return True
+
+    def next_delay(self) -> float:
+        """Seconds to pause before the next attempt."""
+        p = self.policy
+        if time.monotonic() - self._anchor() < p.aggressive_window_s:
+            delay = p.aggressive_pause_ms / 1000
+        else:
+            delay = min(p.backoff_max_ms, p.backoff_base_ms * p.backoff_factor ** self._backoff_step) / 1000
+            self._backoff_step += 1
+            if p.jitter:
+                delay *= 1 + random.uniform(-p.jitter, p.jitter)
+        deadline = self._deadline()
+        if deadline is not None:
+            delay = min(delay, max(0.0, deadline - time.monotonic()))
+        return max(0.0, delay)
+
+    async def pause(self):
+        delay = self.next_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def finish(self):
+        self.stats.elapsed_s = time.monotonic() - self.started
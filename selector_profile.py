@@ -0,0 +1,125 @@
+"""Learned lookups for the calendar and slot grid, persisted per page fingerprint."""
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from session_cache import CACHE_DIR
+from slot_grid import SlotInfo, SlotPreference
+
+PROFILE_PATH = CACHE_DIR / "selector_profile.json"
+MAX_FINGERPRINTS = 8
+
+# Ways to find a calendar day, in default order (see booking_backend.DAY_CLICK_JS).
+DAY_STRATEGIES = ("title", "anchor_text", "cell")
+
+CALENDAR_ID = "UC_FreeFitness_Calendar1"
+
+_GENERATOR_RE = re.compile(r'id="__VIEWSTATEGENERATOR"[^>]*value="([^"]*)"', re.IGNORECASE)
+_DAY_TITLE_RE = re.compile(r'<a[^>]*\btitle="\d{1,2} [a-z]+"', re.IGNORECASE)
+_FIELD_NAME_RE = re.compile(r'<(?:input|select|textarea)[^>]*\bname="([^"]+)"', re.IGNORECASE)
+
+
+def page_fingerprint(page_html: str) -> str:
+    """Short hash of what the lookups depend on, not of the day's data.
+
+    Covers the ASP.NET page version (`__VIEWSTATEGENERATOR`, when rendered),
+    the calendar ID, whether day anchors carry "<day> <month>" titles and the
+    names of the form fields outside the slot grid. The shown month, a
+    selected day and the grid's rows do not change it.
+    """
+    generator = _GENERATOR_RE.search(page_html)
+    fields = {name for name in _FIELD_NAME_RE.findall(page_html) if "GVPeriodi" not in name}
+    features = [
+        generator.group(1) if generator else "",
+        f'id="{CALENDAR_ID}"' in page_html,
+        bool(_DAY_TITLE_RE.search(page_html)),
+        sorted(fields),
+    ]
+    return hashlib.sha256(json.dumps(features).encode("utf-8")).hexdigest()[:12]
+
+
+def _slot_range(slot: SlotInfo) -> Optional[str]:
+    return f"{slot.start}-{slot.end}" if slot.start and slot.end else None
+
+
+class SelectorProfile:
+    """What worked on earlier runs, for the page version in front of us.
+
+    Call `use(fingerprint)` once the Free Fitness page is loaded: a known
+    fingerprint brings back the winning day-click strategy and the time range
+    each slot checkbox stood for; an unknown one starts empty, so a portal
+    change is re-learned by the next successful run. `save()` keeps the last
+    `MAX_FINGERPRINTS` entries.
+    """
+
+    def __init__(self, path: Path = PROFILE_PATH):
+        self.path = Path(path)
+        self.fingerprint: Optional[str] = None
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except Exception:
+            pass
+
+    @property
+    def entry(self) -> dict:
+        if self.fingerprint is None:
+            return {}
+        return self._entries.setdefault(self.fingerprint, {"day_strategy": None, "slots": {}})
+
+    def use(self, fingerprint: str) -> bool:
+        """Select the entry for `fingerprint`; True when something was learned for it before."""
+        self.fingerprint = fingerprint
+        entry = self._entries.get(fingerprint)
+        return bool(entry and (entry.get("day_strategy") or entry.get("slots")))
+
+    def day_order(self) -> List[str]:
+        learned = self.entry.get("day_strategy")
+        if learned not in DAY_STRATEGIES:
+            return list(DAY_STRATEGIES)
+        return [learned] + [s for s in DAY_STRATEGIES if s != learned]
+
+    def learn_day(self, strategy: Optional[str]):
+        if self.fingerprint is not None and strategy in DAY_STRATEGIES and self.entry["day_strategy"] != strategy:
+            self.entry["day_strategy"] = strategy
+            self._dirty = True
+
+    def learn_slot(self, slot: SlotInfo):
+        """Remember the time range of a checkbox that just booked."""
+        slot_range = _slot_range(slot)
+        if self.fingerprint is not None and slot_range and self.entry["slots"].get(slot.selector) != slot_range:
+            self.entry["slots"][slot.selector] = slot_range
+            self._dirty = True
+
+    def resolve(self, preferences: Sequence[SlotPreference]) -> List[SlotPreference]:
+        """Put the learned time range ahead of each fixed `#checkbox-id` preference.
+
+        The ID stays as a fallback, so a time range missing from today's grid
+        behaves as before.
+        """
+        slots = self.entry.get("slots", {})
+        resolved: List[SlotPreference] = []
+        for pref in preferences:
+            if isinstance(pref, str) and pref in slots:
+                resolved.append(slots[pref])
+            resolved.append(pref)
+        return resolved
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.entry["updated_at"] = time.time()
+        recent = sorted(self._entries.items(), key=lambda kv: kv[1].get("updated_at", 0), reverse=True)
+        self._entries = dict(recent[:MAX_FINGERPRINTS])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -0,0 +1,91 @@
+"""Per-user cache of the logged-in browser state and the direct Free Fitness URL."""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+CACHE_DIR = Path(".session_cache")
+DEFAULT_MAX_AGE_S = 12 * 3600
+
+
+class SessionCache:
+    """Stores Playwright `storage_state` plus a small JSON sidecar per username.
+
+    Files are keyed by a hash of the username so the directory listing does not
+    reveal accounts. An entry older than `max_age_s` is treated as missing; a
+    stale-but-young entry is caught by the caller when the page bounces to login.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_age_s: float = DEFAULT_MAX_AGE_S):
+        self.root = Path(root)
+        self.max_age_s = max_age_s
+
+    def _key(self, username: str) -> str:
+        return hashlib.sha256(username.encode("utf-8")).hexdigest()[:16]
+
+    def state_path(self, username: str) -> Path:
+        return self.root / f"{self._key(username)}.state.json"
+
+    def _meta_path(self, username: str) -> Path:
+        return self.root / f"{self._key(username)}.meta.json"
+
+    def meta(self, username: str) -> dict:
+        try:
+            with self._meta_path(username).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_meta(self, username: str, data: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._meta_path(username).with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self._meta_path(username))
+
+    def load(self, username: str) -> Optional[dict]:
+        """Return the sidecar if a usable entry exists (state file present, not expired)."""
+        meta = self.meta(username)
+        if not meta.get("free_fitness_url") or not self.state_path(username).exists():
+            return None
+        if time.time() - meta.get("saved_at", 0) > self.max_age_s:
+            return None
+        return meta
+
+    async def save(self, context, username: str, free_fitness_url: str):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.state_path(username)
+        await context.storage_state(path=str(path))
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+        meta = self.meta(username)
+        meta.update({"saved_at": time.time(), "free_fitness_url": free_fitness_url})
+        self._write_meta(username, meta)
+
+    def invalidate(self, username: str):
+        self.state_path(username).unlink(missing_ok=True)
+        meta = self.meta(username)
+        meta.pop("free_fitness_url", None)
+        meta.pop("saved_at", None)
+        if meta:
+            self._write_meta(username, meta)
+        else:
+            self._meta_path(username).unlink(missing_ok=True)
+
+    def record_startup(self, username: str, warm: bool, seconds: float) -> dict:
+        """Remember the latest cold/warm time-to-calendar; returns the updated sidecar."""
+        meta = self.meta(username)
+        meta["warm_start_s" if warm else "cold_start_s"] = round(seconds, 3)
+        self._write_meta(username, meta)
+        return meta
+
+    def record_first_reload(self, username: str, warm: bool, seconds: float) -> dict:
+        """Remember the latest first-reload latency with/without connection warm-up."""
+        meta = self.meta(username)
+        meta["warm_reload_s" if warm else "cold_reload_s"] = round(seconds, 3)
+        self._write_meta(username, meta)
+        return meta
@@ -0,0 +1,164 @@
+"""One-shot snapshot of the GVPeriodi slot grid and ranked slot selection."""
+import html.parser
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+GRID_ID = "UC_FreeFitness_GVPeriodi"
+
+# Every row of the grid in one round trip: checkbox id/name/state plus the row text.
+SLOT_SNAPSHOT_JS = """
+(gridSel) => {
+  const grid = document.querySelector(gridSel);
+  if (!grid) return null;
+  return Array.from(grid.querySelectorAll("tr"))
+    .filter((tr) => tr.querySelector("input[type=checkbox]"))
+    .map((tr, index) => {
+      const cb = tr.querySelector("input[type=checkbox]");
+      const cells = Array.from(tr.querySelectorAll("td")).map((td) => td.textContent.trim()).filter(Boolean);
+      return {index, id: cb.id, name: cb.name, enabled: !cb.disabled, checked: cb.checked, label: cells.join(" | ")};
+    });
+}
+"""
+
+_RANGE_RE = re.compile(r"(\d{1,2})(?:[.:](\d{2}))?\s*-\s*(\d{1,2})(?:[.:](\d{2}))?")
+
+SlotPreference = Union[int, str]
+
+
+@dataclass
+class SlotInfo:
+    index: int
+    id: str
+    name: str
+    enabled: bool
+    checked: bool
+    label: str
+    start: Optional[str] = None  # "HH:MM"
+    end: Optional[str] = None
+
+    @property
+    def selector(self) -> str:
+        return f"#{self.id}"
+
+
+def parse_time_range(label: str):
+    """'14-15.30' / '17.00 - 18.30' / '18:30-20:00' -> ('14:00', '15:30'); (None, None) if absent."""
+    m = _RANGE_RE.search(label)
+    if not m:
+        return None, None
+    h1, m1, h2, m2 = m.groups()
+    return f"{int(h1):02d}:{m1 or '00'}", f"{int(h2):02d}:{m2 or '00'}"
+
+
+def _normalise_time(text: str) -> Optional[str]:
+    m = re.fullmatch(r"\s*(\d{1,2})(?:[.:](\d{2}))?\s*", text)
+    return f"{int(m.group(1)):02d}:{m.group(2) or '00'}" if m else None
+
+
+def slots_from_rows(rows: Optional[List[dict]]) -> List[SlotInfo]:
+    slots = []
+    for row in rows or []:
+        start, end = parse_time_range(row.get("label", ""))
+        slots.append(SlotInfo(start=start, end=end, **row))
+    return slots
+
+
+async def read_slot_grid(page, grid_selector: str = f"#{GRID_ID}") -> List[SlotInfo]:
+    """Snapshot every row of the grid with a single `page.evaluate` (empty if no grid)."""
+    return slots_from_rows(await page.evaluate(SLOT_SNAPSHOT_JS, grid_selector))
+
+
+class _GridParser(html.parser.HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[dict] = []
+        self._depth = 0  # nesting depth inside the grid table
+        self._row: Optional[dict] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: (v or "") for k, v in attrs}
+        if tag == "table" and (self._depth or a.get("id") == GRID_ID):
+            self._depth += 1
+        if not self._depth:
+            return
+        if tag == "tr":
+            self._row = {"cells": [], "box": None}
+        elif tag == "td" and self._row is not None:
+            self._cell = []
+        elif tag == "input" and self._row is not None and a.get("type", "").lower() == "checkbox":
+            self._row["box"] = a
+
+    def handle_endtag(self, tag):
+        if not self._depth:
+            return
+        if tag == "td" and self._row is not None and self._cell is not None:
+            text = "".join(self._cell).strip()
+            if text:
+                self._row["cells"].append(text)
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            box = self._row["box"]
+            if box is not None:
+                self.rows.append({
+                    "index": len(self.rows),
+                    "id": box.get("id", ""),
+                    "name": box.get("name", ""),
+                    "enabled": "disabled" not in box,
+                    "checked": "checked" in box,
+                    "label": " | ".join(self._row["cells"]),
+                })
+            self._row = None
+        elif tag == "table":
+            self._depth -= 1
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def slots_from_html(page_html: str) -> List[SlotInfo]:
+    """Same snapshot as `read_slot_grid`, taken from raw HTML (postback responses)."""
+    parser = _GridParser()
+    parser.feed(page_html)
+    parser.close()
+    return slots_from_rows(parser.rows)
+
+
+def _matches(slot: SlotInfo, pref: SlotPreference) -> bool:
+    if isinstance(pref, int):
+        return slot.index == pref
+    if pref.startswith("#"):
+        return slot.id == pref[1:]
+    start, end = parse_time_range(pref)
+    if start is not None:
+        return (slot.start, slot.end) == (start, end)
+    at = _normalise_time(pref)
+    if at is not None:
+        return slot.start == at
+    return pref.lower() in slot.label.lower()
+
+
+def preference_index(slot: SlotInfo, preferences: Sequence[SlotPreference]) -> Optional[int]:
+    """Position of the first preference `slot` satisfies ("*" included); None if none does."""
+    for i, pref in enumerate(preferences):
+        if pref == "*" or _matches(slot, pref):
+            return i
+    return None
+
+
+def rank_slots(snapshot: Sequence[SlotInfo], preferences: Sequence[SlotPreference]) -> List[SlotInfo]:
+    """Order the grid rows by the first preference each one satisfies.
+
+    A preference is a row index, a `#checkbox-id` selector, a start time
+    ("18:30"), a time range ("17-18.30") or a label substring; "*" stands for
+    every remaining row in grid order. Rows matching nothing are left out.
+    Disabled rows are kept (callers skip them) so the ranking can be logged.
+    """
+    ranked: List[SlotInfo] = []
+    for pref in preferences:
+        for slot in snapshot:
+            if slot not in ranked and (pref == "*" or _matches(slot, pref)):
+                ranked.append(slot)
+    return ranked
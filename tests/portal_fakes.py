@@ -0,0 +1,37 @@
+"""In-process stand-ins for the Free Fitness page, shared by the engine and watcher tests."""
+from types import SimpleNamespace
+
+PAGE_URL = "http://portal.test/FreeFitness.aspx"
+
+
+class PortalClient:
+    """Answers the engine's requests with the mock portal's page handler, no server involved.
+
+    `fail_confirm_with` answers every confirm post with that HTTP status;
+    `fail_gets` answers that many GETs (refreshes) with a 500 first.
+    """
+
+    def __init__(self, portal, fail_confirm_with=None, fail_gets=0):
+        self.portal = portal
+        self.fail_confirm_with = fail_confirm_with
+        self.fail_gets = fail_gets
+        self.posts = []
+
+    async def get(self, url):
+        if self.fail_gets:
+            self.fail_gets -= 1
+            return self._response(500, url, "<html>Server Error</html>")
+        return self._response(200, url, self.portal.render_free_fitness({}))
+
+    async def post(self, url, form):
+        self.posts.append(form["__EVENTTARGET"])
+        if form["__EVENTTARGET"].endswith("LBConferma") and self.fail_confirm_with:
+            return self._response(self.fail_confirm_with, url, "<html>Service Unavailable</html>")
+        return self._response(200, url, self.portal.handle_free_fitness_post(form))
+
+    @staticmethod
+    def _response(status, url, body):
+        async def text():
+            return body
+
+        return SimpleNamespace(status=status, url=url, text=text)
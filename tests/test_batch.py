@@ -0,0 +1,72 @@
+import asyncio
+import datetime
+
+import pytest
+
+import booking_backend as bb
+from phase_budget import TIMEOUT
+
+DATES = [datetime.date(2026, 3, 2), datetime.date(2026, 3, 3), datetime.date(2026, 3, 4)]
+
+
+class FreePage:
+    url = "http://127.0.0.1:8080/FreeFitness.aspx"
+
+    def __init__(self):
+        self.gotos = 0
+
+    async def goto(self, url, wait_until):
+        self.gotos += 1
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """Fake browser session: `slow` dates take a second, `broken` dates raise."""
+    page = FreePage()
+    state = {"page": page, "booked": [], "released": 0, "slow": set(), "broken": set()}
+
+    async def open_free_page(browser, job, log_cb=None):
+        return object(), page, True, 0.5
+
+    async def book_on_free_page(free_page, job, log_cb=None, scheduler=None, background=None):
+        async with job.tracer.span("confirm"):
+            if job.target_date in state["slow"]:
+                await asyncio.sleep(1)
+            if job.target_date in state["broken"]:
+                raise RuntimeError("portal error")
+        state["booked"].append(job.target_date)
+        return bb.BookingResult(label=job.label, ok=True, slot_selector=job.primary_slot_selector)
+
+    async def release_context(context, job, log_cb=None):
+        state["released"] += 1
+        return True
+
+    monkeypatch.setattr(bb, "open_free_page", open_free_page)
+    monkeypatch.setattr(bb, "book_on_free_page", book_on_free_page)
+    monkeypatch.setattr(bb, "release_context", release_context)
+    return state
+
+
+def run(**options):
+    job = bb.BookingJob("anna", "pw", DATES[0], bb.SEL_SLOT_0, False, screenshot_path=None, **options)
+    return asyncio.run(bb.book_batch_in_browser(None, job, [(d, None) for d in DATES]))
+
+
+def test_deadline_on_the_second_date_times_out_the_rest(batch):
+    batch["slow"].add(DATES[1])
+    results = run(deadline_s=0.2)
+    assert [r.label for r in results] == [f"anna {d}" for d in DATES]
+    assert [(r.ok, r.outcome) for r in results] == [(True, None), (False, TIMEOUT), (False, TIMEOUT)]
+    assert [r.timeout_phase for r in results] == [None, "confirm", "confirm"]
+    assert batch["booked"] == [DATES[0]]  # the third date is never started
+    assert batch["page"].gotos == 1
+    assert batch["released"] == 1
+
+
+def test_a_failed_date_does_not_stop_the_batch(batch):
+    batch["broken"].add(DATES[1])
+    results = run()
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].error == "portal error"
+    assert results[0].startup_s == 0.5 and results[0].warm_start
+    assert batch["booked"] == [DATES[0], DATES[2]]
@@ -0,0 +1,43 @@
+import pytest
+
+import booking_backend as bb
+from booking_cli import ConfigError, job_from_config, jobs_from_config, main
+
+BASE = {"username": "anna", "password": "pw", "date": "2026-11-25"}
+
+
+@pytest.mark.parametrize("value, expected", [("False", False), ("True", True), (False, False), ("1", True), ("no", False)])
+def test_wpf_string_flags(value, expected):
+    job = job_from_config({**BASE, "wait_midnight": value, "try_other_slots": value})
+    assert job.wait_for_midnight is expected
+    assert job.try_other_slots is expected
+
+
+def test_unknown_flag_word_is_rejected():
+    with pytest.raises(ConfigError, match="wait_midnight"):
+        job_from_config({**BASE, "wait_midnight": "sometimes"})
+
+
+@pytest.mark.parametrize("slot_idx", ["-1", "4", 7])
+def test_slot_idx_out_of_range(slot_idx):
+    with pytest.raises(ConfigError, match="slot_idx"):
+        job_from_config({**BASE, "slot_idx": slot_idx})
+
+
+def test_slot_idx_picks_selector():
+    assert job_from_config({**BASE, "slot_idx": "3"}).primary_slot_selector == bb.SLOT_SELECTORS[3]
+
+
+def test_jobs_override_shared_keys():
+    jobs = jobs_from_config({**BASE, "slot_idx": "1", "jobs": [{}, {"username": "bruno", "slot_idx": "2"}]})
+    assert [(j.username, j.primary_slot_selector) for j in jobs] == [
+        ("anna", bb.SLOT_SELECTORS[1]),
+        ("bruno", bb.SLOT_SELECTORS[2]),
+    ]
+
+
+def test_check_exits_2_on_bad_config(tmp_path, capsys):
+    config = tmp_path / "booking_config.json"
+    config.write_text('{"username": "a", "password": "b", "date": "2026-11-25", "try_other_slots": "maybe"}')
+    assert main(["-c", str(config), "--check"]) == 2
+    assert "try_other_slots" in capsys.readouterr().err
@@ -0,0 +1,91 @@
+import asyncio
+import datetime
+
+import pytest
+
+import booking_backend as bb
+import mock_portal
+from cancellation_watch import CancellationWatcher, WatchTarget
+from confirm_outcome import BOOKED, UNKNOWN
+from portal_fakes import PAGE_URL, PortalClient
+from postback import PostbackEngine
+
+CONFIRM = "UC_FreeFitness$LBConferma"
+
+
+@pytest.fixture
+def portal():
+    return mock_portal.MockPortal(capacity=[0, 0, 0, 0])
+
+
+@pytest.fixture
+def day(portal):
+    return portal.today() + datetime.timedelta(days=1)
+
+
+def watcher(day, preferences=("*",), **options):
+    job = bb.BookingJob("u", "p", day, "*", False, screenshot_path=None)
+    return CancellationWatcher(
+        job, [WatchTarget(day, list(preferences))], interval_s=0.01, jitter=0, min_request_interval_s=0, **options
+    )
+
+
+def engine_for(portal, **client_options):
+    return PostbackEngine(PortalClient(portal, **client_options), PAGE_URL, portal.render_free_fitness({}))
+
+
+def kinds(w):
+    return [(e.kind, e.detail) for e in w.events]
+
+
+def test_diff_reports_open_free_fill_and_close(day):
+    w = watcher(day)
+    labels = {"a": "14-15.30", "b": "17-18.30"}
+    w._diff(day, None, {})
+    w._diff(day, {"a": False, "b": True}, labels)
+    w._diff(day, {"a": True, "b": False}, labels)
+    w._diff(day, None, {})
+    assert kinds(w) == [("opened", ""), ("freed", "14-15.30"), ("filled", "17-18.30"), ("closed", "")]
+
+
+def test_freed_slot_is_booked_and_date_leaves_the_watch(portal, day):
+    w = watcher(day)
+    w._engine = engine_for(portal)
+    asyncio.run(w.poll_once())
+    assert w.targets and not portal.bookings
+    portal.cancel(day, 2)
+    asyncio.run(w.poll_once())
+    assert portal.bookings == [(day, 2)]
+    assert not w.targets and day not in w._grids
+    assert [(r.ok, r.outcome) for r in w.results] == [(True, BOOKED)]
+    assert [k for k, _ in kinds(w)] == ["freed", "booked"]
+
+
+def test_lost_confirm_reply_drops_the_date_without_retrying(portal, day):
+    portal.cancel(day, 1)
+    portal.cancel(day, 3)
+    w = watcher(day)
+    w._engine = engine_for(portal, fail_confirm_with=503)
+    asyncio.run(w.poll_once())
+    assert w._engine.client.posts.count(CONFIRM) == 1
+    assert not w.targets
+    assert [(r.ok, r.outcome) for r in w.results] == [(False, UNKNOWN)]
+    assert kinds(w)[-1][0] == "unknown"
+
+
+def test_mismatch_logs_in_again_and_refreshes(portal, day):
+    portal.cancel(day, 0)
+    w = watcher(day)
+    engines = [engine_for(portal, fail_gets=1), engine_for(portal)]
+    logins = []
+
+    async def login():
+        logins.append(len(logins))
+        w._engine = engines[len(logins) - 1]
+
+    results = asyncio.run(w.watch(login, max_polls=5))
+    assert logins == [0, 1]
+    assert [k for k, _ in kinds(w)] == ["session", "booked"]
+    assert "Refresh: HTTP 500" in kinds(w)[0][1]
+    assert [(r.ok, r.outcome) for r in results] == [(True, BOOKED)]
+    assert portal.bookings == [(day, 0)]
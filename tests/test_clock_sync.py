@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+import zoneinfo
+
+import pytest
+
+import mock_portal
+from clock_sync import PORTAL_TZ, ClockSample, ReleaseScheduler, next_midnight, offset_from_samples
+
+UTC = datetime.timezone.utc
+
+
+def test_offset_brackets_true_skew():
+    skew = 1.3
+    samples = [
+        # Server stamps are whole seconds of (local + skew) at some instant inside [t_send, t_recv].
+        ClockSample(t_send=100.00, t_recv=100.10, server_second=101.0),
+        ClockSample(t_send=100.65, t_recv=100.75, server_second=102.0),
+        ClockSample(t_send=101.62, t_recv=101.72, server_second=102.0),
+    ]
+    offset = offset_from_samples(samples)
+    assert offset.offset - offset.uncertainty <= skew <= offset.offset + offset.uncertainty
+    assert offset.uncertainty < 0.5
+    assert offset.rtt == pytest.approx(0.10)
+    assert offset.samples == 3
+
+
+def test_inconsistent_sample_restarts_interval():
+    samples = [
+        ClockSample(t_send=100.0, t_recv=100.1, server_second=101.0),
+        ClockSample(t_send=200.0, t_recv=200.1, server_second=250.0),  # another clock entirely
+    ]
+    offset = offset_from_samples(samples)
+    assert 49.8 <= offset.offset <= 51.0
+
+
+def test_next_midnight_defaults_to_rome():
+    # 22:30 UTC on 1 July is already 00:30 on 2 July in Rome, so the release is the one after.
+    now = datetime.datetime(2026, 7, 1, 22, 30, tzinfo=UTC).timestamp()
+    midnight = datetime.datetime.fromtimestamp(next_midnight(now), PORTAL_TZ)
+    assert midnight == datetime.datetime(2026, 7, 3, 0, 0, tzinfo=PORTAL_TZ)
+    assert next_midnight(now) == next_midnight(now, PORTAL_TZ)
+
+
+def test_next_midnight_in_given_zone():
+    now = datetime.datetime(2026, 1, 15, 20, 0, tzinfo=UTC).timestamp()
+    assert next_midnight(now, UTC) == datetime.datetime(2026, 1, 16, tzinfo=UTC).timestamp()
+    # Rome is UTC+1 in winter, so its midnight comes an hour earlier.
+    assert next_midnight(now) == datetime.datetime(2026, 1, 15, 23, tzinfo=UTC).timestamp()
+
+
+def test_next_midnight_across_dst_change():
+    # The night Rome springs forward still ends at local midnight, 23 hours after the previous one.
+    tz = zoneinfo.ZoneInfo("Europe/Rome")
+    now = datetime.datetime(2026, 3, 29, 12, 0, tzinfo=tz).timestamp()
+    assert datetime.datetime.fromtimestamp(next_midnight(now, tz), tz) == datetime.datetime(2026, 3, 30, tzinfo=tz)
+
+
+def test_scheduler_measures_a_skewed_mock_portal():
+    with mock_portal.MockPortal(clock_skew_s=1.7) as portal:
+        scheduler = ReleaseScheduler(portal.login_url, samples=6)
+        offset = asyncio.run(scheduler.sync())
+    assert offset.offset - offset.uncertainty <= 1.7 <= offset.offset + offset.uncertainty
+    assert offset.uncertainty < 0.25
+    assert scheduler.next_release() == next_midnight(offset.server_now())
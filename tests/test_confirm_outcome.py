@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import booking_backend as bb
+import mock_portal
+from confirm_outcome import ALREADY, BOOKED, ERROR, FULL, UNKNOWN, classify_message, outcome_from_html
+
+
+@pytest.mark.parametrize(
+    "message, status",
+    [
+        (mock_portal.MSG_BOOKED, BOOKED),
+        ("Prenotazione confermata.", BOOKED),
+        (mock_portal.MSG_FULL, FULL),
+        ("Fascia oraria non più disponibile", FULL),
+        ("Turno completo", FULL),
+        (mock_portal.MSG_ALREADY, ALREADY),
+        ("Risulta gia' una prenotazione per oggi", ALREADY),
+        (mock_portal.MSG_NO_SLOT, ERROR),
+        ("   ", UNKNOWN),
+    ],
+)
+def test_classify_message(message, status):
+    assert classify_message(message) == status
+
+
+def test_outcome_from_rendered_page():
+    portal = mock_portal.MockPortal()
+    outcome = outcome_from_html(portal.render_free_fitness({}, mock_portal.MSG_FULL))
+    assert outcome.status == FULL and outcome.message == mock_portal.MSG_FULL
+    assert not outcome.ok
+    assert outcome_from_html(portal.render_free_fitness({})).status == UNKNOWN
+
+
+def test_outcome_unescapes_and_strips_markup():
+    outcome = outcome_from_html('<span id="UC_FreeFitness_LBLMessaggio"><b>Prenotazione effettuata</b> &amp; ok</span>')
+    assert outcome.ok and outcome.message == "Prenotazione effettuata & ok"
+
+
+def _page_showing(message):
+    portal = mock_portal.MockPortal()
+
+    async def wait_for_load_state(state, timeout):
+        pass
+
+    async def content():
+        return portal.render_free_fitness({}, message)
+
+    return SimpleNamespace(wait_for_load_state=wait_for_load_state, content=content)
+
+
+def test_lost_reply_trusts_only_a_success_message():
+    outcome, _ = asyncio.run(bb.outcome_after_lost_reply(_page_showing(mock_portal.MSG_BOOKED)))
+    assert outcome.status == BOOKED
+    # A "full" message may be left over from the previous slot's confirm.
+    outcome, _ = asyncio.run(bb.outcome_after_lost_reply(_page_showing(mock_portal.MSG_FULL)))
+    assert outcome.status == UNKNOWN
+
+
+def test_form_post_predicate_takes_full_and_partial_postbacks_only():
+    matches = bb.is_form_post("http://portal.test/FreeFitness.aspx#top")
+
+    def response(url, method="POST", kind="document"):
+        return SimpleNamespace(url=url, request=SimpleNamespace(method=method, resource_type=kind))
+
+    assert matches(response("http://portal.test/FreeFitness.aspx"))
+    assert matches(response("http://portal.test/FreeFitness.aspx", kind="xhr"))  # UpdatePanel
+    assert matches(response("http://portal.test/FreeFitness.aspx", kind="fetch"))
+    assert not matches(response("http://portal.test/analytics", kind="xhr"))
+    assert not matches(response("http://portal.test/FreeFitness.aspx", kind="ping"))
+    assert not matches(response("http://portal.test/analytics"))
+    assert not matches(response("http://portal.test/FreeFitness.aspx", method="GET"))
@@ -0,0 +1,81 @@
+import asyncio
+import datetime
+
+import pytest
+
+import mock_portal
+from confirm_outcome import ALREADY, BOOKED, UNKNOWN
+from date_window import MISMATCH, book_best, collect_options, ranked_rules
+from postback import ConfirmUnread, PostbackMismatch
+
+
+class FakeEngine:
+    """Day and confirm posts answered from canned mock-portal pages, no server."""
+
+    def __init__(self, portal, replies=None, unreadable=()):
+        self.portal = portal
+        self.replies = dict(replies or {})  # date -> message or exception for its confirm
+        self.unreadable = set(unreadable)  # dates whose day post does not parse
+        self.html = ""
+        self.day = None
+        self.confirms = []
+        self.refreshes = 0
+
+    async def select_day(self, date, month_names):
+        if date in self.unreadable:
+            raise PostbackMismatch("slot grid not rendered after selecting the day")
+        self.day = date
+        self.html = self.portal.render_free_fitness({"day": date.isoformat()})
+
+    async def confirm(self, slot_id):
+        self.confirms.append((self.day, slot_id))
+        reply = self.replies.get(self.day, mock_portal.MSG_BOOKED)
+        if isinstance(reply, Exception):
+            raise reply
+        self.html = self.portal.render_free_fitness({"day": self.day.isoformat()}, reply)
+        return self.html
+
+    async def refresh(self):
+        self.refreshes += 1
+        self.html = self.portal.render_free_fitness({})
+        return self.html
+
+
+@pytest.fixture
+def portal():
+    return mock_portal.MockPortal(capacity=[1, 1, 1, 1])
+
+
+@pytest.fixture
+def dates(portal):
+    start = portal.today() + datetime.timedelta(days=1)
+    return [start + datetime.timedelta(days=i) for i in range(3)]
+
+
+def sweep(engine, dates):
+    return asyncio.run(collect_options(engine, dates, ranked_rules(["18:30"])))
+
+
+def test_already_on_one_date_moves_to_the_next(portal, dates):
+    engine = FakeEngine(portal, replies={dates[0]: mock_portal.MSG_ALREADY})
+    options = sweep(engine, dates)
+    option, outcome = asyncio.run(book_best(engine, options))
+    assert outcome.status == BOOKED and option.date == dates[1]
+    assert {o.status for o in options if o.date == dates[0]} == {ALREADY}
+
+
+def test_unreadable_day_is_skipped(portal, dates):
+    engine = FakeEngine(portal, unreadable={dates[0]})
+    options = sweep(engine, dates)
+    assert [o.status for o in options if o.date == dates[0]] == [MISMATCH]
+    assert engine.refreshes == 1
+    option, outcome = asyncio.run(book_best(engine, options))
+    assert outcome.status == BOOKED and option.date == dates[1]
+
+
+def test_lost_confirm_reply_stops_the_search(portal, dates):
+    engine = FakeEngine(portal, replies={dates[0]: ConfirmUnread("confirm sent but its reply was unreadable")})
+    options = sweep(engine, dates)
+    option, outcome = asyncio.run(book_best(engine, options))
+    assert outcome.status == UNKNOWN and option.date == dates[0]
+    assert len(engine.confirms) == 1
@@ -0,0 +1,153 @@
+import base64
+import datetime
+import json
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from har_capture import (
+    SCRUBBED_COOKIE,
+    SCRUBBED_PASSWORD,
+    SCRUBBED_USER,
+    load_har,
+    partial_path,
+    scrub_har,
+    scrub_outputs,
+    scrub_zip,
+)
+
+USER, PASSWORD = "1234", "pa ss&1"
+SECRETS = {USER: SCRUBBED_USER, PASSWORD: SCRUBBED_PASSWORD}
+VIEWSTATE = "/wEPDw1234UKLTE1234"
+
+
+def entry(**request):
+    return {
+        "startedDateTime": "2026-03-01T00:00:01.234Z",
+        "time": 12.34,
+        "request": {"method": "GET", "url": "https://portal/x", "headers": [], "cookies": [], "queryString": [],
+                    **request},
+        "response": {"status": 200, "headers": [], "cookies": [], "content": {"mimeType": "text/html", "text": ""}},
+    }
+
+
+def login_post():
+    body = f"__VIEWSTATE={VIEWSTATE}&txtUser={USER}&txtPwd=pa+ss%261&__EVENTARGUMENT=9912341"
+    e = entry(
+        method="POST",
+        url=f"https://portal/login?u={USER}&n=12345",
+        headers=[{"name": "X-User", "value": USER}, {"name": "Cookie", "value": "ASP.NET_SessionId=abc1234; a=1"}],
+        cookies=[{"name": "ASP.NET_SessionId", "value": "abc1234"}],
+        postData={
+            "mimeType": "application/x-www-form-urlencoded",
+            "text": body,
+            "params": [{"name": "txtUser", "value": USER}, {"name": "__VIEWSTATE", "value": VIEWSTATE}],
+        },
+    )
+    e["response"]["content"]["text"] = (
+        f'<input name="__VIEWSTATE" value="{VIEWSTATE}"><input name="txtUser" value="{USER}"><p>1234 left</p>'
+    )
+    return e
+
+
+@pytest.fixture
+def har(tmp_path):
+    path = tmp_path / "run.har"
+    path.write_text(json.dumps({"log": {"entries": [login_post()]}}), encoding="utf-8")
+    scrub_har(str(path), SECRETS)
+    return load_har(str(path))["log"]["entries"][0]
+
+
+def test_form_fields_are_scrubbed_whole(har):
+    text = har["request"]["postData"]["text"]
+    assert text == f"__VIEWSTATE={VIEWSTATE}&txtUser=har-user&txtPwd=har-password&__EVENTARGUMENT=9912341"
+    assert har["request"]["postData"]["params"][0]["value"] == SCRUBBED_USER
+    assert har["request"]["postData"]["params"][1]["value"] == VIEWSTATE
+
+
+def test_query_headers_and_cookies(har):
+    assert har["request"]["url"] == "https://portal/login?u=har-user&n=12345"
+    headers = {h["name"]: h["value"] for h in har["request"]["headers"]}
+    assert headers["X-User"] == SCRUBBED_USER
+    assert headers["Cookie"] == f"ASP.NET_SessionId={SCRUBBED_COOKIE}; a={SCRUBBED_COOKIE}"
+    assert har["request"]["cookies"][0]["value"] == SCRUBBED_COOKIE
+
+
+def test_numeric_username_leaves_other_values_alone(har):
+    assert har["startedDateTime"] == "2026-03-01T00:00:01.234Z"
+    page = har["response"]["content"]["text"]
+    assert f'value="{VIEWSTATE}"' in page
+    assert 'name="txtUser" value="har-user"' in page
+    assert "<p>1234 left</p>" in page
+
+
+def test_base64_html_body(tmp_path):
+    e = entry()
+    e["response"]["content"] = {
+        "mimeType": "text/html; charset=utf-8",
+        "encoding": "base64",
+        "text": base64.b64encode(f'<input value="{USER}">'.encode()).decode(),
+    }
+    path = tmp_path / "run.har"
+    path.write_text(json.dumps({"log": {"entries": [e]}}), encoding="utf-8")
+    scrub_har(str(path), SECRETS)
+    content = load_har(str(path))["log"]["entries"][0]["response"]["content"]
+    assert base64.b64decode(content["text"]).decode() == '<input value="har-user">'
+
+
+def test_trace_zip(tmp_path):
+    path = tmp_path / "trace.zip"
+    post = f"txtUser={USER}&__VIEWSTATE={VIEWSTATE}"
+    network = {
+        "type": "resource-snapshot",
+        "snapshot": {
+            "request": {"url": "https://portal/login", "headers": [], "cookies": [],
+                        "postData": {"mimeType": "application/x-www-form-urlencoded", "_sha1": "p1.dat"}},
+            "response": {"headers": [], "cookies": [], "content": {"mimeType": "text/html", "_sha1": "r1.html"}},
+        },
+    }
+    action = {"type": "before", "method": "fill", "params": {"value": USER}, "startTime": 1234.5, "callId": "c1234"}
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("trace.network", json.dumps(network) + "\n")
+        z.writestr("trace.trace", json.dumps(action) + "\n")
+        z.writestr("resources/p1.dat", post)
+        z.writestr("resources/r1.html", f'<input value="{USER}"><b>1234</b>')
+        z.writestr("resources/other.js", f"var x = {USER};")
+    scrub_zip(str(path), SECRETS)
+    with zipfile.ZipFile(path) as z:
+        event = json.loads(z.read("trace.trace"))
+        assert event["params"]["value"] == SCRUBBED_USER and event["callId"] == "c1234"
+        assert z.read("resources/p1.dat").decode() == f"txtUser=har-user&__VIEWSTATE={VIEWSTATE}"
+        assert z.read("resources/r1.html").decode() == '<input value="har-user"><b>1234</b>'
+        assert z.read("resources/other.js").decode() == f"var x = {USER};"
+
+
+def test_outputs_land_scrubbed_and_partials_go(tmp_path):
+    har_path = tmp_path / "run.har"
+    job = SimpleNamespace(
+        username=USER, password=PASSWORD, record_har=str(har_path), record_trace=None,
+        target_date=datetime.date(2026, 3, 2), primary_slot_selector="#slot",
+    )
+    partial = partial_path(job.record_har)
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump({"log": {"entries": [login_post()]}}, f)
+    scrub_outputs(job)
+    log = load_har(str(har_path))["log"]
+    assert json.loads(log["comment"])["target_date"] == "2026-03-02"
+    assert "txtUser=har-user" in log["entries"][0]["request"]["postData"]["text"]
+    assert not (tmp_path / "run.har.partial").exists()
+
+
+def test_unclosed_context_discards_the_har(tmp_path):
+    job = SimpleNamespace(
+        username=USER, password=PASSWORD, record_har=str(tmp_path / "run.har"), record_trace=None,
+        target_date=datetime.date(2026, 3, 2), primary_slot_selector="#slot",
+    )
+    partial = partial_path(job.record_har)
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write("{}")
+    logs = []
+    scrub_outputs(job, log_cb=logs.append, closed=False)
+    assert not (tmp_path / "run.har").exists() and not (tmp_path / "run.har.partial").exists()
+    assert logs == ["HAR discarded: the context did not close cleanly."]
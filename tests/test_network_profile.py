@@ -0,0 +1,132 @@
+import asyncio
+import re
+import urllib.parse
+from types import SimpleNamespace
+
+import pytest
+
+import mock_portal
+from network_profile import PROFILES, NetworkMeter, install_network_profile
+
+
+class FakeRequest:
+    def __init__(self, size):
+        self.size = size
+
+    async def sizes(self):
+        return {"responseBodySize": self.size, "responseHeadersSize": 0}
+
+
+class FakePage:
+    """Starts `requests` when reloaded; finishing them is up to the test."""
+
+    def __init__(self):
+        self.meter = None
+        self.requests = []
+
+    async def reload(self, wait_until):
+        for request in self.requests:
+            self.meter._on_request(request)
+
+
+def test_late_bytes_stay_with_their_reload():
+    page = FakePage()
+    meter = NetworkMeter(page=page, profile=PROFILES["off"])
+    page.meter = meter
+
+    async def run():
+        first_doc, first_late = FakeRequest(100), FakeRequest(5000)
+        page.requests = [first_doc, first_late]
+        await meter.reload()
+        await meter._on_finished(first_doc)
+
+        second_doc = FakeRequest(100)
+        page.requests = [second_doc]
+        await meter.reload()
+        # The first reload's image finishes only now, during the second reload.
+        await meter._on_finished(first_late)
+        await meter._on_finished(second_doc)
+
+    asyncio.run(run())
+    assert [s.bytes for s in meter.samples] == [5100, 100]
+    assert [s.requests for s in meter.samples] == [2, 1]
+    assert meter.bytes == 5200
+
+
+def test_blocked_requests_count_per_reload():
+    page = FakePage()
+    meter = NetworkMeter(page=page, profile=PROFILES["lean"])
+    page.meter = meter
+    meter._on_blocked()  # before any reload: only the running total
+    asyncio.run(meter.reload())
+    meter._on_blocked()
+    assert meter.blocked == 2
+    assert meter.samples[0].blocked == 1
+
+
+class FakeRoute:
+    def __init__(self, url, resource_type, method="GET"):
+        self.request = SimpleNamespace(url=url, resource_type=resource_type, method=method)
+        self.verdict = None
+
+    async def abort(self):
+        self.verdict = "blocked"
+
+    async def fallback(self):
+        self.verdict = "passed"
+
+
+class RoutedPage:
+    def __init__(self, url):
+        self.url = url
+        self.handler = None
+
+    def on(self, event, callback):
+        pass
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+
+_RESOURCE_TYPES = {".css": "stylesheet", ".js": "script", ".png": "image", ".woff2": "font"}
+
+
+def heavy_page_requests(portal):
+    """Everything a browser asks for when it loads the mock's heavy Free Fitness page, then posts its form."""
+    page_html = portal.render_free_fitness({})
+    urls = re.findall(r'(?:src|href)="([^"]*/assets/[^"]+)"', page_html)
+    urls += re.findall(r"url\(([^)]+)\)", portal.asset_body(".css").decode())  # the font the stylesheet pulls
+    requests = [(portal.free_fitness_url, "document", "GET"), (portal.free_fitness_url, "document", "POST")]
+    for url in urls:
+        resource_type = _RESOURCE_TYPES[url[url.rfind("."):]]
+        requests.append((urllib.parse.urljoin(portal.free_fitness_url, url), resource_type, "GET"))
+    return requests
+
+
+@pytest.mark.parametrize("name", ["lean", "bare"])
+def test_profiles_on_the_heavy_mock_page(name):
+    portal = mock_portal.MockPortal(port=8080, heavy_assets_kb=200)
+    page = RoutedPage(portal.free_fitness_url)
+    meter = asyncio.run(install_network_profile(page, name))
+    verdicts = {}
+    for url, resource_type, method in heavy_page_requests(portal):
+        route = FakeRoute(url, resource_type, method)
+        asyncio.run(page.handler(route))
+        verdicts[(urllib.parse.urlsplit(url).path, urllib.parse.urlsplit(url).hostname, method)] = route.verdict
+
+    host, third_party = "127.0.0.1", "localhost"
+    assert verdicts[(mock_portal.PATH_FREE_FITNESS, host, "GET")] == "passed"
+    assert verdicts[(mock_portal.PATH_FREE_FITNESS, host, "POST")] == "passed"
+    assert verdicts[("/assets/app.js", host, "GET")] == "passed"  # __doPostBack needs the first-party scripts
+    assert verdicts[("/assets/tracker.js", third_party, "GET")] == "blocked"
+    assert verdicts[("/assets/pixel.png", third_party, "GET")] == "blocked"
+    assert all(verdicts[(f"/assets/banner{i}.png", host, "GET")] == "blocked" for i in range(4))
+    assert verdicts[("/assets/portal.woff2", host, "GET")] == "blocked"
+    assert verdicts[("/assets/site.css", host, "GET")] == ("blocked" if name == "bare" else "passed")
+    assert meter.blocked == sum(v == "blocked" for v in verdicts.values())
+
+
+def test_off_profile_installs_no_route():
+    page = RoutedPage("http://127.0.0.1:8080/FreeFitness.aspx")
+    asyncio.run(install_network_profile(page, "off"))
+    assert page.handler is None
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from phase_budget import PhaseBudget, PhaseTimeout
+from phase_trace import PhaseTracer
+
+
+def traced(budget):
+    tracer = PhaseTracer()
+    tracer.budget = budget
+    return tracer
+
+
+def test_phase_budget_expiry_names_the_phase():
+    tracer = traced(PhaseBudget({"day_click": 0.02}))
+
+    async def run():
+        async with tracer.span("day_click"):
+            await asyncio.sleep(1)
+
+    with pytest.raises(PhaseTimeout) as err:
+        asyncio.run(run())
+    assert err.value.phase == "day_click" and not err.value.deadline
+    assert tracer.spans[-1].outcome == "timeout"
+
+
+def test_deadline_names_the_innermost_phase():
+    budget = PhaseBudget(deadline_s=0.02)
+    tracer = traced(budget)
+
+    async def run():
+        async with budget.deadline():
+            async with tracer.span("login"):
+                async with tracer.span("popup"):
+                    await asyncio.sleep(1)
+
+    with pytest.raises(PhaseTimeout) as err:
+        asyncio.run(run())
+    assert err.value.phase == "popup" and err.value.deadline
+    assert [(s.name, s.outcome) for s in tracer.spans] == [("popup", "cancelled"), ("login", "cancelled")]
+
+
+def test_nested_deadline_is_a_no_op():
+    budget = PhaseBudget(deadline_s=5)
+
+    async def run():
+        async with budget.deadline():
+            async with budget.deadline():
+                return budget._deadline_at
+
+    assert asyncio.run(run()) is not None
+    assert budget._deadline_at is None
+
+
+def test_started_clock_carries_over_between_deadlines():
+    budget = PhaseBudget(deadline_s=0.05)
+    budget.start()
+
+    async def run():
+        async with budget.deadline():
+            await asyncio.sleep(0.04)
+        async with budget.deadline():
+            await asyncio.sleep(0.04)
+
+    with pytest.raises(PhaseTimeout):
+        asyncio.run(run())
+
+
+def test_error_span_records_the_message():
+    tracer = PhaseTracer()
+    with pytest.raises(ValueError):
+        with tracer.span("confirm"):
+            raise ValueError("boom")
+    assert (tracer.spans[-1].outcome, tracer.spans[-1].error) == ("error", "boom")
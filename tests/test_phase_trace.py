@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import phase_trace
+from phase_trace import PhaseTracer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic() in seconds, moved by the test."""
+    now = [50.0]
+    monkeypatch.setattr(phase_trace.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(phase_trace.time, "time", lambda: 1_700_000_000.0)
+    return now
+
+
+def spend(tracer, clock, name, seconds, attempts=None, fail=False, **attrs):
+    try:
+        with tracer.span(name, **attrs) as span:
+            clock[0] += seconds
+            span.set(attempts=attempts)
+            if fail:
+                raise RuntimeError("day not clickable")
+    except RuntimeError:
+        pass
+
+
+def test_jsonl_sink_writes_one_line_per_span(tmp_path, clock):
+    path = tmp_path / "trace.jsonl"
+    tracer = PhaseTracer(sink=path, run_id="run1", label="anna")
+    clock[0] += 0.5
+    spend(tracer, clock, "login", 1.25, attempts=2, slot="17-18.30")
+    spend(tracer, clock, "day_click", 0.1, fail=True)
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert lines[0] == {
+        "run": "run1",
+        "ts": 1_700_000_000.5,
+        "label": "anna",
+        "name": "login",
+        "start_ms": 500.0,
+        "duration_ms": 1250.0,
+        "outcome": "ok",
+        "attempts": 2,
+        "error": None,
+        "attrs": {"slot": "17-18.30"},
+    }
+    assert lines[1]["name"] == "day_click"
+    assert lines[1]["outcome"] == "error" and lines[1]["error"] == "day not clickable"
+    assert lines[1]["start_ms"] == pytest.approx(1750.0)
+
+
+def test_runs_append_to_a_shared_file(tmp_path, clock):
+    path = tmp_path / "trace.jsonl"
+    for run in ("a", "b"):
+        spend(PhaseTracer(sink=path, run_id=run), clock, "reload", 0.2)
+    assert [json.loads(line)["run"] for line in path.read_text(encoding="utf-8").splitlines()] == ["a", "b"]
+
+
+def test_callable_sink_gets_the_record(clock):
+    records = []
+    spend(PhaseTracer(sink=records.append, run_id="r"), clock, "confirm", 0.3)
+    assert [(r["run"], r["name"], r["duration_ms"]) for r in records] == [("r", "confirm", pytest.approx(300.0))]
+
+
+def test_summary_table_aggregates_per_phase(clock):
+    tracer = PhaseTracer()
+    spend(tracer, clock, "login", 2.0)
+    spend(tracer, clock, "reload", 0.1, attempts=1)
+    spend(tracer, clock, "reload", 0.4, attempts=3)
+    spend(tracer, clock, "reload", 0.2, fail=True)
+    spend(tracer, clock, "reload", 0.3)
+
+    header, login, reload = tracer.summary_table().splitlines()
+    assert header.split() == ["phase", "n", "total", "ms", "max", "ms", "tries", "outcome"]
+    assert login.split() == ["login", "1", "2000", "2000", "ok"]
+    assert reload.split(None, 5) == ["reload", "4", "1000", "400", "4", "okx3, error"]
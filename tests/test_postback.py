@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import booking_backend as bb
+import mock_portal
+from confirm_outcome import BOOKED, UNKNOWN
+from postback import (
+    CALENDAR_EPOCH,
+    ConfirmUnread,
+    DayNotReady,
+    PostbackEngine,
+    PostbackMismatch,
+    StdlibClient,
+    day_argument,
+    displayed_month,
+    parse_webform,
+)
+from portal_fakes import PAGE_URL, PortalClient
+
+SLOT_0 = "UC_FreeFitness_GVPeriodi_CBScelta_0"
+
+
+@pytest.fixture
+def portal():
+    return mock_portal.MockPortal()
+
+
+def test_day_argument_counts_days_from_calendar_epoch():
+    assert day_argument(CALENDAR_EPOCH) == "0"
+    assert day_argument(datetime.date(2026, 10, 17)) == str((datetime.date(2026, 10, 17) - CALENDAR_EPOCH).days)
+
+
+def test_parse_webform_reads_fields_links_and_checkboxes(portal):
+    day = portal.today() + datetime.timedelta(days=1)
+    form = parse_webform(portal.render_free_fitness({"day": day.isoformat()}))
+    assert form.action == "./FreeFitness.aspx"
+    assert {"__VIEWSTATE", "__EVENTVALIDATION", "__EVENTTARGET"} <= set(form.fields)
+    day_links = [l for l in form.links if l.argument == day_argument(day)]
+    assert day_links and day_links[0].target == "UC_FreeFitness$Calendar1"
+    assert any(l.id == "UC_FreeFitness_LBConferma" for l in form.links)
+    assert form.checkboxes[SLOT_0].name == "UC_FreeFitness$GVPeriodi$ctl02$CBScelta"
+    assert not form.checkboxes[SLOT_0].disabled
+
+
+def test_parse_webform_marks_full_slots_disabled():
+    portal = mock_portal.MockPortal(capacity=[0, 1, 1, 1])
+    day = portal.today() + datetime.timedelta(days=1)
+    form = parse_webform(portal.render_free_fitness({"day": day.isoformat()}))
+    assert form.checkboxes[SLOT_0].disabled
+    assert not form.checkboxes["UC_FreeFitness_GVPeriodi_CBScelta_1"].disabled
+
+
+def test_parse_webform_requires_viewstate():
+    with pytest.raises(PostbackMismatch, match="__VIEWSTATE"):
+        parse_webform("<form action='x'><input type='hidden' name='__EVENTVALIDATION' value='1'></form>")
+
+
+def test_displayed_month(portal):
+    assert displayed_month(parse_webform(portal.render_free_fitness({"month": [2026, 1]}))) == (2026, 1)
+    assert displayed_month(parse_webform(portal.render_free_fitness({"month": [2025, 12]}))) == (2025, 12)
+
+
+def test_engine_books_and_pages_months(portal):
+    client = PortalClient(portal)
+    engine = PostbackEngine(client, PAGE_URL, portal.render_free_fitness({}))
+    day = portal.today() + datetime.timedelta(days=1)
+    asyncio.run(engine.select_day(day, mock_portal.MONTH_IT))
+    assert displayed_month(engine.form) == (day.year, day.month)
+    page_html = asyncio.run(engine.confirm(SLOT_0))
+    assert mock_portal.MSG_BOOKED in page_html
+    assert portal.bookings == [(day, 0)]
+
+
+def test_posts_leave_out_refreshes(portal):
+    client = PortalClient(portal)
+    engine = PostbackEngine(client, PAGE_URL, portal.render_free_fitness({}))
+    asyncio.run(engine.select_day(portal.today() + datetime.timedelta(days=1), mock_portal.MONTH_IT))
+    asyncio.run(engine.refresh())
+    assert engine.posts == len(client.posts) > 0
+    assert len(engine.timings) == engine.posts + 1
+
+
+def test_stdlib_client_books_on_a_served_portal():
+    """The engine over plain HTTP: login cookie, redirects and form posts against a local server."""
+    with mock_portal.MockPortal(users={"member": "pw"}) as portal:
+        day = portal.today() + datetime.timedelta(days=1)
+
+        async def run():
+            client = StdlibClient()
+            await client.post(portal.login_url, form={"UC_Login$TXTUser": "member", "UC_Login$TXTPwd": "pw"})
+            page = await client.get(portal.free_fitness_url)
+            assert page.status == 200 and page.url == portal.free_fitness_url  # not bounced to the login
+            engine = PostbackEngine(client, page.url, await page.text())
+            await engine.select_day(day, mock_portal.MONTH_IT)
+            return await engine.confirm(SLOT_0)
+
+        page_html = asyncio.run(run())
+    assert mock_portal.MSG_BOOKED in page_html
+    assert portal.bookings == [(day, 0)]
+
+
+def test_gray_day_raises_day_not_ready():
+    portal = mock_portal.MockPortal(target_date=datetime.date.today() + datetime.timedelta(days=2), release_at=2**40)
+    engine = PostbackEngine(PortalClient(portal), PAGE_URL, portal.render_free_fitness({}))
+    with pytest.raises(DayNotReady):
+        asyncio.run(engine.select_day(portal.target_date, mock_portal.MONTH_IT))
+
+
+def test_unreadable_confirm_reply_is_not_a_mismatch(portal):
+    engine = PostbackEngine(PortalClient(portal, fail_confirm_with=502), PAGE_URL, portal.render_free_fitness({}))
+    asyncio.run(engine.select_day(portal.today() + datetime.timedelta(days=1), mock_portal.MONTH_IT))
+    with pytest.raises(ConfirmUnread) as err:
+        asyncio.run(engine.confirm(SLOT_0))
+    assert not isinstance(err.value, PostbackMismatch)
+
+
+def _fake_page(portal, client):
+    async def content():
+        return portal.render_free_fitness({})
+
+    return SimpleNamespace(url=PAGE_URL, content=content, context=SimpleNamespace(request=client))
+
+
+def _job(portal, **options):
+    day = portal.today() + datetime.timedelta(days=1)
+    return bb.BookingJob("u", "p", day, "#" + SLOT_0, False, screenshot_path=None, **options)
+
+
+def test_book_via_postback_books(portal):
+    client = PortalClient(portal)
+    result = asyncio.run(bb.book_via_postback(_fake_page(portal, client), _job(portal)))
+    assert result.ok and result.outcome == BOOKED
+    assert client.posts.count("UC_FreeFitness$LBConferma") == 1
+
+
+def test_book_via_postback_never_confirms_twice(portal):
+    client = PortalClient(portal, fail_confirm_with=502)
+
+    async def reload():
+        raise AssertionError("fell back to the browser path after the confirm was sent")
+
+    result = asyncio.run(bb.book_via_postback(_fake_page(portal, client), _job(portal), reload=reload))
+    assert not result.ok and result.outcome == UNKNOWN
+    assert client.posts.count("UC_FreeFitness$LBConferma") == 1
+
+
+def test_result_html_follows_screenshot_path(portal):
+    assert bb.result_html_path(_job(portal)) is None
+    job = bb.BookingJob("u", "p", datetime.date(2026, 1, 1), "#x", False, screenshot_path="out/shot_a.png")
+    assert str(bb.result_html_path(job)) == "out/shot_a.html"
@@ -0,0 +1,91 @@
+import asyncio
+import contextlib
+import datetime
+
+import pytest
+
+import booking_backend as bb
+from confirm_outcome import BOOKED, ConfirmOutcome
+from retry_policy import RetryPolicy
+
+
+class RacingPage:
+    """A tab whose reload takes `reload_s`; once reloaded, the day is always clickable."""
+
+    def __init__(self, k, reload_s):
+        self.k = k
+        self.reload_s = reload_s
+        self.reloads = 0
+        self.clicks = 0
+        self.cancelled = False
+        self.closed = False
+
+    async def reload(self, wait_until):
+        try:
+            await asyncio.sleep(self.reload_s)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        self.reloads += 1
+
+    @contextlib.asynccontextmanager
+    async def expect_navigation(self, wait_until):
+        yield
+
+    async def evaluate(self, script, args):
+        self.clicks += 1
+        return {"clicked": True}
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def race(monkeypatch):
+    pages = [RacingPage(0, 0.15), RacingPage(1, 0.01), RacingPage(2, 0.10)]
+    confirms = []
+
+    async def open_racing_tabs(free_page, count, log_cb=None):
+        return pages[:count]
+
+    async def show_month(page, date):
+        pass
+
+    async def select_slot_and_confirm(page, job, policy, log_cb=None, background=None):
+        confirms.append(page)
+        return bb.SEL_SLOT_0, [], ConfirmOutcome(BOOKED, "ok")
+
+    monkeypatch.setattr(bb, "open_racing_tabs", open_racing_tabs)
+    monkeypatch.setattr(bb, "show_month", show_month)
+    monkeypatch.setattr(bb, "select_slot_and_confirm", select_slot_and_confirm)
+    return pages, confirms
+
+
+def test_only_the_first_tab_to_reload_confirms(race):
+    pages, confirms = race
+    job = bb.BookingJob("u", "p", datetime.date(2026, 3, 2), bb.SEL_SLOT_0, False, race_tabs=3, race_stagger_ms=0)
+    background = []
+
+    async def run():
+        result = await bb.book_with_racing_tabs(pages[0], job, RetryPolicy.fixed(3, pause_ms=10), background=background)
+        await asyncio.gather(*background)
+        return result
+
+    result = asyncio.run(run())
+    assert result.ok and result.race_winner == 1
+    assert confirms == [pages[1]]
+    assert [p.clicks for p in pages] == [0, 1, 0]
+    assert [p.cancelled for p in pages] == [True, False, True]
+    assert [p.closed for p in pages] == [True, False, True]
+
+
+def test_staggered_tabs_stop_once_one_wins(race):
+    pages, _ = race
+    for page in pages:
+        page.reload_s = 0.01
+    job = bb.BookingJob("u", "p", datetime.date(2026, 3, 2), bb.SEL_SLOT_0, False, race_tabs=3)
+    reloads = [bb.page_reloader(page) for page in pages]
+    winner, _ = asyncio.run(bb.race_for_day(pages, job, RetryPolicy.fixed(3, pause_ms=10), reloads, 0.02))
+    assert winner == 0
+    # Tab 2 was still waiting out its stagger when tab 0 won: it never reloads or clicks.
+    assert (pages[2].reloads, pages[2].clicks) == (0, 0)
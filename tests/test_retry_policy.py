@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+from retry_policy import RetryPolicy
+
+
+def test_fixed_policy_stops_at_max_attempts_with_constant_pause():
+    policy = RetryPolicy.fixed(3, pause_ms=40)
+    run = policy.begin("day_click")
+    delays = []
+    while run.next_attempt():
+        delays.append(run.next_delay())
+    assert run.attempt == 3
+    assert delays == [pytest.approx(0.04)] * 3
+    assert policy.stats["day_click"].attempts == 3
+
+
+def test_backoff_grows_and_caps():
+    policy = RetryPolicy(backoff_base_ms=100, backoff_factor=2.0, backoff_max_ms=500, jitter=0.0)
+    run = policy.begin("slot")
+    assert [run.next_delay() for _ in range(5)] == pytest.approx([0.1, 0.2, 0.4, 0.5, 0.5])
+
+
+def test_aggressive_window_after_release():
+    policy = RetryPolicy(aggressive_window_s=10.0, aggressive_pause_ms=5, backoff_base_ms=100, jitter=0.0)
+    policy.mark_release()
+    assert policy.begin("day_click").next_delay() == pytest.approx(0.005)
+    policy.mark_release(time.monotonic() - 11.0)
+    assert policy.begin("day_click").next_delay() == pytest.approx(0.1)
+
+
+def test_jitter_stays_within_bounds():
+    policy = RetryPolicy(backoff_base_ms=100, backoff_factor=1.0, jitter=0.2)
+    run = policy.begin("slot")
+    for _ in range(50):
+        assert 0.08 <= run.next_delay() <= 0.12
+
+
+def test_deadline_after_release_ends_the_phase_and_clips_pauses():
+    policy = RetryPolicy(deadline_after_release_s=1.0, backoff_base_ms=5000, jitter=0.0)
+    policy.mark_release(time.monotonic() - 0.9)
+    run = policy.begin("day_click")
+    assert run.next_attempt()  # the first attempt is always allowed
+    assert run.next_delay() <= 0.1
+    policy.mark_release(time.monotonic() - 2.0)
+    assert not run.next_attempt()
+
+
+def test_throttled_reload_spacing_and_count():
+    policy = RetryPolicy(min_reload_interval_ms=50)
+    calls = []
+
+    async def reload():
+        calls.append(time.monotonic())
+
+    async def run():
+        throttled = policy.throttled(reload, "day_click")
+        for _ in range(3):
+            await throttled()
+
+    asyncio.run(run())
+    assert policy.stats["day_click"].reloads == 3
+    assert all(b - a >= 0.045 for a, b in zip(calls, calls[1:]))
@@ -0,0 +1,100 @@
+import datetime
+import itertools
+import re
+
+import pytest
+
+import mock_portal
+import selector_profile
+from selector_profile import MAX_FINGERPRINTS, SelectorProfile, page_fingerprint
+from slot_grid import slots_from_html
+
+
+@pytest.fixture
+def portal():
+    return mock_portal.MockPortal(capacity=[1, 0, 1, 1])
+
+
+@pytest.fixture
+def snapshot(portal):
+    return slots_from_html(portal.render_free_fitness({"day": (portal.today() + datetime.timedelta(days=1)).isoformat()}))
+
+
+def test_fingerprint_ignores_month_day_and_grid():
+    portal = mock_portal.MockPortal(horizon_days=40)  # next month has open days too
+    today = portal.today()
+    next_month = (today.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+    day = today + datetime.timedelta(days=1)
+    pages = [
+        portal.render_free_fitness({}),
+        portal.render_free_fitness({"month": [next_month.year, next_month.month]}),
+        portal.render_free_fitness({"day": day.isoformat()}),
+        portal.render_free_fitness({"day": day.isoformat(), "checked": [2]}, mock_portal.MSG_FULL),
+        mock_portal.MockPortal(capacity=[0, 0, 0, 0], horizon_days=40).render_free_fitness({"day": day.isoformat()}),
+    ]
+    assert len({page_fingerprint(page) for page in pages}) == 1
+
+
+def test_fingerprint_changes_with_the_page_version(portal):
+    page = portal.render_free_fitness({})
+    assert page_fingerprint(re.sub(r' title="\d+ [a-z]+"', "", page)) != page_fingerprint(page)
+    assert page_fingerprint(page.replace('name="__EVENTARGUMENT"', 'name="__LASTFOCUS"')) != page_fingerprint(page)
+
+
+def test_resolve_puts_the_learned_range_ahead_of_the_id(tmp_path, snapshot):
+    profile = SelectorProfile(tmp_path / "profile.json")
+    assert profile.resolve(["#a"]) == ["#a"]  # no fingerprint selected yet
+    profile.use("fp")
+    profile.learn_slot(snapshot[2])
+    assert profile.resolve([snapshot[2].selector, "18:30", "#other"]) == [
+        "17:00-18:30",
+        snapshot[2].selector,
+        "18:30",
+        "#other",
+    ]
+
+
+def test_learned_strategy_and_slots_persist(tmp_path, snapshot):
+    path = tmp_path / "profile.json"
+    profile = SelectorProfile(path)
+    assert not profile.use("fp")
+    profile.learn_day("cell")
+    profile.learn_slot(snapshot[3])
+    profile.save()
+
+    again = SelectorProfile(path)
+    assert again.use("fp")
+    assert again.day_order() == ["cell", "title", "anchor_text"]
+    assert again.entry["slots"] == {snapshot[3].selector: "18:30-20:00"}
+    assert not again.use("other")  # a new page version starts empty
+    assert again.day_order() == ["title", "anchor_text", "cell"]
+
+
+def test_unknown_strategy_is_ignored_and_clean_profile_not_written(tmp_path):
+    path = tmp_path / "profile.json"
+    profile = SelectorProfile(path)
+    profile.use("fp")
+    profile.learn_day("xpath")
+    profile.save()
+    assert not path.exists()
+
+
+def test_save_keeps_the_most_recent_fingerprints(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(selector_profile.time, "time", lambda: next(clock))
+    path = tmp_path / "profile.json"
+    for i in range(MAX_FINGERPRINTS + 3):
+        profile = SelectorProfile(path)
+        profile.use(f"fp{i}")
+        profile.learn_day("title")
+        profile.save()
+    kept = SelectorProfile(path)
+    assert sorted(kept._entries, key=lambda fp: int(fp[2:])) == [f"fp{i}" for i in range(3, MAX_FINGERPRINTS + 3)]
+
+
+def test_corrupt_profile_starts_empty(tmp_path):
+    path = tmp_path / "profile.json"
+    path.write_text("{not json", encoding="utf-8")
+    profile = SelectorProfile(path)
+    assert not profile.use("fp")
+    assert profile.day_order() == ["title", "anchor_text", "cell"]
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+import session_cache
+from session_cache import SessionCache
+
+URL = "https://example.test/FreeFitness.aspx?sid=1"
+
+
+class FakeContext:
+    async def storage_state(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"cookies": [], "origins": []}, f)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(session_cache.time, "time", lambda: now[0])
+    return now
+
+
+def saved(tmp_path, **options):
+    cache = SessionCache(tmp_path / "cache", **options)
+    asyncio.run(cache.save(FakeContext(), "anna", URL))
+    return cache
+
+
+def test_missing_cache_loads_nothing(tmp_path):
+    cache = SessionCache(tmp_path / "cache")
+    assert cache.load("anna") is None
+    assert cache.meta("anna") == {}
+
+
+def test_corrupt_sidecar_loads_nothing(tmp_path):
+    cache = saved(tmp_path)
+    cache._meta_path("anna").write_text("{not json", encoding="utf-8")
+    assert cache.load("anna") is None
+
+
+def test_missing_state_file_loads_nothing(tmp_path):
+    cache = saved(tmp_path)
+    cache.state_path("anna").unlink()
+    assert cache.load("anna") is None
+
+
+def test_entry_expires_after_max_age(tmp_path, clock):
+    cache = saved(tmp_path, max_age_s=60)
+    assert cache.load("anna")["free_fitness_url"] == URL
+    clock[0] += 60
+    assert cache.load("anna") is not None
+    clock[0] += 0.5
+    assert cache.load("anna") is None
+
+
+def test_entries_are_per_user_and_hashed(tmp_path):
+    cache = saved(tmp_path)
+    assert cache.load("bruno") is None
+    assert all("anna" not in p.name for p in cache.root.iterdir())
+
+
+def test_invalidate_keeps_the_startup_timings(tmp_path):
+    cache = saved(tmp_path)
+    cache.record_startup("anna", warm=False, seconds=4.2)
+    cache.invalidate("anna")
+    assert cache.load("anna") is None
+    assert not cache.state_path("anna").exists()
+    assert cache.meta("anna") == {"cold_start_s": 4.2}
+
+
+def test_invalidate_without_timings_leaves_no_sidecar(tmp_path):
+    cache = saved(tmp_path)
+    cache.invalidate("anna")
+    assert cache.meta("anna") == {}
+    cache.invalidate("nobody")  # nothing cached: a no-op
+
+
+def test_record_startup_keeps_cold_and_warm_apart(tmp_path):
+    cache = SessionCache(tmp_path / "cache")
+    cache.record_startup("anna", warm=False, seconds=5.12345)
+    cache.record_startup("anna", warm=True, seconds=1.5)
+    meta = cache.record_startup("anna", warm=True, seconds=1.25)
+    assert meta == {"cold_start_s": 5.123, "warm_start_s": 1.25}
+    assert cache.meta("anna") == meta
+    assert cache.load("anna") is None  # timings alone are not a usable session
@@ -0,0 +1,53 @@
+import datetime
+
+import pytest
+
+import mock_portal
+from slot_grid import parse_time_range, preference_index, rank_slots, slots_from_html
+
+
+@pytest.fixture
+def snapshot():
+    portal = mock_portal.MockPortal(capacity=[1, 0, 1, 1])
+    day = portal.today() + datetime.timedelta(days=1)
+    return slots_from_html(portal.render_free_fitness({"day": day.isoformat()}))
+
+
+@pytest.mark.parametrize(
+    "label, expected",
+    [
+        ("14-15.30", ("14:00", "15:30")),
+        ("17.00 - 18.30 | 1", ("17:00", "18:30")),
+        ("18:30-20:00", ("18:30", "20:00")),
+        ("no times here", (None, None)),
+    ],
+)
+def test_parse_time_range(label, expected):
+    assert parse_time_range(label) == expected
+
+
+def test_slots_from_html_reads_every_row(snapshot):
+    assert [s.index for s in snapshot] == [0, 1, 2, 3]
+    assert [s.enabled for s in snapshot] == [True, False, True, True]
+    assert (snapshot[2].start, snapshot[2].end) == ("17:00", "18:30")
+    assert snapshot[0].selector == "#UC_FreeFitness_GVPeriodi_CBScelta_0"
+
+
+def test_rank_by_mixed_preferences(snapshot):
+    ranked = rank_slots(snapshot, ["18:30", "#UC_FreeFitness_GVPeriodi_CBScelta_1", "14-15.30"])
+    assert [s.index for s in ranked] == [3, 1, 0]
+
+
+def test_star_appends_the_rest_in_grid_order(snapshot):
+    assert [s.index for s in rank_slots(snapshot, [2, "*"])] == [2, 0, 1, 3]
+
+
+def test_disabled_rows_are_kept_and_unmatched_left_out(snapshot):
+    ranked = rank_slots(snapshot, ["15.30-17", "nothing like this"])
+    assert [(s.index, s.enabled) for s in ranked] == [(1, False)]
+
+
+def test_preference_index(snapshot):
+    assert preference_index(snapshot[3], ["17:00", "18:30"]) == 1
+    assert preference_index(snapshot[0], ["17:00", "*"]) == 1
+    assert preference_index(snapshot[0], ["17:00"]) is None
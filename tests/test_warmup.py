@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import booking_backend as bb
+
+_real_sleep = asyncio.sleep
+
+
+class PingPage:
+    url = "http://127.0.0.1:8080/FreeFitness.aspx"
+
+    def __init__(self, clock, fail_at=()):
+        self.clock = clock
+        self.fail_at = set(fail_at)
+        self.pings = []
+
+    async def evaluate(self, script, url):
+        assert script == bb.WARM_PING_JS and url == self.url
+        self.pings.append(self.clock[0])
+        if len(self.pings) in self.fail_at:
+            raise RuntimeError("net::ERR_CONNECTION_RESET")
+        return {"status": 200, "ms": 12.0}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() that only moves when the code under test sleeps."""
+    now = [1000.0]
+
+    async def sleep(seconds):
+        now[0] += seconds
+        await _real_sleep(0)
+
+    monkeypatch.setattr(bb.time, "time", lambda: now[0])
+    monkeypatch.setattr(bb.asyncio, "sleep", sleep)
+    return now
+
+
+def test_pings_start_at_the_window_and_end_just_before_fire(clock):
+    page = PingPage(clock)
+    lines = []
+    warm = bb.keep_connection_warm(page, 1100.0, interval_s=20, window_s=50, last_s=0.5, log_cb=lines.append)
+    pings = asyncio.run(warm)
+    assert page.pings == [1050.0, 1070.0, 1090.0, 1099.5]
+    assert pings == 4
+    assert lines == ["Connection warm: 4 pings, last HTTP 200 in 12 ms."]
+
+
+def test_failed_ping_is_logged_and_skipped(clock):
+    page = PingPage(clock, fail_at=[2])
+    lines = []
+    warm = bb.keep_connection_warm(page, 1030.0, interval_s=10, window_s=30, last_s=0.5, log_cb=lines.append)
+    pings = asyncio.run(warm)
+    assert len(page.pings) == 4 and pings == 3
+    assert lines[0] == "Warm-up ping failed: net::ERR_CONNECTION_RESET"
+
+
+def test_cancel_mid_sleep_stops_the_pings():
+    page = PingPage([0.0])
+
+    async def run():
+        task = asyncio.create_task(bb.keep_connection_warm(page, bb.time.time() + 60, interval_s=5, window_s=120))
+        while not page.pings:
+            await asyncio.sleep(0.01)
+        task.cancel()  # the warm-up is cancelled at the fire time, in the middle of its 5 s sleep
+        await asyncio.wait([task], timeout=1)
+        return task
+
+    task = asyncio.run(run())
+    assert task.cancelled()
+    assert len(page.pings) == 1